@@ -0,0 +1,307 @@
+import argparse
+import json
+
+from core.detector import BACKENDS, export_model, compare_backends
+from config import (MODEL_PATH, DETECTOR_BACKEND, JOB_QUEUE_BACKEND, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS,
+                    VIDEO_DECODER, INFERENCE_SIZE_CANDIDATES, AUTOTUNE_PROFILE_PATH, RESOLUTION_RECALL_TOLERANCE,
+                    PROCESSED_VIDEOS_DIRECTORY, UPLOAD_DIRECTORY)
+
+
+def export_model_command(args):
+    """Export and quantize the model for the selected backends."""
+    exported = export_model(args.model, args.backends, imgsz=args.imgsz, data=args.data)
+    print(json.dumps(exported, indent=4))
+
+
+def compare_backends_command(args):
+    """Compare accuracy and throughput of backends on frames from a video."""
+    try:
+        report = compare_backends(
+            args.model, args.video, args.backends,
+            num_frames=args.frames, imgsz=args.imgsz,
+            iou_threshold=args.iou_threshold, report_path=args.report
+        )
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(json.dumps(report, indent=4))
+
+
+def batch_command(args):
+    """Process a directory or manifest of videos without the web server."""
+    from core.batch import discover_jobs, run_batch
+    from core.autotune import load_profile, profile_job_options
+
+    try:
+        jobs = discover_jobs(video_dir=args.videos, calibration_dir=args.calibrations, manifest=args.manifest)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    # Settings of the autotune profile apply unless given on the command line
+    profile_path = None if args.no_profile else args.profile
+    options = profile_job_options(profile_path)
+    options.update({key: value for key, value in {
+        "analytics_only": args.analytics_only, "backend": args.backend, "motion_gate": args.motion_gate,
+        "decoder": args.decoder, "decode_width": args.decode_width, "frame_stride": args.frame_stride,
+    }.items() if value is not None})
+    workers = args.workers or load_profile(profile_path).get("workers", 1)
+    summary = run_batch(jobs, workers=workers, force=args.force, **options)
+    print("Batch summary:")
+    print(json.dumps(summary, indent=4))
+
+
+def enqueue_command(args):
+    """Add a directory or manifest of videos to the job queue."""
+    from core.batch import discover_jobs
+    from core.job_queue import create_job_queue
+
+    try:
+        jobs = discover_jobs(video_dir=args.videos, calibration_dir=args.calibrations, manifest=args.manifest)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    with create_job_queue(args.queue) as queue:
+        queue.create_schema()
+        for job in jobs:
+            options = {k: v for k, v in job.items() if k not in ("video", "calibration")}
+            options.setdefault("analytics_only", args.analytics_only)
+            options.setdefault("backend", args.backend)
+            queue.enqueue(job["video"], job["calibration"], options=options,
+                          priority=args.priority, max_attempts=args.max_attempts)
+        print(json.dumps(queue.stats(), indent=4))
+
+
+def worker_command(args):
+    """Run standalone workers that pull jobs from the queue."""
+    from core.worker import run_workers
+
+    run_workers(processes=args.processes, queue_backend=args.queue, lease_seconds=args.lease,
+                poll_interval=args.poll_interval, max_jobs=args.max_jobs)
+
+
+def export_reports_command(args):
+    """Stream a bulk export of reports to a file or stdout."""
+    import sys
+    from datetime import datetime
+    from core.report_export import stream_export
+
+    chunks = stream_export(
+        args.format,
+        start=datetime.fromisoformat(args.start) if args.start else None,
+        end=datetime.fromisoformat(args.end) if args.end else None,
+        min_speed=args.min_speed, max_speed=args.max_speed
+    )
+    if args.output == '-':
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+        return
+    with open(args.output, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    print(f"[INFO] Reports exported to {args.output}")
+
+
+def autotune_command(args):
+    """Find the fastest pipeline settings on this machine and write the autotune profile."""
+    from core.autotune import autotune
+
+    profile = autotune(args.video, args.calibration, target_accuracy=args.target_accuracy,
+                       sample_seconds=args.sample_seconds, max_workers=args.max_workers,
+                       profile_path=args.profile)
+    print(json.dumps({key: profile[key] for key in ("settings", "fps", "baseline_fps", "accuracy")}, indent=4))
+
+
+def tune_resolution_command(args):
+    """Tune the detector input size of a camera and store it in its calibration."""
+    from core.resolution_tuner import tune_inference_size
+
+    report = tune_inference_size(
+        args.model, args.video, args.calibration, backend=args.backend, sizes=args.sizes,
+        num_frames=args.frames, recall_tolerance=args.tolerance, save=not args.dry_run
+    )
+    print(json.dumps(report, indent=4))
+
+
+def backfill_statistics_command(args):
+    """Fold the speed logs of jobs processed before the statistics rollups existed."""
+    import os
+    from core.rollups import job_key, record_job_statistics
+
+    folded = 0
+    for name in sorted(os.listdir(args.directory)):
+        if not (name.startswith("speed_log_") and name.endswith(".json")):
+            continue
+        video_filename = name[len("speed_log_"):-len(".json")]
+        with open(os.path.join(args.directory, name), 'r') as f:
+            logs = json.load(f)
+        # The uploaded video identifies the job like in the pipeline; the log stands in
+        # for videos that were removed since
+        video_path = os.path.join(UPLOAD_DIRECTORY, video_filename)
+        key = job_key(video_path if os.path.exists(video_path) else os.path.join(args.directory, name))
+        # Calibrations are named after their video unless one camera is given
+        folded += record_job_statistics(video_filename, args.camera or video_filename, logs, key)
+    print(f"[INFO] Folded {folded} jobs into the traffic statistics")
+
+
+def accuracy_command(args):
+    """Check that faster tracking modes keep tracking and speed accuracy; exits 1 on regressions."""
+    from core.accuracy import load_mot, run_accuracy_harness, synthetic_scenario, trace_scenario
+
+    if args.gt:
+        if not (args.detections and args.video and args.calibration):
+            raise SystemExit("--gt requires --detections, --video and --calibration")
+        scenario = trace_scenario(args.gt, args.detections, args.video, args.calibration)
+    else:
+        scenario = synthetic_scenario(num_vehicles=args.vehicles, jitter_px=args.jitter, miss_rate=args.miss_rate,
+                                      seed=args.seed)
+    modes = [{"name": "baseline"}]
+    modes += [{"name": f"stride_{stride}", "frame_stride": stride} for stride in args.frame_strides if stride != 1]
+    for trace in args.traces:
+        name, _, path = trace.partition("=")
+        modes.append({"name": name, "detections": load_mot(path)})
+    tolerances = {key: value for key, value in {
+        "mota": args.max_mota_drop, "idf1": args.max_idf1_drop, "speed_recall": args.max_recall_drop,
+        "speed_mae_kmh": args.max_mae_increase,
+    }.items() if value is not None}
+    result = run_accuracy_harness(scenario, modes, tolerances=tolerances)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(result, f, indent=4)
+    print(json.dumps(result, indent=4))
+    if not result["passed"]:
+        raise SystemExit(1)
+
+
+def record_trace_command(args):
+    """Store the detections of a backend on a video as a MOT det.txt trace for the accuracy harness."""
+    from core.accuracy import record_detections
+
+    record_detections(args.video, args.output, backend=args.backend, imgsz=args.imgsz)
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description='Traffic Violation Detection System tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export-model', help='Export and quantize the YOLO model for CPU backends')
+    export_parser.add_argument('--model', help='Path to PyTorch weights.', type=str, default=MODEL_PATH)
+    export_parser.add_argument('--backends', help='Backends to export.', nargs='+', choices=BACKENDS,
+                               default=[b for b in BACKENDS if b != 'pytorch'])
+    export_parser.add_argument('--imgsz', help='Export image size.', type=int, default=640)
+    export_parser.add_argument('--data', help='Dataset YAML for OpenVINO INT8 calibration.', type=str, default=None)
+    export_parser.set_defaults(func=export_model_command)
+
+    compare_parser = subparsers.add_parser('compare-backends', help='Compare backend accuracy and throughput')
+    compare_parser.add_argument('--model', help='Path to PyTorch weights.', type=str, default=MODEL_PATH)
+    compare_parser.add_argument('--video', help='Video to sample frames from.', type=str, required=True)
+    compare_parser.add_argument('--backends', help='Backends to compare.', nargs='+', choices=BACKENDS,
+                                default=list(BACKENDS))
+    compare_parser.add_argument('--frames', help='Number of frames to sample.', type=int, default=100)
+    compare_parser.add_argument('--imgsz', help='Inference image size.', type=int, default=None)
+    compare_parser.add_argument('--iou_threshold', help='Minimum IoU for equivalent detections.', type=float, default=0.5)
+    compare_parser.add_argument('--report', help='Path to save the JSON report.', type=str, default='backend_report.json')
+    compare_parser.set_defaults(func=compare_backends_command)
+
+    batch_parser = subparsers.add_parser('batch', help='Process a directory or manifest of videos')
+    batch_parser.add_argument('--videos', help='Directory of videos.', type=str, default=None)
+    batch_parser.add_argument('--calibrations', help='Directory of <video>.json calibration files.', type=str, default=None)
+    batch_parser.add_argument('--manifest', help='JSON or CSV manifest of video/calibration pairs.', type=str, default=None)
+    batch_parser.add_argument('--workers', help='Number of worker processes (profile or 1 if omitted).', type=int, default=None)
+    batch_parser.add_argument('--force', help='Reprocess videos that are already done.', action='store_true')
+    batch_parser.add_argument('--analytics_only', help='Skip annotated video output.', action='store_true')
+    batch_parser.add_argument('--backend', help='Detector backend (profile or default if omitted).', choices=BACKENDS, default=None)
+    batch_parser.add_argument('--motion_gate', help='Motion gate method.', choices=['diff', 'mog2'], default=None)
+    batch_parser.add_argument('--decoder', help='Frame decoder.', choices=['opencv', 'ffmpeg'], default=VIDEO_DECODER)
+    batch_parser.add_argument('--decode_width', help='Decode frames at this width (ffmpeg, analytics only).', type=int, default=None)
+    batch_parser.add_argument('--frame_stride', help='Process every n-th frame (profile or 1 if omitted).', type=int, default=None)
+    batch_parser.add_argument('--profile', help='Autotune profile to load.', type=str, default=AUTOTUNE_PROFILE_PATH)
+    batch_parser.add_argument('--no_profile', help='Ignore the autotune profile.', action='store_true')
+    batch_parser.set_defaults(func=batch_command)
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='Add a directory or manifest of videos to the job queue')
+    enqueue_parser.add_argument('--videos', help='Directory of videos.', type=str, default=None)
+    enqueue_parser.add_argument('--calibrations', help='Directory of <video>.json calibration files.', type=str, default=None)
+    enqueue_parser.add_argument('--manifest', help='JSON or CSV manifest of video/calibration pairs.', type=str, default=None)
+    enqueue_parser.add_argument('--queue', help='Job queue backend.', choices=['postgres', 'sqlite'], default=JOB_QUEUE_BACKEND)
+    enqueue_parser.add_argument('--priority', help='Job priority, lower runs first.', type=int, default=0)
+    enqueue_parser.add_argument('--max_attempts', help='Attempts before a job fails.', type=int, default=JOB_MAX_ATTEMPTS)
+    enqueue_parser.add_argument('--analytics_only', help='Skip annotated video output.', action='store_true')
+    enqueue_parser.add_argument('--backend', help='Detector backend.', choices=BACKENDS, default=DETECTOR_BACKEND)
+    enqueue_parser.set_defaults(func=enqueue_command)
+
+    worker_parser = subparsers.add_parser('worker', help='Run workers that process jobs from the queue')
+    worker_parser.add_argument('--queue', help='Job queue backend.', choices=['postgres', 'sqlite'], default=JOB_QUEUE_BACKEND)
+    worker_parser.add_argument('--processes', help='Worker processes on this node.', type=int, default=1)
+    worker_parser.add_argument('--lease', help='Job lease in seconds.', type=float, default=JOB_LEASE_SECONDS)
+    worker_parser.add_argument('--poll_interval', help='Seconds to wait when the queue is empty.', type=float, default=5.0)
+    worker_parser.add_argument('--max_jobs', help='Exit after this many jobs per process.', type=int, default=None)
+    worker_parser.set_defaults(func=worker_command)
+
+    export_reports_parser = subparsers.add_parser('export-reports', help='Export reports as CSV, NDJSON or Parquet')
+    export_reports_parser.add_argument('--format', help='Export format.', choices=['csv', 'ndjson', 'parquet'], default='csv')
+    export_reports_parser.add_argument('--output', help='Output file, - for stdout.', type=str, default='-')
+    export_reports_parser.add_argument('--start', help='Earliest timestamp (ISO 8601, inclusive).', type=str, default=None)
+    export_reports_parser.add_argument('--end', help='Latest timestamp (ISO 8601, exclusive).', type=str, default=None)
+    export_reports_parser.add_argument('--min_speed', help='Minimum speed in km/h.', type=float, default=None)
+    export_reports_parser.add_argument('--max_speed', help='Maximum speed in km/h.', type=float, default=None)
+    export_reports_parser.set_defaults(func=export_reports_command)
+
+    autotune_parser = subparsers.add_parser('autotune', help='Find the fastest settings meeting a target accuracy')
+    autotune_parser.add_argument('--video', help='Representative video.', type=str, required=True)
+    autotune_parser.add_argument('--calibration', help='Calibration JSON of the video.', type=str, required=True)
+    autotune_parser.add_argument('--target_accuracy', help='Minimum speed agreement with the full-quality baseline.',
+                                 type=float, default=0.95)
+    autotune_parser.add_argument('--sample_seconds', help='Length of the video sample.', type=float, default=60)
+    autotune_parser.add_argument('--max_workers', help='Largest batch worker count tried.', type=int, default=None)
+    autotune_parser.add_argument('--profile', help='Path of the profile to write.', type=str, default=AUTOTUNE_PROFILE_PATH)
+    autotune_parser.set_defaults(func=autotune_command)
+
+    tune_parser = subparsers.add_parser('tune-resolution', help='Pick the smallest safe inference size for a camera')
+    tune_parser.add_argument('--model', help='Path to PyTorch weights.', type=str, default=MODEL_PATH)
+    tune_parser.add_argument('--video', help='Video of the camera.', type=str, required=True)
+    tune_parser.add_argument('--calibration', help='Calibration JSON of the camera.', type=str, required=True)
+    tune_parser.add_argument('--backend', help='Detector backend.', choices=BACKENDS, default=DETECTOR_BACKEND)
+    tune_parser.add_argument('--sizes', help='Candidate input sizes.', type=int, nargs='+', default=list(INFERENCE_SIZE_CANDIDATES))
+    tune_parser.add_argument('--frames', help='Number of frames to sample.', type=int, default=60)
+    tune_parser.add_argument('--tolerance', help='Tolerated recall loss in the zones.', type=float,
+                             default=RESOLUTION_RECALL_TOLERANCE)
+    tune_parser.add_argument('--dry_run', help='Report without updating the calibration.', action='store_true')
+    tune_parser.set_defaults(func=tune_resolution_command)
+
+    backfill_parser = subparsers.add_parser('backfill-statistics', help='Fold existing speed logs into the statistics rollups')
+    backfill_parser.add_argument('--directory', help='Directory of speed_log_<video>.json files.', type=str,
+                                 default=PROCESSED_VIDEOS_DIRECTORY)
+    backfill_parser.add_argument('--camera', help='Camera of all logs (default: each video is its own camera).',
+                                 type=str, default=None)
+    backfill_parser.set_defaults(func=backfill_statistics_command)
+
+    accuracy_parser = subparsers.add_parser('accuracy', help='Check tracking modes against ground truth, fail on regressions')
+    accuracy_parser.add_argument('--gt', help='MOT gt.txt of a real video (synthetic scenario if omitted).', type=str, default=None)
+    accuracy_parser.add_argument('--detections', help='MOT det.txt baseline trace of the video.', type=str, default=None)
+    accuracy_parser.add_argument('--video', help='Video of the traces.', type=str, default=None)
+    accuracy_parser.add_argument('--calibration', help='Calibration JSON with the zones of the video.', type=str, default=None)
+    accuracy_parser.add_argument('--vehicles', help='Vehicles of the synthetic scenario.', type=int, default=60)
+    accuracy_parser.add_argument('--jitter', help='Detection noise of the synthetic scenario in pixels.', type=float, default=2.0)
+    accuracy_parser.add_argument('--miss_rate', help='Missed detections of the synthetic scenario.', type=float, default=0.05)
+    accuracy_parser.add_argument('--seed', help='Random seed of the synthetic scenario.', type=int, default=0)
+    accuracy_parser.add_argument('--frame_strides', help='Frame strides to check.', type=int, nargs='*', default=[2])
+    accuracy_parser.add_argument('--traces', help='Other detection traces to check, as NAME=det.txt.', nargs='*', default=[])
+    accuracy_parser.add_argument('--max_mota_drop', help='Tolerated MOTA drop.', type=float, default=None)
+    accuracy_parser.add_argument('--max_idf1_drop', help='Tolerated IDF1 drop.', type=float, default=None)
+    accuracy_parser.add_argument('--max_recall_drop', help='Tolerated drop of measured crossings.', type=float, default=None)
+    accuracy_parser.add_argument('--max_mae_increase', help='Tolerated speed MAE increase in km/h.', type=float, default=None)
+    accuracy_parser.add_argument('--report', help='Path to save the JSON report.', type=str, default=None)
+    accuracy_parser.set_defaults(func=accuracy_command)
+
+    trace_parser = subparsers.add_parser('record-trace', help='Record the detections of a backend as a MOT det.txt trace')
+    trace_parser.add_argument('--video', help='Video to detect on.', type=str, required=True)
+    trace_parser.add_argument('--output', help='Path of the det.txt trace.', type=str, required=True)
+    trace_parser.add_argument('--backend', help='Detector backend.', choices=BACKENDS, default=DETECTOR_BACKEND)
+    trace_parser.add_argument('--imgsz', help='Inference image size.', type=int, default=None)
+    trace_parser.set_defaults(func=record_trace_command)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    args.func(args)
@@ -1,2 +1,137 @@
+import os
+
 SPEED_THRESHOLD_KMH = 100.0
 REAL_DISTANCE_METERS = 20.0
+DETECTOR_BACKEND = "pytorch"
+# Path to YOLO model for vehicle tracking
+MODEL_PATH = "core/model/best.pt"
+# Per-camera inference size tuning: candidate sizes (the largest is the reference), tolerated
+# recall loss inside the measurement zones, and smallest vehicle size in model pixels worth trying
+INFERENCE_SIZE_CANDIDATES = (320, 416, 480, 544, 640, 800, 960, 1280)
+RESOLUTION_RECALL_TOLERANCE = 0.02
+RESOLUTION_MIN_OBJECT_PX = 12
+# Profile written by the autotune command and loaded by /process_video and batch processing
+AUTOTUNE_PROFILE_PATH = "autotune_profile.json"
+# Motion gate defaults: fraction of changed pixels needed to run the detector
+MOTION_GATE_MIN_RATIO = 0.002
+# Margin in pixels added around the measurement band when gating only inside it
+MOTION_GATE_BAND_MARGIN = 50
+
+# Directories for file storage
+UPLOAD_DIRECTORY = "uploaded_videos"
+CALIBRATION_DIRECTORY = "calibration_data"
+PROCESSED_VIDEOS_DIRECTORY = "processed_videos"
+VIDEO_CLIPS_DIRECTORY = "video_clips"
+SNAPSHOTS_DIRECTORY = "snapshots"
+PREVIEWS_DIRECTORY = "previews"
+
+# Database configuration
+DB_CONFIG = {
+    "dbname": "traffic_reports",
+    "user": "traffic_user",
+    "password": "01234",
+    "host": "localhost",
+    "port": "5432"
+}
+
+# Distributed job queue: 'postgres' (multi-node) or 'sqlite' (single-machine stand-in)
+JOB_QUEUE_BACKEND = "postgres"
+JOB_QUEUE_SQLITE_PATH = "jobs.sqlite3"
+# Lease duration of claimed jobs, extended by worker heartbeats
+JOB_LEASE_SECONDS = 60
+JOB_HEARTBEAT_SECONDS = 15
+JOB_MAX_ATTEMPTS = 3
+
+# Checkpoints of long-running jobs, written every CHECKPOINT_INTERVAL_FRAMES frames
+CHECKPOINT_DIRECTORY = "processed_videos/checkpoints"
+CHECKPOINT_INTERVAL_FRAMES = 500
+
+# Cross-job dynamic batching of detector calls in the web app
+INFERENCE_BATCHING = True
+INFERENCE_MAX_BATCH_SIZE = 8
+INFERENCE_MAX_WAIT_MS = 10.0
+
+# Frame decoder: 'opencv' (cv2.VideoCapture) or 'ffmpeg' (pipe with decode-time scaling and decimation)
+VIDEO_DECODER = "opencv"
+
+# Decode and encode in separate processes, passing frames through a shared-memory ring
+PIPELINE_MULTIPROCESS = False
+FRAME_RING_SLOTS = 8
+
+# Materialize violation reports while a video is processed instead of after it
+INCREMENTAL_REPORTS = True
+REPORT_SINK_BATCH_SIZE = 10
+REPORT_SINK_FLUSH_SECONDS = 2.0
+
+# Bulk report export: rows per server-side cursor fetch and per output chunk
+REPORT_EXPORT_CHUNK_ROWS = 1000
+
+# Entries of the in-process caches of probed video metadata and parsed calibrations
+MEDIA_CACHE_SIZE = 64
+
+# FFmpeg executor: concurrent ffmpeg processes, default timeout and clip timeout (seconds)
+FFMPEG_MAX_CONCURRENCY = os.cpu_count() or 4
+FFMPEG_TIMEOUT_SECONDS = 3600
+FFMPEG_CLIP_TIMEOUT_SECONDS = 120
+# Clips may start this much earlier than requested to begin on a keyframe and be stream-copied
+CLIP_KEYFRAME_TOLERANCE_S = 1.0
+
+# Admission control of /process_video: concurrent jobs on this node, slots reserved for
+# live enforcement jobs and wait queue limits per priority class (beyond them: HTTP 429)
+SCHEDULER_MAX_CONCURRENT_JOBS = 3
+SCHEDULER_RESERVED_LIVE_SLOTS = 1
+SCHEDULER_MAX_QUEUED = {"live": 20, "interactive": 10, "backlog": 50}
+
+# Segmented HLS (fragmented MP4) output next to the converted video, segment length in seconds
+HLS_OUTPUT = True
+HLS_SEGMENT_SECONDS = 4
+
+# Storage lifecycle: index of job-owned files, per-directory quotas (bytes) and retention
+# (days; None keeps files forever). Clips referenced by reports are never deleted.
+STORAGE_INDEX_PATH = "storage_index.sqlite3"
+STORAGE_QUOTAS_BYTES = {
+    UPLOAD_DIRECTORY: 50 * 1024 ** 3,
+    PROCESSED_VIDEOS_DIRECTORY: 50 * 1024 ** 3,
+    VIDEO_CLIPS_DIRECTORY: 20 * 1024 ** 3,
+    SNAPSHOTS_DIRECTORY: 2 * 1024 ** 3,
+    PREVIEWS_DIRECTORY: 5 * 1024 ** 3,
+}
+STORAGE_RETENTION_DAYS = {
+    UPLOAD_DIRECTORY: 30,
+    PROCESSED_VIDEOS_DIRECTORY: 30,
+    VIDEO_CLIPS_DIRECTORY: 90,
+    SNAPSHOTS_DIRECTORY: 7,
+    PREVIEWS_DIRECTORY: 90,
+}
+# Seconds between background sweeps, and after which a job that never completed is no longer protected
+STORAGE_SWEEP_SECONDS = 600
+STORAGE_ACTIVE_JOB_SECONDS = 6 * 3600
+# Seconds between refreshes of a running job's protection by its frame loop
+STORAGE_JOB_REFRESH_SECONDS = 300
+
+# On-demand profiling of running jobs: request/result directory, frames between request
+# checks in the frame loop, sampling interval and longest capture (seconds)
+PROFILE_DIRECTORY = "profiles"
+PROFILE_POLL_FRAMES = 25
+PROFILE_SAMPLE_INTERVAL_S = 0.005
+PROFILE_MAX_SECONDS = 120
+
+# Traffic statistics rollups: relative accuracy of the speed quantile sketches,
+# reported quantiles and the most buckets one statistics query may return
+SKETCH_RELATIVE_ACCURACY = 0.01
+STATISTICS_QUANTILES = (0.5, 0.85, 0.95)
+STATISTICS_MAX_BUCKETS = 2000
+
+# Report previews rendered from frames in memory: poster width, frames per second and
+# seconds of video kept in the buffer, sprite layout and JPEG quality
+PREVIEW_WIDTH = 320
+PREVIEW_BUFFER_FPS = 8
+PREVIEW_BUFFER_SECONDS = 20
+PREVIEW_SPRITE_FRAMES = 8
+PREVIEW_SPRITE_COLUMNS = 4
+PREVIEW_SPRITE_TILE_WIDTH = 160
+PREVIEW_JPEG_QUALITY = 80
+
+# Accuracy harness: largest tolerated drop of MOTA, IDF1 and speed crossing recall, and
+# increase of the speed mean absolute error (km/h), of a tracking mode against the baseline
+ACCURACY_TOLERANCES = {"mota": 0.02, "idf1": 0.02, "speed_recall": 0.02, "speed_mae_kmh": 1.0}
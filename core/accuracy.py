@@ -0,0 +1,421 @@
+import os
+import numpy as np
+
+from core.sort import Sort, iou_batch, linear_assignment
+from core.vehicle_tracker import VehicleTracker, stride_sort_params
+from core.zones import Zone
+from config import MODEL_PATH, ACCURACY_TOLERANCES
+
+# Speed logs are matched to ground-truth crossings of the same zone entered within this time
+CROSSING_TIME_TOLERANCE_S = 0.5
+
+
+def load_mot(path):
+    """
+    Read a MOT-format file (frame,id,x,y,w,h,score,...), as written by core/sort.py.
+
+    Args:
+        path (str): det.txt (id -1) or gt.txt file
+
+    Returns:
+        dict: Frame number (from 1) -> array of [x1,y1,x2,y2,score] for detections
+            (id -1) or [x1,y1,x2,y2,id] for ground truth
+    """
+    rows = np.loadtxt(path, delimiter=',', ndmin=2)
+    by_frame = {}
+    for frame in np.unique(rows[:, 0]).astype(int):
+        selected = rows[rows[:, 0] == frame]
+        boxes = selected[:, 2:6].copy()
+        boxes[:, 2:4] += boxes[:, 0:2]  # [x1,y1,w,h] -> [x1,y1,x2,y2]
+        last = selected[:, 6:7] if selected[0, 1] == -1 else selected[:, 1:2]
+        by_frame[int(frame)] = np.hstack([boxes, last])
+    return by_frame
+
+
+def write_mot(path, by_frame, detections=False):
+    """Write boxes per frame in MOT format; the last column is the score for detections, else the id."""
+    with open(path, 'w') as f:
+        for frame in sorted(by_frame):
+            for x1, y1, x2, y2, last in by_frame[frame]:
+                track_id, score = (-1, last) if detections else (int(last), 1)
+                f.write(f"{frame},{track_id},{x1:.2f},{y1:.2f},{x2 - x1:.2f},{y2 - y1:.2f},{score:.4f},-1,-1,-1\n")
+
+
+def record_detections(video_path, output_path, backend="pytorch", imgsz=None):
+    """
+    Store the detections of a backend on every frame of a video as a MOT det.txt trace.
+
+    Returns:
+        int: Number of frames
+    """
+    import cv2
+    from core.detector import Detector
+
+    detector = Detector(MODEL_PATH, backend=backend, imgsz=imgsz)
+    cap = cv2.VideoCapture(video_path)
+    by_frame = {}
+    frame_number = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_number += 1
+        by_frame[frame_number] = detector.detect(frame)
+    cap.release()
+    write_mot(output_path, by_frame, detections=True)
+    print(f"[INFO] Detections of {frame_number} frames ({backend}) saved to {output_path}")
+    return frame_number
+
+
+def synthetic_scenario(num_vehicles=60, fps=25, frame_size=(1280, 720), jitter_px=2.0, miss_rate=0.05,
+                       false_positive_rate=0.02, seed=0):
+    """
+    Generate ground truth and noisy detections of vehicles driving through two lane zones.
+
+    Vehicles drive down one of two lanes at constant speeds between 40 and 140 km/h.
+    Each lane has a 200 px zone that stands for 20 m, so ground-truth speeds and zone
+    entry times are known exactly. Detections jitter around the true boxes, some are
+    missed, and some false positives appear.
+
+    Args:
+        num_vehicles (int): Number of vehicles
+        fps (float): Frame rate of the scenario
+        frame_size (tuple): (width, height)
+        jitter_px (float): Standard deviation of the box coordinate noise
+        miss_rate (float): Probability that a vehicle is not detected in a frame
+        false_positive_rate (float): Expected false positives per frame
+        seed (int): Random seed
+
+    Returns:
+        dict: frame_shape, fps, frames, zones, gt and detections per frame, crossings
+    """
+    rng = np.random.default_rng(seed)
+    width, height = frame_size
+    zone_top, zone_bottom, distance_m = 300, 500, 20.0
+    px_per_m = (zone_bottom - zone_top) / distance_m
+    lanes = [(0, width // 2), (width // 2, width)]
+    zones = [Zone(f"lane_{i + 1}", distance_m, polygon=[[x0, zone_top], [x1, zone_top], [x1, zone_bottom], [x0, zone_bottom]],
+                  lane=f"lane_{i + 1}") for i, (x0, x1) in enumerate(lanes)]
+    box_w, box_h = 120, 80
+
+    vehicles = []
+    previous = [None, None]  # Last vehicle of each lane
+    travel, gap = height + box_h, 2 * box_h  # Pixels a vehicle is visible for, distance kept to the one ahead
+    for track_id in range(1, num_vehicles + 1):
+        lane = int(rng.integers(len(lanes)))
+        speed_kmh = float(rng.uniform(40, 140))
+        v_px = speed_kmh / 3.6 * px_per_m
+        enter = 0.5
+        ahead = previous[lane]
+        if ahead is not None:
+            # Keep the gap while both are visible: at the entry of this vehicle if it is
+            # slower, at the exit of the one ahead if it is faster
+            enter = ahead["enter"] + max(gap / ahead["v_px"], travel / ahead["v_px"] - (travel - gap) / v_px)
+        enter += float(rng.uniform(0, 1.5))
+        center_x = (lanes[lane][0] + lanes[lane][1]) / 2 + float(rng.uniform(-60, 60))
+        vehicles.append({"id": track_id, "lane": lane, "speed_kmh": speed_kmh, "v_px": v_px,
+                         "enter": enter, "x": center_x})
+        previous[lane] = vehicles[-1]
+
+    end_time = max(v["enter"] + (height + box_h) / v["v_px"] for v in vehicles)
+    frames = int(end_time * fps) + 1
+    gt, detections = {}, {}
+    for frame in range(1, frames + 1):
+        t = frame / fps
+        boxes, dets = [], []
+        for v in vehicles:
+            center_y = (t - v["enter"]) * v["v_px"] - box_h / 2
+            if not 0 <= center_y <= height:
+                continue
+            box = [v["x"] - box_w / 2, center_y - box_h / 2, v["x"] + box_w / 2, center_y + box_h / 2]
+            boxes.append(box + [v["id"]])
+            if rng.random() >= miss_rate:
+                dets.append(list(np.array(box) + rng.normal(0, jitter_px, 4)) + [float(rng.uniform(0.5, 1.0))])
+        for _ in range(rng.poisson(false_positive_rate)):
+            x, y = rng.uniform(0, width - box_w), rng.uniform(0, height - box_h)
+            dets.append([x, y, x + box_w, y + box_h, float(rng.uniform(0.3, 0.6))])
+        gt[frame] = np.array(boxes).reshape(-1, 5)
+        detections[frame] = np.array(dets).reshape(-1, 5)
+
+    crossings = []
+    for v in vehicles:
+        # The box center reaches the zone at this time (center_y == zone_top)
+        start = v["enter"] + (zone_top + box_h / 2) / v["v_px"]
+        if start + (zone_bottom - zone_top) / v["v_px"] < frames / fps:
+            crossings.append({"track_id": v["id"], "zone": zones[v["lane"]].name, "start_time": start,
+                              "speed_kmh": v["speed_kmh"]})
+    return {"frame_shape": (height, width, 3), "fps": fps, "frames": frames, "zones": zones,
+            "gt": gt, "detections": detections, "crossings": crossings}
+
+
+def trace_scenario(gt_path, detections_path, video_path, calibration_path):
+    """
+    Build a scenario from stored MOT traces of a real video.
+
+    Ground-truth crossings are derived from the ground-truth tracks with
+    reference_crossings(), using the zones of the calibration.
+
+    Args:
+        gt_path (str): MOT gt.txt of the video
+        detections_path (str): MOT det.txt of the baseline detector, e.g. from record_detections()
+        video_path (str): The video, for its frame rate and size
+        calibration_path (str): Calibration JSON with the measurement zones
+
+    Returns:
+        dict: Scenario as returned by synthetic_scenario()
+    """
+    from core.media_cache import probe_video
+    from core.pipeline import load_camera
+
+    metadata = probe_video(video_path)
+    zones, _, _ = load_camera(video_path, calibration_path)
+    gt = load_mot(gt_path)
+    detections = load_mot(detections_path)
+    frames = max([metadata["frame_count"]] + list(gt) + list(detections))
+    frame_shape = (metadata["height"], metadata["width"], 3)
+    return {"frame_shape": frame_shape, "fps": metadata["fps"], "frames": frames, "zones": zones,
+            "gt": gt, "detections": detections,
+            "crossings": reference_crossings(gt, zones, frame_shape, metadata["fps"], frames)}
+
+
+class RecordingSort(Sort):
+    """Sort that keeps the tracks of its last update, so they can be evaluated."""
+    last_tracks = np.empty((0, 5))
+
+    def update(self, dets=np.empty((0, 5))):
+        self.last_tracks = super().update(dets)
+        return self.last_tracks
+
+
+class TraceDetector:
+    def __init__(self, detections):
+        """
+        Stand-in for Detector that returns the recorded detections of the current frame.
+
+        Args:
+            detections (dict): Frame number -> [x1,y1,x2,y2,score] array
+        """
+        self.detections = detections
+        self.frame = None  # Set by the replay before each frame
+
+    def detect(self, frame):
+        return self.detections.get(self.frame, np.empty((0, 5))).copy()
+
+
+def replay(detections, zones, frame_shape, fps, frames, frame_stride=1, sort_params=None):
+    """
+    Run a detection trace through Sort and the VehicleTracker zone and speed logic.
+
+    Frames are processed as in the pipeline: every frame_stride-th frame, with the
+    frame time passed as the timestamp.
+
+    Args:
+        detections (dict): Frame number -> [x1,y1,x2,y2,score] array
+        zones (list): Zone objects
+        frame_shape (tuple): (height, width, 3) of the frames
+        fps (float): Frame rate of the trace
+        frames (int): Number of frames
+        frame_stride (int): Process every frame_stride-th frame
+        sort_params (dict, optional): max_age, min_hits and iou_threshold of Sort,
+            scaled to the stride as in the pipeline if None
+
+    Returns:
+        tuple: (tracks per processed frame as [x1,y1,x2,y2,id] arrays, speed logs)
+    """
+    detector = TraceDetector(detections)
+    sort_tracker = RecordingSort(**(sort_params or stride_sort_params(frame_stride)))
+    tracker = VehicleTracker(MODEL_PATH, os.devnull, sort_tracker=sort_tracker, detector=detector)
+    tracker.set_zones(zones)
+    frame = np.zeros(frame_shape, dtype=np.uint8)  # Only its shape is used without drawing
+    tracks = {}
+    for number in range(1, frames + 1, frame_stride):
+        detector.frame = number
+        tracker.track_objects(frame, draw=False, timestamp=number / fps)
+        tracks[number] = sort_tracker.last_tracks
+    return tracks, tracker.speed_logs
+
+
+def reference_crossings(gt, zones, frame_shape, fps, frames):
+    """
+    Derive ground-truth zone crossings from ground-truth tracks of a real video.
+
+    The true boxes and ids run through the zone logic at every frame, so the speeds
+    are the best the zones can measure.
+
+    Returns:
+        list: Crossings with track_id, zone, start_time and speed_kmh
+    """
+    tracker = VehicleTracker(MODEL_PATH, os.devnull, detector=TraceDetector({}))
+    tracker.set_zones(zones)
+    frame = np.zeros(frame_shape, dtype=np.uint8)
+    empty = np.empty((0, 5))
+    for number in range(1, frames + 1):
+        tracker.process_tracks(frame, gt.get(number, empty), tracker.next_frame_time(number / fps), draw=False)
+    return [{key: log[key] for key in ("track_id", "zone", "start_time", "speed_kmh")} for log in tracker.speed_logs]
+
+
+def tracking_metrics(gt, tracks, iou_threshold=0.5):
+    """
+    Compute CLEAR MOT (MOTA) and identity (IDF1) metrics on the frames that were tracked.
+
+    Per frame, ground-truth objects keep their previous hypothesis while the boxes
+    still overlap enough; the others are matched by maximum IoU. A ground-truth
+    object matched to another hypothesis id than before counts as an id switch.
+    IDF1 matches ground-truth and hypothesis ids once for the whole sequence.
+
+    Args:
+        gt (dict): Frame number -> [x1,y1,x2,y2,id] ground truth
+        tracks (dict): Frame number -> [x1,y1,x2,y2,id] hypotheses of the tracked frames
+        iou_threshold (float): Minimum IoU of a match
+
+    Returns:
+        dict: mota, idf1, id_switches, false_positives, misses, ground-truth objects
+    """
+    empty = np.empty((0, 5))
+    last_match = {}  # Ground-truth id -> hypothesis id it was last matched to
+    pair_counts = {}  # (gt id, hypothesis id) -> frames matched, for IDF1
+    num_gt = num_hyp = matches = switches = 0
+    for number, hyp in tracks.items():
+        truth = gt.get(number, empty)
+        num_gt += len(truth)
+        num_hyp += len(hyp)
+        if len(truth) == 0 or len(hyp) == 0:
+            continue
+        iou = iou_batch(truth[:, :4], hyp[:, :4])
+        gt_ids, hyp_ids = truth[:, 4].astype(int), hyp[:, 4].astype(int)
+        for i, j in np.argwhere(iou >= iou_threshold):
+            pair_counts[(gt_ids[i], hyp_ids[j])] = pair_counts.get((gt_ids[i], hyp_ids[j]), 0) + 1
+        # Keep the correspondences of the previous frames where possible
+        matched = {}
+        for i, gt_id in enumerate(gt_ids):
+            previous = np.flatnonzero(hyp_ids == last_match.get(gt_id, -1))
+            if len(previous) and iou[i, previous[0]] >= iou_threshold and previous[0] not in matched.values():
+                matched[i] = previous[0]
+        rest_gt = [i for i in range(len(gt_ids)) if i not in matched]
+        rest_hyp = [j for j in range(len(hyp_ids)) if j not in matched.values()]
+        if rest_gt and rest_hyp:
+            cost = 1 - iou[np.ix_(rest_gt, rest_hyp)]
+            for a, b in linear_assignment(cost):
+                if iou[rest_gt[a], rest_hyp[b]] >= iou_threshold:
+                    matched[rest_gt[a]] = rest_hyp[b]
+        for i, j in matched.items():
+            if gt_ids[i] in last_match and last_match[gt_ids[i]] != hyp_ids[j]:
+                switches += 1
+            last_match[gt_ids[i]] = hyp_ids[j]
+        matches += len(matched)
+
+    misses = num_gt - matches
+    false_positives = num_hyp - matches
+    # IDF1: one-to-one assignment of ids maximizing the frames they are matched in
+    id_true_positives = 0
+    if pair_counts:
+        gt_index = {g: k for k, g in enumerate(sorted({g for g, _ in pair_counts}))}
+        hyp_index = {h: k for k, h in enumerate(sorted({h for _, h in pair_counts}))}
+        counts = np.zeros((len(gt_index), len(hyp_index)))
+        for (g, h), count in pair_counts.items():
+            counts[gt_index[g], hyp_index[h]] = count
+        id_true_positives = int(sum(counts[a, b] for a, b in linear_assignment(-counts)))
+    return {
+        "mota": round(1 - (misses + false_positives + switches) / num_gt, 4) if num_gt else None,
+        "idf1": round(2 * id_true_positives / (num_gt + num_hyp), 4) if num_gt + num_hyp else None,
+        "id_switches": switches,
+        "false_positives": false_positives,
+        "misses": misses,
+        "gt_objects": num_gt,
+    }
+
+
+def speed_metrics(crossings, logs, time_tolerance_s=CROSSING_TIME_TOLERANCE_S):
+    """
+    Compare speed logs with ground-truth zone crossings.
+
+    Each crossing is matched to the unused log of the same zone whose entry time is
+    nearest, within time_tolerance_s.
+
+    Returns:
+        dict: Crossing recall, extra logs and absolute speed error statistics in km/h
+    """
+    unused = list(logs)
+    errors = []
+    for crossing in crossings:
+        candidates = [log for log in unused if log["zone"] == crossing["zone"]
+                      and abs(log["start_time"] - crossing["start_time"]) <= time_tolerance_s]
+        if not candidates:
+            continue
+        log = min(candidates, key=lambda c: abs(c["start_time"] - crossing["start_time"]))
+        unused.remove(log)
+        errors.append(log["speed_kmh"] - crossing["speed_kmh"])
+    errors = np.array(errors)
+    return {
+        "crossings": len(crossings),
+        "recall": round(len(errors) / len(crossings), 4) if crossings else None,
+        "extra_logs": len(unused),
+        "mae_kmh": round(float(np.abs(errors).mean()), 3) if len(errors) else None,
+        "p95_abs_error_kmh": round(float(np.percentile(np.abs(errors), 95)), 3) if len(errors) else None,
+        "max_abs_error_kmh": round(float(np.abs(errors).max()), 3) if len(errors) else None,
+        "bias_kmh": round(float(errors.mean()), 3) if len(errors) else None,
+    }
+
+
+def check_regression(baseline, candidate, tolerances):
+    """
+    List the metrics of a mode that degraded more than tolerated compared to the baseline.
+
+    Args:
+        baseline (dict): Metrics of the baseline mode
+        candidate (dict): Metrics of the mode
+        tolerances (dict): Maximum drop of mota, idf1 and speed recall, and maximum
+            increase of the speed mean absolute error (speed_mae_kmh)
+
+    Returns:
+        list: Failure descriptions, empty if the mode is within tolerance
+    """
+    failures = []
+    checks = (("mota", candidate["tracking"]["mota"], baseline["tracking"]["mota"], -1),
+              ("idf1", candidate["tracking"]["idf1"], baseline["tracking"]["idf1"], -1),
+              ("speed_recall", candidate["speed"]["recall"], baseline["speed"]["recall"], -1),
+              ("speed_mae_kmh", candidate["speed"]["mae_kmh"], baseline["speed"]["mae_kmh"], 1))
+    for name, value, reference, direction in checks:
+        if reference is None:
+            continue
+        if value is None:
+            failures.append(f"{name}: no value (baseline {reference})")
+        elif direction * (value - reference) > tolerances[name]:
+            failures.append(f"{name}: {value} vs baseline {reference} (tolerance {tolerances[name]})")
+    return failures
+
+
+def run_accuracy_harness(scenario, modes, tolerances=None, iou_threshold=0.5):
+    """
+    Evaluate tracking modes on one scenario and check them against the first mode.
+
+    Args:
+        scenario (dict): frame_shape, fps, frames, zones, gt, detections and crossings,
+            e.g. from synthetic_scenario()
+        modes (list): Dicts with a name and optionally frame_stride, sort (Sort
+            parameters) and detections (another trace of the same frames, e.g. from a
+            quantized backend); the first mode is the baseline
+        tolerances (dict, optional): See check_regression, ACCURACY_TOLERANCES if None
+        iou_threshold (float): Minimum IoU of a tracking match
+
+    Returns:
+        dict: Metrics and failures per mode, and whether all modes passed
+    """
+    tolerances = dict(ACCURACY_TOLERANCES, **(tolerances or {}))
+    results = []
+    for mode in modes:
+        tracks, logs = replay(mode.get("detections", scenario["detections"]), scenario["zones"],
+                              scenario["frame_shape"], scenario["fps"], scenario["frames"],
+                              frame_stride=mode.get("frame_stride", 1), sort_params=mode.get("sort"))
+        result = {
+            "name": mode["name"],
+            "frame_stride": mode.get("frame_stride", 1),
+            "tracking": tracking_metrics(scenario["gt"], tracks, iou_threshold),
+            "speed": speed_metrics(scenario["crossings"], logs),
+        }
+        result["failures"] = check_regression(results[0], result, tolerances) if results else []
+        print(f"[INFO] {result['name']}: {result['tracking']} {result['speed']}")
+        for failure in result["failures"]:
+            print(f"[ERROR] {result['name']} degraded {failure}")
+        results.append(result)
+    return {"tolerances": tolerances, "modes": results, "passed": not any(r["failures"] for r in results)}
@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import socket
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+
+from core.detector import BACKENDS, Detector, sample_frames
+from core.motion_gate import MotionGate
+from core.vehicle_tracker import VehicleTracker, stride_sort_params
+from core.sort import Sort
+from core.zones import ZoneMap
+from core.pipeline import load_camera
+from core.ffmpeg_executor import FFmpegError, get_executor
+from config import (MODEL_PATH, REAL_DISTANCE_METERS, MOTION_GATE_MIN_RATIO, MOTION_GATE_BAND_MARGIN,
+                    INFERENCE_MAX_BATCH_SIZE, AUTOTUNE_PROFILE_PATH)
+
+# Candidate values per knob, cheapest first
+AUTOTUNE_SEARCH_SPACE = {
+    "backend": ("openvino-int8", "onnx-int8", "openvino", "onnx", "pytorch"),
+    "imgsz": (320, 416, 480, 544, 640),
+    "frame_stride": (4, 3, 2, 1),
+    "motion_gate_band_margin": (0, 25, 50, 100),
+}
+# Settings of process_video_job a profile may set
+PROFILE_JOB_OPTIONS = ("backend", "default_imgsz", "frame_stride", "motion_gate", "motion_gate_band_margin")
+
+
+def cut_sample(video_path, seconds, output_path):
+    """Copy the first seconds of a video without re-encoding."""
+    try:
+        get_executor().run_sync(["ffmpeg", "-y", "-i", video_path, "-t", str(seconds), "-map", "0:v:0",
+                                 "-c", "copy", output_path], label="autotune-sample")
+    except FFmpegError as e:
+        raise Exception(f"Failed to cut the autotune sample: {e} {e.stderr}")
+
+
+def run_trial(sample_path, calibration_path, settings, detector=None):
+    """
+    Track the vehicles of a sample with one set of settings, without writing outputs.
+
+    Args:
+        sample_path (str): Sample video
+        calibration_path (str): Calibration of the camera
+        settings (dict): backend, imgsz, frame_stride and motion_gate_band_margin
+            (None disables the motion gate)
+        detector (Detector, optional): Loaded detector matching the settings
+
+    Returns:
+        dict: Speed logs, source frames, frames per second and wall-clock span of the trial
+    """
+    zones, homography, _ = load_camera(sample_path, calibration_path)
+    if detector is None:
+        detector = Detector(MODEL_PATH, backend=settings["backend"], imgsz=settings["imgsz"])
+    gate = None
+    if settings["motion_gate_band_margin"] is not None:
+        y_min, y_max = ZoneMap(zones).vertical_extent()
+        margin = settings["motion_gate_band_margin"]
+        gate = MotionGate(method="diff", min_motion_ratio=MOTION_GATE_MIN_RATIO, band=(y_min - margin, y_max + margin))
+    tracker = VehicleTracker(MODEL_PATH, os.devnull, video_path=sample_path, real_distance_meters=REAL_DISTANCE_METERS,
+                             motion_gate=gate, sort_tracker=Sort(**stride_sort_params(settings["frame_stride"])),
+                             detector=detector)
+    tracker.set_zones(zones)
+    tracker.set_ground_plane(homography)
+
+    cap = cv2.VideoCapture(sample_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    stride = settings["frame_stride"]
+    index = 0
+    started_at = time.time()
+    start = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        tracker.track_objects(frame, draw=False, timestamp=(index + 1) / fps)
+        index += 1
+        for _ in range(stride - 1):
+            if not cap.grab():
+                break
+            index += 1
+    seconds = time.perf_counter() - start
+    cap.release()
+    return {"logs": tracker.speed_logs, "frames": index, "fps": index / seconds if seconds > 0 else None,
+            "started_at": started_at, "finished_at": time.time()}
+
+
+def _timed_trial(sample_path, calibration_path, settings):
+    """Worker process entry of the worker-count measurement."""
+    outcome = run_trial(sample_path, calibration_path, settings)
+    return outcome["frames"], outcome["started_at"], outcome["finished_at"]
+
+
+def speed_agreement(baseline, candidate, speed_tolerance_kmh=3.0, time_tolerance_s=0.5):
+    """
+    Compare the speed measurements of a trial with those of the baseline.
+
+    A baseline log is reproduced when the candidate logged the same zone with a start
+    time within time_tolerance_s and a speed within speed_tolerance_kmh. Missed and
+    extra measurements both lower the agreement.
+
+    Args:
+        baseline (list): Speed logs of the full-quality run
+        candidate (list): Speed logs of the trial
+        speed_tolerance_kmh (float): Maximum speed difference of a reproduced log
+        time_tolerance_s (float): Maximum start time difference of a reproduced log
+
+    Returns:
+        float: Reproduced logs / max(baseline logs, candidate logs), 1.0 if both are empty
+    """
+    if not baseline and not candidate:
+        return 1.0
+    unused = list(candidate)
+    reproduced = 0
+    for log in baseline:
+        matches = [c for c in unused if c["zone"] == log["zone"]
+                   and abs(c["start_time"] - log["start_time"]) <= time_tolerance_s]
+        if not matches:
+            continue
+        match = min(matches, key=lambda c: abs(c["start_time"] - log["start_time"]))
+        unused.remove(match)
+        if abs(match["speed_kmh"] - log["speed_kmh"]) <= speed_tolerance_kmh:
+            reproduced += 1
+    return reproduced / max(len(baseline), len(candidate))
+
+
+def _measure_batch_size(settings, frames, sizes=(1, 2, 4, 8, 16)):
+    """Pick the inference server batch size with the best frames per second."""
+    detector = Detector(MODEL_PATH, backend=settings["backend"], imgsz=settings["imgsz"])
+    detector.detect_batch(frames[:1])
+    results = {}
+    for size in sizes:
+        batches = [frames[i:i + size] for i in range(0, len(frames) - size + 1, size)]
+        if not batches:
+            break
+        start = time.perf_counter()
+        for batch in batches:
+            detector.detect_batch(batch)
+        results[size] = round(sum(len(b) for b in batches) / (time.perf_counter() - start), 2)
+        print(f"[INFO] Batch size {size}: {results[size]} fps")
+    best = max(results, key=results.get) if results else INFERENCE_MAX_BATCH_SIZE
+    return best, results
+
+
+def _measure_workers(sample_path, calibration_path, settings, max_workers):
+    """Pick the batch worker count with the best aggregate frames per second."""
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    workers = 1
+    while workers <= max_workers:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            outcomes = list(executor.map(_timed_trial, [sample_path] * workers, [calibration_path] * workers,
+                                         [settings] * workers))
+        # Frames of all workers over the span of their frame loops, model loading excluded
+        span = max(o[2] for o in outcomes) - min(o[1] for o in outcomes)
+        results[workers] = round(sum(o[0] for o in outcomes) / span, 2) if span > 0 else 0.0
+        print(f"[INFO] {workers} workers: {results[workers]} fps")
+        # Stop once another doubling gains less than 10%
+        if workers > 1 and results[workers] < 1.1 * results[workers // 2]:
+            break
+        workers *= 2
+    return max(results, key=results.get), results
+
+
+def autotune(video_path, calibration_path, target_accuracy=0.95, sample_seconds=60,
+             search_space=None, max_workers=None, profile_path=AUTOTUNE_PROFILE_PATH):
+    """
+    Find the fastest pipeline settings on this machine that keep speed measurements accurate.
+
+    Short trials run on a sample of a real video. The baseline is full quality (PyTorch,
+    largest size, every frame, no motion gate). The search is greedy per knob: for each
+    knob in turn, candidates are tried cheapest first with the other knobs at their
+    current best, and the fastest one whose speed agreement with the baseline meets
+    target_accuracy is kept. Finally the inference batch size and the number of batch
+    workers are measured for the chosen settings.
+
+    Args:
+        video_path (str): Representative video
+        calibration_path (str): Calibration of the video's camera
+        target_accuracy (float): Minimum speed agreement with the baseline (0-1)
+        sample_seconds (float): Length of the sample the trials run on
+        search_space (dict, optional): Candidate values per knob, AUTOTUNE_SEARCH_SPACE if None
+        max_workers (int, optional): Largest worker count tried, the CPU count if None
+        profile_path (str): Path the profile is written to
+
+    Returns:
+        dict: The profile
+    """
+    search_space = search_space or AUTOTUNE_SEARCH_SPACE
+    with tempfile.TemporaryDirectory() as directory:
+        sample_path = os.path.join(directory, f"sample{os.path.splitext(video_path)[1] or '.mp4'}")
+        cut_sample(video_path, sample_seconds, sample_path)
+        trials = []
+        detectors = {}  # Loaded once per backend and size
+
+        def trial(settings):
+            key = (settings["backend"], settings["imgsz"])
+            if key not in detectors:
+                try:
+                    detectors[key] = Detector(MODEL_PATH, backend=key[0], imgsz=key[1])
+                except FileNotFoundError as e:
+                    print(f"[WARN] Skipping backend '{key[0]}': {e}")
+                    detectors[key] = None
+            if detectors[key] is None:
+                return None
+            detectors[key].detect(np.zeros((64, 64, 3), dtype=np.uint8))  # Warm up
+            outcome = run_trial(sample_path, calibration_path, settings, detector=detectors[key])
+            outcome["accuracy"] = speed_agreement(baseline["logs"], outcome["logs"]) if trials else 1.0
+            trials.append({"settings": dict(settings), "fps": round(outcome["fps"], 2),
+                           "accuracy": round(outcome["accuracy"], 4), "logs": len(outcome["logs"])})
+            print(f"[INFO] Trial {trials[-1]}")
+            return outcome
+
+        best = {"backend": "pytorch", "imgsz": max(search_space["imgsz"]), "frame_stride": 1,
+                "motion_gate_band_margin": None}
+        baseline = trial(best)
+        if baseline is None or not baseline["logs"]:
+            raise Exception("The baseline measured no speeds; use a longer sample or another video")
+        best_fps = baseline["fps"]
+        for knob in ("backend", "imgsz", "frame_stride", "motion_gate_band_margin"):
+            for value in search_space[knob]:
+                if knob == "backend" and value not in BACKENDS:
+                    continue
+                settings = dict(best, **{knob: value})
+                if settings == best:
+                    continue
+                outcome = trial(settings)
+                if outcome is None or outcome["accuracy"] < target_accuracy:
+                    continue
+                if outcome["fps"] > best_fps:
+                    best, best_fps = settings, outcome["fps"]
+                    break  # Candidates are ordered cheapest first
+        accuracy = next(t["accuracy"] for t in reversed(trials) if t["settings"] == best)
+
+        batch_size, batch_fps = _measure_batch_size(best, sample_frames(sample_path, 32))
+        workers, worker_fps = _measure_workers(sample_path, calibration_path, best,
+                                               max_workers or os.cpu_count() or 1)
+
+    profile = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": socket.gethostname(),
+        "video_path": video_path,
+        "target_accuracy": target_accuracy,
+        "settings": {
+            "backend": best["backend"],
+            "default_imgsz": best["imgsz"],
+            "frame_stride": best["frame_stride"],
+            "motion_gate": None if best["motion_gate_band_margin"] is None else "diff",
+            "motion_gate_band_margin": MOTION_GATE_BAND_MARGIN if best["motion_gate_band_margin"] is None
+            else best["motion_gate_band_margin"],
+            "batch_size": batch_size,
+            "workers": workers,
+        },
+        "fps": best_fps,
+        "baseline_fps": baseline["fps"],
+        "accuracy": accuracy,
+        "batch_size_fps": batch_fps,
+        "workers_fps": worker_fps,
+        "trials": trials,
+    }
+    with open(profile_path, 'w') as f:
+        json.dump(profile, f, indent=4)
+    print(f"[INFO] Autotune profile saved to {profile_path}: {profile['settings']}")
+    return profile
+
+
+def load_profile(profile_path=AUTOTUNE_PROFILE_PATH):
+    """
+    Load the settings of the autotune profile.
+
+    Returns:
+        dict: Tuned settings (process_video_job options plus batch_size and workers),
+            empty if no profile was written
+    """
+    if not profile_path or not os.path.exists(profile_path):
+        return {}
+    try:
+        with open(profile_path, 'r') as f:
+            return json.load(f)["settings"]
+    except Exception as e:
+        print(f"[WARN] Ignoring unreadable autotune profile {profile_path}: {e}")
+        return {}
+
+
+def profile_job_options(profile_path=AUTOTUNE_PROFILE_PATH):
+    """Get the process_video_job options of the autotune profile."""
+    settings = load_profile(profile_path)
+    return {key: settings[key] for key in PROFILE_JOB_OPTIONS if key in settings}
@@ -0,0 +1,172 @@
+import os
+import csv
+import json
+import time
+import inspect
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core.pipeline import ensure_directories, migrate_database, is_job_done, process_video_job
+
+# Video file extensions picked up when scanning a directory
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+# Per-job options a manifest may set: the process_video_job options that are plain values
+MANIFEST_OPTIONS = tuple(name for name in inspect.signature(process_video_job).parameters
+                         if name not in ("video_path", "calibration_path", "detector", "cancel_event"))
+
+
+def _parse_csv_value(value):
+    """Convert CSV manifest values to booleans, numbers or None (empty); others stay strings."""
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    if not value:
+        return None
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    for number in (int, float):
+        try:
+            return number(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _check_manifest_entry(number, entry):
+    """Reject manifest entries without video and calibration or with unknown options."""
+    if not isinstance(entry, dict):
+        raise ValueError(f"Manifest entry {number}: expected an object, got {entry!r}")
+    missing = [key for key in ("video", "calibration") if not entry.get(key)]
+    if missing:
+        raise ValueError(f"Manifest entry {number}: missing {', '.join(missing)}")
+    unknown = sorted(key for key in entry if key not in ("video", "calibration") and key not in MANIFEST_OPTIONS)
+    if unknown:
+        raise ValueError(f"Manifest entry {number}: unknown options {', '.join(unknown)} "
+                         f"(expected {', '.join(MANIFEST_OPTIONS)})")
+
+
+def discover_jobs(video_dir=None, calibration_dir=None, manifest=None):
+    """
+    Build the list of videos to process.
+
+    Jobs come either from a manifest (JSON list of objects or CSV with 'video' and
+    'calibration' columns, plus optional per-job options) or from a directory of
+    videos, paired with '<video filename>.json' files in the calibration directory.
+
+    Args:
+        video_dir (str, optional): Directory containing the videos
+        calibration_dir (str, optional): Directory containing the calibration files
+        manifest (str, optional): Path to a JSON or CSV manifest
+
+    Returns:
+        list: Job dicts with 'video', 'calibration' and optional options
+
+    Raises:
+        ValueError: If a manifest entry lacks a path or sets an unknown option
+    """
+    jobs = []
+    if manifest:
+        with open(manifest, 'r', newline='') as f:
+            if manifest.endswith('.csv'):
+                entries = [{k: _parse_csv_value(v) for k, v in row.items()} for row in csv.DictReader(f)]
+            else:
+                entries = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(manifest))
+        for number, entry in enumerate(entries, start=1):
+            _check_manifest_entry(number, entry)
+            job = dict(entry)
+            # Relative paths in a manifest are resolved against the manifest location
+            for key in ("video", "calibration"):
+                if not os.path.isabs(job[key]):
+                    job[key] = os.path.join(base_dir, job[key])
+            jobs.append(job)
+        return jobs
+
+    if not video_dir or not calibration_dir:
+        raise ValueError("Either a manifest or both a video and a calibration directory are required")
+    for filename in sorted(os.listdir(video_dir)):
+        if not filename.lower().endswith(VIDEO_EXTENSIONS):
+            continue
+        calibration_path = os.path.join(calibration_dir, f"{filename}.json")
+        if not os.path.exists(calibration_path):
+            print(f"[WARN] No calibration for {filename}, skipping")
+            continue
+        jobs.append({"video": os.path.join(video_dir, filename), "calibration": calibration_path})
+    return jobs
+
+
+def _run_job(job, options):
+    """
+    Process a single batch job in a worker process.
+
+    Args:
+        job (dict): Job with 'video', 'calibration' and optional per-job options
+        options (dict): Default pipeline options
+
+    Returns:
+        dict: Job outcome with status, result or error and wall time
+    """
+    start = time.perf_counter()
+    job_options = dict(options)
+    job_options.update({k: v for k, v in job.items() if k not in ("video", "calibration") and v not in (None, "")})
+    try:
+        result = process_video_job(job["video"], job["calibration"], **job_options)
+        return {"video": job["video"], "status": "success", "result": result,
+                "seconds": time.perf_counter() - start}
+    except Exception as e:
+        print(f"[ERROR] Processing {job['video']} failed: {e}")
+        return {"video": job["video"], "status": "failed", "error": str(e),
+                "seconds": time.perf_counter() - start}
+
+
+def run_batch(jobs, workers=1, force=False, **options):
+    """
+    Process a list of jobs across worker processes.
+
+    Args:
+        jobs (list): Job dicts from discover_jobs
+        workers (int): Number of worker processes
+        force (bool): Reprocess videos that already have a job summary
+        **options: Pipeline options passed to process_video_job
+
+    Returns:
+        dict: Throughput summary of the batch
+    """
+    ensure_directories()
+    migrate_database()
+    pending, skipped = [], []
+    for job in jobs:
+        if not force and is_job_done(os.path.basename(job["video"])):
+            skipped.append(job["video"])
+        else:
+            pending.append(job)
+    print(f"[INFO] {len(pending)} videos to process, {len(skipped)} already done")
+
+    outcomes = []
+    batch_start = time.perf_counter()
+    if pending:
+        # Spawned workers avoid inheriting model/thread state from the parent process
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(_run_job, job, options) for job in pending]
+            for future in as_completed(futures):
+                outcome = future.result()
+                outcomes.append(outcome)
+                print(f"[INFO] {outcome['status']}: {outcome['video']} in {outcome['seconds']:.1f} s "
+                      f"({len(outcomes)}/{len(pending)})")
+    wall_seconds = time.perf_counter() - batch_start
+
+    succeeded = [o for o in outcomes if o["status"] == "success"]
+    frames = sum(o["result"]["throughput"]["frames"] for o in succeeded)
+    return {
+        "videos": len(jobs),
+        "processed": len(succeeded),
+        "failed": [{"video": o["video"], "error": o["error"]} for o in outcomes if o["status"] == "failed"],
+        "skipped": len(skipped),
+        "workers": workers,
+        "frames": frames,
+        "reports": sum(o["result"]["reports"] for o in succeeded),
+        "wall_seconds": round(wall_seconds, 2),
+        "fps": round(frames / wall_seconds, 2) if wall_seconds > 0 else None,
+        "videos_per_hour": round(3600 * len(succeeded) / wall_seconds, 2) if wall_seconds > 0 else None,
+    }
@@ -2,6 +2,12 @@ import cv2
 import numpy as np
 import os
 import json
+from core.zones import Zone
+from core.ground_plane import ground_homography
+from core.media_cache import probe_video
+
+# Lateral world coordinate (meters) of the default marker lines
+MARKER_LATERAL_OFFSET = 3.5
 
 class CameraCalibrator:
     def __init__(self, video_path, snapshot_path=None):
@@ -22,6 +28,9 @@ class CameraCalibrator:
         self.rvec = None  # Rotation vector
         self.tvec = None  # Translation vector
         self.marker_lines = {}  # Stores distance marker positions
+        self.zones = []  # Measurement zones (Zone objects) for lanes/segments
+        self.ground_homography = None  # Image-to-ground-plane homography (pixels -> meters)
+        self.inference = {}  # Tuned detector settings of this camera, e.g. {'imgsz': 480}
 
     def load_image(self):
         """Load an image from either existing snapshot or video file."""
@@ -77,8 +86,12 @@ class CameraCalibrator:
         if len(self.image_points) < 4:
             raise Exception("Need at least 4 points for calibration")
             
-        self.load_image()
-        h, w = self.image.shape[:2]
+        # Image size from the loaded image, or from the cached probe of the video
+        if self.image is not None:
+            h, w = self.image.shape[:2]
+        else:
+            metadata = probe_video(self.video_path)
+            h, w = metadata["height"], metadata["width"]
         
         # Initialize intrinsic matrix with reasonable defaults
         self.intrinsic = np.array([
@@ -103,44 +116,122 @@ class CameraCalibrator:
             raise Exception("Calibration failed")
         self.rvec = rvec
         self.tvec = tvec
+        # Precompute the pixel-to-ground map once, so speeds need no per-track solves
+        self.ground_homography = ground_homography(self.intrinsic, self.rvec, self.tvec)
 
-    def draw_distance_markers(self):
+    def project_world_points(self, world_points):
         """
-        Draw distance markers on the image based on the calibration.
-        Projects 3D points at known distances onto the image plane.
+        Project ground-plane world points onto the image plane.
+
+        Args:
+            world_points (list): List of [x, y, z] world points in meters
+
+        Returns:
+            numpy.ndarray: Array of [x, y] image points
         """
         if self.rvec is None or self.tvec is None:
             raise Exception("Camera not calibrated yet")
-            
+        world_points = np.array(world_points, dtype=np.float32).reshape(-1, 3)
+        img_points, _ = cv2.projectPoints(world_points, self.rvec, self.tvec,
+                                          self.intrinsic, self.dist_coeffs)
+        return img_points.reshape(-1, 2)
+
+    def build_zones(self, zone_specs):
+        """
+        Build measurement zones from zone specifications.
+
+        Each specification is a dict with a 'name' and optional 'lane' and one of:
+            - 'polygon' ([[x, y], ...] image points) and 'distance_m'
+            - 'lines' ([y1, y2] image rows of a full-width band) and 'distance_m'
+            - 'x_start', 'x_end', 'y_min', 'y_max': a lane segment in world meters,
+              projected to an image polygon; distance is |x_end - x_start|
+            - 'x_start', 'x_end': a pair of world distance lines projected at the
+              default lateral offset, like the green and red markers
+
+        Args:
+            zone_specs (list): List of zone specification dicts
+
+        Returns:
+            list: The built Zone objects (also stored in self.zones)
+
+        Raises:
+            ValueError: If a specification is invalid
+        """
+        zones = []
+        for i, spec in enumerate(zone_specs):
+            if not isinstance(spec, dict):
+                raise ValueError(f"Invalid zone specification: {spec}")
+            name = spec.get("name") or f"zone_{i + 1}"
+            lane = spec.get("lane")
+            try:
+                if "polygon" in spec:
+                    zone = Zone(name, spec["distance_m"], polygon=spec["polygon"], lane=lane)
+                elif "lines" in spec:
+                    zone = Zone(name, spec["distance_m"], band=spec["lines"], lane=lane)
+                elif "x_start" in spec and "x_end" in spec:
+                    x_start, x_end = float(spec["x_start"]), float(spec["x_end"])
+                    distance = abs(x_end - x_start)
+                    if "y_min" in spec and "y_max" in spec:
+                        y_min, y_max = float(spec["y_min"]), float(spec["y_max"])
+                        corners = self.project_world_points([
+                            [x_start, y_min, 0.0], [x_end, y_min, 0.0],
+                            [x_end, y_max, 0.0], [x_start, y_max, 0.0]
+                        ])
+                        zone = Zone(name, distance, polygon=corners.tolist(), lane=lane)
+                    else:
+                        ends = self.project_world_points([
+                            [x_start, MARKER_LATERAL_OFFSET, 0.0], [x_end, MARKER_LATERAL_OFFSET, 0.0]
+                        ])
+                        zone = Zone(name, distance, band=(int(ends[0][1]), int(ends[1][1])), lane=lane)
+                else:
+                    raise ValueError(f"Invalid zone specification: {spec}")
+            except (KeyError, TypeError, IndexError) as e:
+                # Missing keys or malformed points and distances
+                raise ValueError(f"Invalid zone specification {spec}: {e!r}") from e
+            print(f"Built zone {zone.to_dict()}")
+            zones.append(zone)
+        self.zones = zones
+        return zones
+
+    def compute_marker_lines(self, distances=(20, 40)):
+        """
+        Compute the image rows of the distance markers without loading the image.
+
+        Args:
+            distances (tuple): Two marker distances in meters, the green (closer)
+                and red (farther) lines
+
+        Returns:
+            dict: Maps 'green' and 'red' to the marker y-coordinates (also stored in self.marker_lines)
+        """
+        if self.rvec is None or self.tvec is None:
+            raise Exception("Camera not calibrated yet")
+
+        # Project 3D points at distance x meters from camera (assuming y=3.5m, z=0)
+        img_points = self.project_world_points([[float(x), MARKER_LATERAL_OFFSET, 0.0] for x in distances])
+        self.marker_lines = {'green': int(img_points[0][1]), 'red': int(img_points[1][1])}
+        print(f"Marker lines: {self.marker_lines}")
+        return self.marker_lines
+
+    def draw_distance_markers(self, distances=(20, 40)):
+        """
+        Draw distance markers on the image based on the calibration.
+        Projects 3D points at known distances onto the image plane.
+
+        Args:
+            distances (tuple): Two marker distances in meters, drawn as the green
+                (closer) and red (farther) lines
+        """
+        self.compute_marker_lines(distances)
         self.load_image()
-        image_height, image_width = self.image.shape[:2]
-        self.marker_lines = {}
-        
-        # Define distances to mark (in meters) with their colors and names
-        distances = [(20, (0, 255, 0), 'green'), (40, (0, 0, 255), 'red')]
-        
-        for x, color, name in distances:
-            print(f"Processing distance marker: x={x}, color={color}, name={name}")
-            
-            # Create 3D point at distance x meters from camera (assuming y=3.5m, z=0)
-            world_point = np.array([[float(x), 3.5, 0.0]], dtype=np.float32)
-            
-            # Project 3D point to 2D image coordinates
-            img_point, _ = cv2.projectPoints(world_point, self.rvec, self.tvec,
-                                            self.intrinsic, self.dist_coeffs)
-            print(f"Projected image point: {img_point}")
-            
-            y2d = int(img_point[0][0][1])  # Extract y-coordinate
-            print(f"Calculated y2d: {y2d}")
-            
-            # Store and draw the marker line
-            self.marker_lines[name] = y2d
+        image_width = self.image.shape[1]
+
+        for x, color, name in [(distances[0], (0, 255, 0), 'green'), (distances[1], (0, 0, 255), 'red')]:
+            y2d = self.marker_lines[name]
             cv2.line(self.image, (0, y2d), (image_width, y2d), color, 2)
-            
+
             # Add distance text label
-            text = str(x) + "m"
-            print(f"Text to draw: {text}")
-            cv2.putText(self.image, text, (5, y2d - 10),
+            cv2.putText(self.image, str(x) + "m", (5, y2d - 10),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
     def save_calibration(self, file_path):
@@ -159,8 +250,12 @@ class CameraCalibrator:
             'rvec': self.rvec.tolist(),
             'tvec': self.tvec.tolist(),
             'image_points': self.image_points.tolist(),
-            'object_points': self.object_points.tolist()
+            'object_points': self.object_points.tolist(),
+            'zones': [zone.to_dict() for zone in self.zones],
+            'ground_homography': self.ground_homography.tolist()
         }
+        if self.inference:
+            calibration_data['inference'] = self.inference
         
         with open(file_path, 'w') as f:
             json.dump(calibration_data, f, indent=4)
@@ -185,5 +280,12 @@ class CameraCalibrator:
         self.tvec = np.array(calibration_data['tvec'], dtype=np.float32)
         self.image_points = np.array(calibration_data['image_points'], dtype=np.float32)
         self.object_points = np.array(calibration_data['object_points'], dtype=np.float32)
+        self.zones = [Zone.from_dict(zone) for zone in calibration_data.get('zones', [])]
+        # Calibration files written before the homography was cached get it computed here
+        if 'ground_homography' in calibration_data:
+            self.ground_homography = np.array(calibration_data['ground_homography'], dtype=np.float64)
+        else:
+            self.ground_homography = ground_homography(self.intrinsic, self.rvec, self.tvec)
+        self.inference = calibration_data.get('inference', {})
         
         print(f"Calibration loaded from {file_path}")
\ No newline at end of file
@@ -0,0 +1,98 @@
+import os
+import glob
+import pickle
+
+# Bump when the checkpoint layout changes; older checkpoints are ignored
+CHECKPOINT_VERSION = 3
+# Keys a checkpoint must have to be resumed, in its state and in the tracker state
+REQUIRED_STATE_KEYS = ("frame_offset", "segments", "tracker")
+REQUIRED_TRACKER_KEYS = ("sort", "vehicle_data", "speed_logs", "frame_count", "fps", "motion_gate")
+
+
+class CheckpointStore:
+    def __init__(self, checkpoint_path, job_key):
+        """
+        Initialize the checkpoint store of one processing job.
+
+        Args:
+            checkpoint_path (str): Path of the checkpoint file
+            job_key (dict): Identifies the job (input paths and output-affecting options);
+                a checkpoint written for a different key is not resumed
+        """
+        self.checkpoint_path = checkpoint_path
+        self.job_key = job_key
+
+    def load(self):
+        """
+        Load the checkpoint of the job if one exists and matches.
+
+        Returns:
+            dict: Checkpointed state, or None if the job starts from frame 0
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        try:
+            with open(self.checkpoint_path, 'rb') as f:
+                checkpoint = pickle.load(f)
+        except Exception as e:
+            print(f"[WARN] Ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+            return None
+        if not isinstance(checkpoint, dict) or checkpoint.get("version") != CHECKPOINT_VERSION:
+            print(f"[WARN] Ignoring checkpoint {self.checkpoint_path} of another checkpoint version")
+            return None
+        if checkpoint.get("job_key") != self.job_key:
+            print(f"[WARN] Ignoring checkpoint {self.checkpoint_path} written for a different job")
+            return None
+        state = checkpoint.get("state")
+        missing = [key for key in REQUIRED_STATE_KEYS if not isinstance(state, dict) or key not in state]
+        if not missing:
+            missing = [f"tracker.{key}" for key in REQUIRED_TRACKER_KEYS
+                       if not isinstance(state["tracker"], dict) or key not in state["tracker"]]
+        if missing:
+            print(f"[WARN] Ignoring incomplete checkpoint {self.checkpoint_path}, missing {', '.join(missing)}")
+            return None
+        print(f"[INFO] Resuming from checkpoint at frame {checkpoint['state']['frame_offset']}")
+        return checkpoint["state"]
+
+    def save(self, state):
+        """
+        Atomically write a checkpoint, so that a crash during the write keeps the previous one.
+
+        Args:
+            state (dict): State to checkpoint
+        """
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({"version": CHECKPOINT_VERSION, "job_key": self.job_key, "state": state}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clear(self):
+        """Remove the checkpoint after the job completed."""
+        for path in (self.checkpoint_path, f"{self.checkpoint_path}.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def segment_path(output_video_path, index):
+    """Get the path of an annotated output segment."""
+    root, ext = os.path.splitext(output_video_path)
+    return f"{root}.part{index:05d}{ext}"
+
+
+def remove_segments(output_video_path, keep=0):
+    """
+    Delete annotated output segments, keeping the first `keep` ones.
+
+    Args:
+        output_video_path (str): Path of the final annotated video
+        keep (int): Number of leading segments to keep
+    """
+    root, ext = os.path.splitext(output_video_path)
+    for path in glob.glob(f"{glob.escape(root)}.part*{ext}"):
+        index = path[len(root) + len(".part"):-len(ext) if ext else None]
+        if not index.isdigit() or int(index) >= keep:
+            os.remove(path)
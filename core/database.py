@@ -1,5 +1,5 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, Json, execute_values
 from datetime import datetime
 import uuid
 from config import SPEED_THRESHOLD_KMH 
@@ -36,7 +36,22 @@ class Database:
             self.conn.close()
             print("Database connection closed")
 
-    def insert_report(self, track_id, speed_kmh, duration_s, timestamp, clip_path, video_filename):
+    def add_preview_columns(self):
+        """Add the poster and sprite columns to the reports table if they don't exist."""
+        try:
+            self.cursor.execute("""
+                ALTER TABLE reports
+                ADD COLUMN IF NOT EXISTS poster_path TEXT,
+                ADD COLUMN IF NOT EXISTS sprite_path TEXT
+            """)
+            self.conn.commit()
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"Error adding preview columns: {e}")
+            raise
+
+    def insert_report(self, track_id, speed_kmh, duration_s, timestamp, clip_path, video_filename,
+                      poster_path=None, sprite_path=None):
         """
         Insert a new speed report into the reports table.
         
@@ -47,6 +62,8 @@ class Database:
             timestamp (float): Unix timestamp of the measurement
             clip_path (str): Path to the video clip of the violation
             video_filename (str): Source video filename
+            poster_path (str, optional): URL of the poster frame
+            sprite_path (str, optional): URL of the preview sprite sheet
             
         Returns:
             str: The generated UUID report_id
@@ -54,8 +71,9 @@ class Database:
         try:
             report_id = str(uuid.uuid4())  # Generate unique ID for the report
             query = """
-                INSERT INTO reports (id, track_id, speed_kmh, duration_s, timestamp, clip_path, video_filename)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO reports (id, track_id, speed_kmh, duration_s, timestamp, clip_path, video_filename,
+                                     poster_path, sprite_path)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
             # Execute the query with parameters
             self.cursor.execute(query, (
@@ -65,7 +83,9 @@ class Database:
                 duration_s,
                 datetime.fromtimestamp(timestamp),  # Convert timestamp to datetime
                 clip_path,
-                video_filename
+                video_filename,
+                poster_path,
+                sprite_path
             ))
             self.conn.commit()  # Commit the transaction
             print(f"Inserted report for track_id {track_id}")
@@ -75,6 +95,79 @@ class Database:
             print(f"Error inserting report: {e}")
             raise
 
+    def insert_reports(self, reports):
+        """
+        Insert several speed reports in one transaction.
+        
+        Args:
+            reports (list): Dictionaries with the arguments of insert_report
+            
+        Returns:
+            list: The generated UUID report_ids
+        """
+        try:
+            rows = [(
+                str(uuid.uuid4()),
+                report["track_id"],
+                report["speed_kmh"],
+                report["duration_s"],
+                datetime.fromtimestamp(report["timestamp"]),
+                report["clip_path"],
+                report["video_filename"],
+                report.get("poster_path"),
+                report.get("sprite_path")
+            ) for report in reports]
+            execute_values(self.cursor, """
+                INSERT INTO reports (id, track_id, speed_kmh, duration_s, timestamp, clip_path, video_filename,
+                                     poster_path, sprite_path)
+                VALUES %s
+            """, rows)
+            self.conn.commit()  # One commit for the whole batch
+            return [row[0] for row in rows]
+        except psycopg2.Error as e:
+            self.conn.rollback()  # Rollback on error
+            print(f"Error inserting reports: {e}")
+            raise
+
+    def fetch_clip_paths(self, video_filename=None):
+        """
+        Retrieve the clip paths of the reports of a video, or of all reports.
+        
+        Args:
+            video_filename (str, optional): Source video filename, all videos if None
+            
+        Returns:
+            list: Distinct clip paths of the reports
+        """
+        try:
+            if video_filename is None:
+                self.cursor.execute("SELECT DISTINCT clip_path FROM reports")
+            else:
+                self.cursor.execute("SELECT DISTINCT clip_path FROM reports WHERE video_filename = %s",
+                                    (video_filename,))
+            return [row["clip_path"] for row in self.cursor.fetchall()]
+        except psycopg2.Error as e:
+            print(f"Error fetching clip paths for {video_filename or 'all videos'}: {e}")
+            raise
+
+    def fetch_preview_paths(self):
+        """
+        Retrieve the poster and sprite paths of all reports.
+
+        Returns:
+            list: Distinct preview paths of the reports
+        """
+        try:
+            self.cursor.execute("""
+                SELECT poster_path AS path FROM reports WHERE poster_path IS NOT NULL
+                UNION
+                SELECT sprite_path FROM reports WHERE sprite_path IS NOT NULL
+            """)
+            return [row["path"] for row in self.cursor.fetchall()]
+        except psycopg2.Error as e:
+            print(f"Error fetching preview paths: {e}")
+            raise
+
     def fetch_reports(self):
         """
         Retrieve all reports with speed exceeding the threshold.
@@ -92,6 +185,44 @@ class Database:
             print(f"Error fetching reports: {e}")
             raise
 
+    def stream_reports(self, start=None, end=None, min_speed=None, max_speed=None, itersize=1000):
+        """
+        Iterate over reports with a named server-side cursor, so memory stays constant.
+        
+        Rows are transferred from the server itersize at a time instead of being
+        loaded with fetchall().
+        
+        Args:
+            start (datetime, optional): Earliest report timestamp (inclusive)
+            end (datetime, optional): Latest report timestamp (exclusive)
+            min_speed (float, optional): Minimum speed in km/h (inclusive)
+            max_speed (float, optional): Maximum speed in km/h (inclusive)
+            itersize (int): Rows fetched per network round trip
+            
+        Yields:
+            dict: Report data, ordered by timestamp (oldest first)
+        """
+        conditions, params = [], []
+        for column, operator, value in (("timestamp", ">=", start), ("timestamp", "<", end),
+                                        ("speed_kmh", ">=", min_speed), ("speed_kmh", "<=", max_speed)):
+            if value is not None:
+                conditions.append(f"{column} {operator} %s")
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self.conn.cursor(name=f"export_{uuid.uuid4().hex}")
+        cursor.itersize = itersize
+        try:
+            cursor.execute(f"SELECT * FROM reports {where} ORDER BY timestamp, id", params)
+            for row in cursor:
+                yield row
+            self.conn.commit()  # End the transaction the named cursor lives in
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"Error streaming reports: {e}")
+            raise
+        finally:
+            cursor.close()
+
     def fetch_report_by_id(self, report_id):
         """
         Retrieve a single report by its ID.
@@ -112,6 +243,139 @@ class Database:
             print(f"Error fetching report by ID {report_id}: {e}")
             raise
 
+    def create_rollup_tables(self):
+        """Create the traffic statistics rollup tables if they don't exist."""
+        try:
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS traffic_rollups (
+                    granularity TEXT NOT NULL,
+                    camera TEXT NOT NULL,
+                    bucket_start TIMESTAMP NOT NULL,
+                    vehicles INTEGER NOT NULL,
+                    violations INTEGER NOT NULL,
+                    speed_sum DOUBLE PRECISION NOT NULL,
+                    speed_min DOUBLE PRECISION,
+                    speed_max DOUBLE PRECISION,
+                    sketch JSONB NOT NULL,
+                    PRIMARY KEY (granularity, camera, bucket_start)
+                )
+            """)
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS rollup_jobs (
+                    job_key TEXT PRIMARY KEY,
+                    video_filename TEXT NOT NULL,
+                    camera TEXT NOT NULL,
+                    vehicles INTEGER NOT NULL,
+                    folded_at TIMESTAMP NOT NULL
+                )
+            """)
+            self.conn.commit()
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"Error creating rollup tables: {e}")
+            raise
+
+    def merge_rollups(self, job_key, video_filename, camera, vehicles, rollups, merge):
+        """
+        Fold the rollups of a job into the rollup tables in one transaction.
+        
+        A job is folded at most once per key: reprocessing a video does not count
+        its vehicles twice, while a new upload under the same filename has a new key.
+        Buckets are locked while they are merged, so jobs of the same camera may
+        complete concurrently.
+        
+        Args:
+            job_key (str): Identity of the job's video version (see rollups.job_key)
+            video_filename (str): Source video filename of the job
+            camera (str): Camera the job's video was recorded by
+            vehicles (int): Number of measurements of the job
+            rollups (dict): (granularity, bucket_start) -> bucket row of the job
+            merge (callable): Combines a stored bucket row with a row of the job
+            
+        Returns:
+            bool: True if the job was folded, False if it had been folded before
+        """
+        try:
+            self.cursor.execute("""
+                INSERT INTO rollup_jobs (job_key, video_filename, camera, vehicles, folded_at)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (job_key) DO NOTHING
+                RETURNING job_key
+            """, (job_key, video_filename, camera, vehicles, datetime.now()))
+            if self.cursor.fetchone() is None:
+                self.conn.rollback()
+                return False
+            for (granularity, bucket_start), row in sorted(rollups.items()):
+                # Create the bucket if needed, then lock it against concurrent merges
+                self.cursor.execute("""
+                    INSERT INTO traffic_rollups (granularity, camera, bucket_start, vehicles, violations, speed_sum, sketch)
+                    VALUES (%s, %s, %s, 0, 0, 0, %s)
+                    ON CONFLICT DO NOTHING
+                """, (granularity, camera, bucket_start, Json(None)))
+                self.cursor.execute("""
+                    SELECT * FROM traffic_rollups
+                    WHERE granularity = %s AND camera = %s AND bucket_start = %s
+                    FOR UPDATE
+                """, (granularity, camera, bucket_start))
+                merged = merge(self.cursor.fetchone(), row)
+                self.cursor.execute("""
+                    UPDATE traffic_rollups
+                    SET vehicles = %s, violations = %s, speed_sum = %s, speed_min = %s, speed_max = %s, sketch = %s
+                    WHERE granularity = %s AND camera = %s AND bucket_start = %s
+                """, (merged["vehicles"], merged["violations"], merged["speed_sum"], merged["speed_min"],
+                      merged["speed_max"], Json(merged["sketch"]), granularity, camera, bucket_start))
+            self.conn.commit()
+            return True
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"Error merging rollups of {video_filename}: {e}")
+            raise
+
+    def fetch_rollups(self, granularity, start, end, camera=None):
+        """
+        Retrieve the rollup buckets of a time range.
+        
+        Args:
+            granularity (str): 'hour' or 'day'
+            start (datetime): Earliest bucket start (inclusive)
+            end (datetime): Latest bucket start (exclusive)
+            camera (str, optional): Only buckets of this camera, all cameras if None
+            
+        Returns:
+            list: Bucket rows, ordered by bucket start
+        """
+        try:
+            query = """
+                SELECT * FROM traffic_rollups
+                WHERE granularity = %s AND bucket_start >= %s AND bucket_start < %s
+            """
+            params = [granularity, start, end]
+            if camera is not None:
+                query += " AND camera = %s"
+                params.append(camera)
+            self.cursor.execute(query + " ORDER BY bucket_start, camera", params)
+            return self.cursor.fetchall()
+        except psycopg2.Error as e:
+            print(f"Error fetching {granularity} rollups: {e}")
+            raise
+
+    def fetch_rollup_cameras(self):
+        """
+        Retrieve the cameras that have statistics.
+        
+        Returns:
+            list: Camera names with their folded jobs and measurements
+        """
+        try:
+            self.cursor.execute("""
+                SELECT camera, COUNT(*) AS jobs, SUM(vehicles) AS vehicles, MAX(folded_at) AS last_folded_at
+                FROM rollup_jobs GROUP BY camera ORDER BY camera
+            """)
+            return self.cursor.fetchall()
+        except psycopg2.Error as e:
+            print(f"Error fetching rollup cameras: {e}")
+            raise
+
     def __enter__(self):
         """Context manager entry - establishes connection."""
         self.connect()
@@ -0,0 +1,276 @@
+import os
+import json
+import shutil
+import time
+import cv2
+import numpy as np
+from core.sort import iou_batch, linear_assignment
+
+# Supported inference backends. All of them are loaded through ultralytics, which
+# dispatches .onnx files to ONNX Runtime and *_openvino_model directories to OpenVINO.
+BACKENDS = ("pytorch", "onnx", "onnx-int8", "openvino", "openvino-int8")
+
+
+def resolve_weights(model_path, backend):
+    """
+    Get the path of the exported weights for a backend.
+
+    Args:
+        model_path (str): Path to the PyTorch weights (e.g. core/model/best.pt)
+        backend (str): One of BACKENDS
+
+    Returns:
+        str: Path to the weights file or model directory for the backend
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend}. Expected one of {', '.join(BACKENDS)}")
+    stem, _ = os.path.splitext(model_path)
+    return {
+        "pytorch": model_path,
+        "onnx": f"{stem}.onnx",
+        "onnx-int8": f"{stem}_int8.onnx",
+        "openvino": f"{stem}_openvino_model",
+        "openvino-int8": f"{stem}_int8_openvino_model",
+    }[backend]
+
+
+class Detector:
+    def __init__(self, model_path, backend="pytorch", imgsz=None, device=None):
+        """
+        Initialize a vehicle detector for the selected inference backend.
+
+        Args:
+            model_path (str): Path to the PyTorch weights; exported weights are resolved next to it
+            backend (str): Inference backend, one of BACKENDS
+            imgsz (int, optional): Inference image size, model default if None
+            device (str, optional): Device passed to ultralytics (e.g. 'cpu')
+        """
+        from ultralytics import YOLO
+
+        self.backend = backend
+        self.weights_path = resolve_weights(model_path, backend)
+        if not os.path.exists(self.weights_path):
+            raise FileNotFoundError(
+                f"Weights for backend '{backend}' not found: {self.weights_path}. "
+                f"Run 'python cli.py export-model' first"
+            )
+        self.model = YOLO(self.weights_path, task="detect")  # Backend-specific YOLO model
+        self.imgsz = imgsz  # Inference image size
+        self.device = device  # Inference device
+
+    def _predict_kwargs(self):
+        """Build keyword arguments for the ultralytics predict call."""
+        kwargs = {"verbose": False}
+        if self.imgsz is not None:
+            kwargs["imgsz"] = self.imgsz
+        if self.device is not None:
+            kwargs["device"] = self.device
+        return kwargs
+
+    @staticmethod
+    def _to_detections(result):
+        """
+        Convert an ultralytics result to a detection array.
+
+        Returns:
+            numpy.ndarray: Detections in the format [[x1,y1,x2,y2,score],...]
+        """
+        if result.boxes is None or len(result.boxes) == 0:
+            return np.empty((0, 5))
+        xyxy = result.boxes.xyxy.cpu().numpy()
+        conf = result.boxes.conf.cpu().numpy()
+        return np.hstack([xyxy, conf[:, None]]).astype(np.float64)
+
+    def detect(self, frame):
+        """
+        Detect vehicles in a single frame.
+
+        Args:
+            frame (numpy.ndarray): BGR video frame
+
+        Returns:
+            numpy.ndarray: Detections in the format [[x1,y1,x2,y2,score],...]
+        """
+        return self._to_detections(self.model(frame, **self._predict_kwargs())[0])
+
+    def detect_batch(self, frames):
+        """
+        Detect vehicles in several frames with one model call.
+
+        Args:
+            frames (list): List of BGR video frames
+
+        Returns:
+            list: One detection array per frame
+        """
+        if not frames:
+            return []
+        results = self.model(list(frames), **self._predict_kwargs())
+        return [self._to_detections(result) for result in results]
+
+
+def export_model(model_path, backends, imgsz=640, data=None):
+    """
+    Export and quantize the PyTorch model for CPU inference backends.
+
+    Args:
+        model_path (str): Path to the PyTorch weights
+        backends (list): Backends to export, 'pytorch' is ignored
+        imgsz (int): Export image size
+        data (str, optional): Dataset YAML used as INT8 calibration data for OpenVINO
+
+    Returns:
+        dict: Mapping of backend to exported weights path
+    """
+    from ultralytics import YOLO
+
+    exported = {}
+    for backend in backends:
+        if backend == "pytorch":
+            continue
+        target = resolve_weights(model_path, backend)
+        print(f"[INFO] Exporting {model_path} for backend '{backend}' -> {target}")
+
+        if backend == "onnx-int8":
+            # Dynamic INT8 quantization of the FP32 ONNX graph with ONNX Runtime
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            onnx_path = resolve_weights(model_path, "onnx")
+            if not os.path.exists(onnx_path):
+                onnx_path = export_model(model_path, ["onnx"], imgsz=imgsz)["onnx"]
+            quantize_dynamic(onnx_path, target, weight_type=QuantType.QUInt8)
+        else:
+            kwargs = {"imgsz": imgsz}
+            if backend == "onnx":
+                kwargs.update(format="onnx", dynamic=True)
+            else:
+                kwargs.update(format="openvino", dynamic=True)
+                if backend == "openvino-int8":
+                    # Post-training quantization with NNCF, calibrated on the given dataset
+                    kwargs.update(int8=True)
+                    if data:
+                        kwargs.update(data=data)
+            produced = YOLO(model_path).export(**kwargs)
+            # Move the artifact to the canonical path expected by resolve_weights
+            if os.path.abspath(produced) != os.path.abspath(target):
+                if os.path.isdir(target):
+                    shutil.rmtree(target)
+                elif os.path.exists(target):
+                    os.remove(target)
+                shutil.move(produced, target)
+
+        exported[backend] = target
+        print(f"[INFO] Exported backend '{backend}': {target}")
+    return exported
+
+
+def sample_frames(video_path, num_frames):
+    """
+    Read frames evenly spaced across a video.
+
+    Args:
+        video_path (str): Path to the input video
+        num_frames (int): Number of frames to sample
+
+    Returns:
+        list: Sampled BGR frames
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or num_frames
+    indices = np.linspace(0, max(total - 1, 0), num_frames).astype(int)
+    frames = []
+    for index in indices:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """
+    Match candidate detections to reference detections by IoU.
+
+    Args:
+        reference (numpy.ndarray): Reference detections [[x1,y1,x2,y2,score],...]
+        candidate (numpy.ndarray): Candidate detections in the same format
+        iou_threshold (float): Minimum IoU for a match
+
+    Returns:
+        tuple: (number of matches, list of IoUs of the matches)
+    """
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0, []
+    iou_matrix = iou_batch(reference[:, :4], candidate[:, :4])
+    pairs = linear_assignment(-iou_matrix)
+    ious = [float(iou_matrix[r, c]) for r, c in pairs if iou_matrix[r, c] >= iou_threshold]
+    return len(ious), ious
+
+
+def compare_backends(model_path, video_path, backends, num_frames=100, imgsz=None,
+                     iou_threshold=0.5, report_path=None):
+    """
+    Compare accuracy and throughput of inference backends against PyTorch.
+
+    Args:
+        model_path (str): Path to the PyTorch weights
+        video_path (str): Video to sample frames from
+        backends (list): Backends to compare
+        num_frames (int): Number of frames to sample
+        imgsz (int, optional): Inference image size
+        iou_threshold (float): Minimum IoU for a detection to count as equivalent
+        report_path (str, optional): Path to save the JSON report
+
+    Returns:
+        dict: Per-backend throughput and detection agreement with the PyTorch reference
+    """
+    frames = sample_frames(video_path, num_frames)
+    if not frames:
+        raise ValueError(f"No frames could be read from {video_path}")
+    print(f"[INFO] Sampled {len(frames)} frames from {video_path}")
+
+    report = {"video_path": video_path, "frames": len(frames), "backends": {}}
+    reference = None
+    for backend in ["pytorch"] + [b for b in backends if b != "pytorch"]:
+        try:
+            detector = Detector(model_path, backend=backend, imgsz=imgsz)
+        except FileNotFoundError as e:
+            print(f"[WARN] Skipping backend '{backend}': {e}")
+            continue
+
+        # Warm up once so that lazy initialization is not counted
+        detector.detect(frames[0])
+        start = time.perf_counter()
+        detections = [detector.detect(frame) for frame in frames]
+        elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference = detections
+        matched, ious, ref_total, cand_total = 0, [], 0, 0
+        for ref, cand in zip(reference, detections):
+            count, pair_ious = match_detections(ref, cand, iou_threshold)
+            matched += count
+            ious.extend(pair_ious)
+            ref_total += len(ref)
+            cand_total += len(cand)
+
+        recall = matched / ref_total if ref_total else 1.0
+        precision = matched / cand_total if cand_total else 1.0
+        report["backends"][backend] = {
+            "weights_path": detector.weights_path,
+            "fps": round(len(frames) / elapsed, 2) if elapsed > 0 else None,
+            "ms_per_frame": round(1000 * elapsed / len(frames), 2),
+            "detections": cand_total,
+            "recall_vs_pytorch": round(recall, 4),
+            "precision_vs_pytorch": round(precision, 4),
+            "mean_iou_vs_pytorch": round(float(np.mean(ious)), 4) if ious else None,
+        }
+        print(f"[INFO] Backend '{backend}': {report['backends'][backend]}")
+
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"[INFO] Backend comparison saved to: {report_path}")
+    return report
@@ -0,0 +1,276 @@
+import time
+import asyncio
+import threading
+from collections import deque
+
+from core.media_cache import LRUCache, file_key
+from config import FFMPEG_MAX_CONCURRENCY, FFMPEG_TIMEOUT_SECONDS, CLIP_KEYFRAME_TOLERANCE_S, MEDIA_CACHE_SIZE
+
+# Video codecs that browsers play, so clips of them can be stream-copied
+COPYABLE_CODECS = ("h264",)
+
+
+class FFmpegError(Exception):
+    def __init__(self, message, stderr=""):
+        """
+        Error raised when an ffmpeg/ffprobe command fails or times out.
+
+        Args:
+            message (str): Error description
+            stderr (str): Output of the failed command
+        """
+        super().__init__(message)
+        self.stderr = stderr
+
+
+class FFmpegExecutor:
+    def __init__(self, max_concurrency=FFMPEG_MAX_CONCURRENCY, timeout=FFMPEG_TIMEOUT_SECONDS, history=200):
+        """
+        Initialize a bounded-concurrency executor for ffmpeg commands.
+
+        Commands run as asyncio subprocesses on a private event loop thread, so one
+        semaphore bounds them across the web app's event loop, threadpool jobs and
+        report sinks alike. Async callers await them, blocking callers wait on them.
+
+        Args:
+            max_concurrency (int): Maximum ffmpeg processes running at the same time
+            timeout (float): Default seconds before a command is killed
+            history (int): Number of recent command timings kept for stats()
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = None  # Created on the executor loop
+        self.timings = deque(maxlen=history)  # Recent {label, seconds, wait_seconds, status}
+        self.running = 0
+        self.thread = threading.Thread(target=self._run_loop, name="ffmpeg-executor", daemon=True)
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.loop.run_forever()
+
+    async def _execute(self, args, timeout, label):
+        queued = time.perf_counter()
+        async with self.semaphore:
+            started = time.perf_counter()
+            self.running += 1
+            status = "ok"
+            process = None
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                status = "timeout"
+                raise FFmpegError(f"{label} timed out after {timeout}s")
+            except OSError as e:
+                status = "failed"
+                raise FFmpegError(f"{label} could not be started: {e}")
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            finally:
+                if process is not None and process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                self.running -= 1
+                if status == "ok" and process.returncode != 0:
+                    status = "failed"
+                self.timings.append({
+                    "label": label,
+                    "seconds": round(time.perf_counter() - started, 3),
+                    "wait_seconds": round(started - queued, 3),
+                    "status": status,
+                })
+            stderr = stderr.decode(errors="replace")
+            if process.returncode != 0:
+                raise FFmpegError(f"{label} failed with exit code {process.returncode}", stderr)
+            return stdout.decode(errors="replace")
+
+    async def run(self, args, timeout=None, label=None):
+        """
+        Run a command from async code; cancelling the awaiting task kills the process.
+
+        Args:
+            args (list): Command and arguments, e.g. ["ffmpeg", "-i", ...]
+            timeout (float, optional): Seconds before the process is killed
+            label (str, optional): Name of the command in the timings
+
+        Returns:
+            str: Standard output of the command
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._execute(args, timeout or self.timeout, label or args[0]), self.loop)
+        return await asyncio.wrap_future(future)
+
+    def run_sync(self, args, timeout=None, label=None):
+        """Run a command from blocking code (threads, worker processes); see run()."""
+        future = asyncio.run_coroutine_threadsafe(
+            self._execute(args, timeout or self.timeout, label or args[0]), self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def map_sync(self, commands, timeout=None, return_exceptions=True):
+        """
+        Run several commands concurrently (bounded by the semaphore) and wait for all.
+
+        Args:
+            commands (list): (args, label) tuples
+            timeout (float, optional): Seconds before each process is killed
+            return_exceptions (bool): Return errors in place of results instead of raising
+
+        Returns:
+            list: Standard output or the FFmpegError of each command, in order
+        """
+        futures = [asyncio.run_coroutine_threadsafe(
+            self._execute(args, timeout or self.timeout, label), self.loop) for args, label in commands]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except FFmpegError as e:
+                if not return_exceptions:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                results.append(e)
+        return results
+
+    def stats(self):
+        """
+        Get executor statistics.
+
+        Returns:
+            dict: Concurrency limit, running commands and per-label timing summaries
+        """
+        by_label = {}
+        for timing in list(self.timings):
+            summary = by_label.setdefault(timing["label"], {"count": 0, "seconds": 0.0, "wait_seconds": 0.0,
+                                                            "failed": 0})
+            summary["count"] += 1
+            summary["seconds"] += timing["seconds"]
+            summary["wait_seconds"] += timing["wait_seconds"]
+            summary["failed"] += timing["status"] != "ok"
+        for summary in by_label.values():
+            summary["mean_seconds"] = round(summary.pop("seconds") / summary["count"], 3)
+            summary["mean_wait_seconds"] = round(summary.pop("wait_seconds") / summary["count"], 3)
+        return {"max_concurrency": self.max_concurrency, "running": self.running, "commands": by_label}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Get the ffmpeg executor of this process, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = FFmpegExecutor()
+        return _executor
+
+
+_keyframe_cache = LRUCache(MEDIA_CACHE_SIZE)
+
+
+def probe_keyframes(video_path):
+    """
+    List the keyframe times and the codec of a video's first video stream.
+
+    Reads packet flags only, nothing is decoded. Cached per version of the file.
+
+    Args:
+        video_path (str): Path to the video
+
+    Returns:
+        tuple: (video codec name, sorted keyframe times in seconds)
+    """
+    def probe():
+        executor = get_executor()
+        codec = executor.run_sync([
+            "ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=codec_name",
+            "-of", "csv=p=0", video_path
+        ], label="ffprobe").strip()
+        packets = executor.run_sync([
+            "ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0", video_path
+        ], label="ffprobe")
+        keyframes = []
+        for line in packets.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                keyframes.append(float(pts_time))
+        return codec, sorted(keyframes)
+
+    return _keyframe_cache.get_or_create(file_key(video_path), probe)
+
+
+_start_time_cache = LRUCache(MEDIA_CACHE_SIZE)
+
+
+def probe_start_time(video_path):
+    """
+    Get the start time of a video's first video stream, the pts of its first frame.
+
+    Cached per version of the file.
+
+    Args:
+        video_path (str): Path to the video
+
+    Returns:
+        float: Start time in seconds, 0 if the container does not declare one
+    """
+    def probe():
+        output = get_executor().run_sync([
+            "ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=start_time",
+            "-of", "csv=p=0", video_path
+        ], label="ffprobe").strip()
+        try:
+            return float(output)
+        except ValueError:
+            return 0.0  # N/A
+
+    return _start_time_cache.get_or_create(file_key(video_path), probe)
+
+
+def clip_command(source_path, start_time, duration, clip_path):
+    """
+    Build the ffmpeg command of a clip, stream-copying when a keyframe allows it.
+
+    A copied clip must start on a keyframe. If one lies at most CLIP_KEYFRAME_TOLERANCE_S
+    before the requested start (clips are padded anyway) and the codec is playable, the
+    clip is copied from there without re-encoding; otherwise it is re-encoded, seeking
+    on the input so only the part from the preceding keyframe is decoded.
+
+    Args:
+        source_path (str): Video the clip is cut from
+        start_time (float): Clip start in seconds
+        duration (float): Clip duration in seconds
+        clip_path (str): Output path
+
+    Returns:
+        tuple: (ffmpeg arguments, 'copy' or 'encode')
+    """
+    try:
+        codec, keyframes = probe_keyframes(source_path)
+    except FFmpegError as e:
+        print(f"[WARN] Keyframe probe failed, re-encoding clip: {e}")
+        codec, keyframes = None, []
+    if codec in COPYABLE_CODECS:
+        candidates = [kf for kf in keyframes if start_time - CLIP_KEYFRAME_TOLERANCE_S <= kf <= start_time]
+        if candidates:
+            keyframe = candidates[-1]
+            return [
+                "ffmpeg", "-y", "-ss", f"{keyframe:.3f}", "-i", source_path,
+                "-t", f"{duration + start_time - keyframe:.3f}", "-map", "0:v:0", "-map", "0:a?",
+                "-c", "copy", "-avoid_negative_ts", "make_zero", "-movflags", "+faststart", clip_path
+            ], "copy"
+    return [
+        "ffmpeg", "-y", "-ss", f"{start_time:.3f}", "-i", source_path, "-t", f"{duration:.3f}",
+        "-c:v", "libx264", "-c:a", "aac", "-strict", "-2", "-movflags", "+faststart", clip_path
+    ], "encode"
@@ -0,0 +1,267 @@
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+
+# Seconds to wait for a pipeline process before checking that it is still alive
+POLL_SECONDS = 1.0
+
+
+class FrameRing:
+    def __init__(self, slots, shape, dtype=np.uint8, context=None):
+        """
+        Initialize a ring of frame slots in shared memory.
+
+        Processes exchange slot indices instead of pickled frames. Each slot carries a
+        reference count: acquire() hands out a free slot with one reference, retain()
+        adds references for additional consumers and release() drops one; the slot is
+        recycled when its count reaches zero. The ring is passed to child processes as
+        a Process argument and reattaches to the same memory there.
+
+        Args:
+            slots (int): Number of frame slots, bounds the frames in flight
+            shape (tuple): Frame shape, e.g. (height, width, 3)
+            dtype: Frame dtype
+            context: multiprocessing context used for the locks
+        """
+        context = context or multiprocessing.get_context("spawn")
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        size = self.slots * self.frame_bytes + self.slots * np.dtype(np.int32).itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.owner = True  # Only the creating process unlinks the memory
+        self.lock = context.Lock()  # Guards the reference counts
+        self.free = context.Semaphore(slots)  # Counts free slots
+        self._attach()
+        self.refcounts[:] = 0
+
+    def _attach(self):
+        """Create NumPy views of the frames and the reference counts."""
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        self.refcounts = np.ndarray((self.slots,), dtype=np.int32, buffer=self.shm.buf,
+                                    offset=self.slots * self.frame_bytes)
+
+    def __getstate__(self):
+        return {"slots": self.slots, "shape": self.shape, "dtype": self.dtype.str,
+                "frame_bytes": self.frame_bytes, "name": self.shm.name,
+                "lock": self.lock, "free": self.free}
+
+    def __setstate__(self, state):
+        self.slots = state["slots"]
+        self.shape = state["shape"]
+        self.dtype = np.dtype(state["dtype"])
+        self.frame_bytes = state["frame_bytes"]
+        self.lock = state["lock"]
+        self.free = state["free"]
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        self.owner = False
+        self._attach()
+
+    def acquire(self, timeout=None):
+        """
+        Take a free slot, blocking until one is recycled.
+
+        Args:
+            timeout (float, optional): Seconds to wait, forever if None
+
+        Returns:
+            int: Slot index with one reference, or None on timeout
+        """
+        if not self.free.acquire(timeout=timeout):
+            return None
+        with self.lock:
+            index = int(np.flatnonzero(self.refcounts == 0)[0])
+            self.refcounts[index] = 1
+        return index
+
+    def view(self, index):
+        """Get the NumPy view of a slot (no copy)."""
+        return self.frames[index]
+
+    def write(self, frame, timeout=None):
+        """
+        Copy a frame into a free slot.
+
+        Returns:
+            int: Slot index with one reference, or None on timeout
+        """
+        index = self.acquire(timeout=timeout)
+        if index is not None:
+            self.frames[index][...] = frame
+        return index
+
+    def retain(self, index, count=1):
+        """Add references to a slot for additional consumers."""
+        with self.lock:
+            if self.refcounts[index] <= 0:
+                raise ValueError(f"Slot {index} is not in use")
+            self.refcounts[index] += count
+
+    def release(self, index):
+        """Drop a reference; the slot becomes free when no references remain."""
+        with self.lock:
+            if self.refcounts[index] <= 0:
+                raise ValueError(f"Slot {index} released more often than acquired")
+            self.refcounts[index] -= 1
+            recycled = self.refcounts[index] == 0
+        if recycled:
+            self.free.release()
+
+    def in_use(self):
+        """Number of slots currently holding frames."""
+        with self.lock:
+            return int(np.count_nonzero(self.refcounts))
+
+    def close(self):
+        """Detach from the shared memory, unlinking it in the creating process."""
+        self.frames = None
+        self.refcounts = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _decode_frames(video_path, frame_offset, ring, frame_queue):
+    """Decoder process: read frames into ring slots and send their indices."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if frame_offset > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_offset)
+            if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_offset:
+                cap.release()
+                cap = cv2.VideoCapture(video_path)
+                for _ in range(frame_offset):
+                    if not cap.grab():
+                        break
+        while True:
+            index = ring.acquire()
+            # Decode straight into the shared slot
+            ret, _ = cap.read(ring.view(index))
+            if not ret:
+                ring.release(index)
+                break
+            frame_queue.put(index)
+    finally:
+        cap.release()
+        frame_queue.put(None)
+        ring.close()
+
+
+def _encode_frames(ring, frame_queue, ack_queue, output_path, fps, size):
+    """Encoder process: write frames from ring slots and recycle the slots."""
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    writer = cv2.VideoWriter(output_path, fourcc, fps, size)
+    ack_queue.put(writer.isOpened())
+    try:
+        while True:
+            message = frame_queue.get()
+            if message is None:
+                break
+            if isinstance(message, tuple):
+                # Segment rotation: close the current file and continue in a new one
+                writer.release()
+                writer = cv2.VideoWriter(message[1], fourcc, fps, size)
+                ack_queue.put(writer.isOpened())
+                continue
+            writer.write(ring.view(message))
+            ring.release(message)
+    finally:
+        writer.release()
+        ack_queue.put(True)
+        ring.close()
+
+
+class RingDecoder:
+    def __init__(self, video_path, frame_offset, shape, slots=8):
+        """
+        Decode a video in a separate process into a shared FrameRing.
+
+        Args:
+            video_path (str): Path to the video
+            frame_offset (int): Index of the first frame to decode
+            shape (tuple): Frame shape (height, width, 3)
+            slots (int): Ring size, bounds how far decoding runs ahead
+        """
+        context = multiprocessing.get_context("spawn")
+        self.ring = FrameRing(slots, shape, context=context)
+        self.queue = context.Queue()
+        self.process = context.Process(target=_decode_frames,
+                                       args=(video_path, frame_offset, self.ring, self.queue), daemon=True)
+        self.process.start()
+
+    def frames(self):
+        """
+        Yield decoded frames in order.
+
+        Yields:
+            tuple: (frame view, slot index); the consumer must release or hand on the slot
+        """
+        while True:
+            try:
+                index = self.queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise RuntimeError("Decoder process exited unexpectedly")
+                continue
+            if index is None:
+                return
+            yield self.ring.view(index), index
+
+    def release(self, index):
+        """Recycle a slot that is not passed on to the encoder."""
+        self.ring.release(index)
+
+    def close(self):
+        """Stop the decoder process and free the shared memory."""
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.ring.close()
+
+
+class RingEncoder:
+    def __init__(self, ring, output_path, fps, size):
+        """
+        Encode frames from a FrameRing in a separate process.
+
+        Args:
+            ring (FrameRing): Ring the frames live in (the decoder's ring)
+            output_path (str): Path of the first output file
+            fps (float): Output frame rate
+            size (tuple): Output frame size (width, height)
+        """
+        context = multiprocessing.get_context("spawn")
+        self.queue = context.Queue()
+        self.acks = context.Queue()
+        self.process = context.Process(target=_encode_frames,
+                                       args=(ring, self.queue, self.acks, output_path, fps, size), daemon=True)
+        self.process.start()
+        if not self._wait_ack():
+            raise RuntimeError("Failed to open VideoWriter")
+
+    def _wait_ack(self):
+        while True:
+            try:
+                return self.acks.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise RuntimeError("Encoder process exited unexpectedly")
+
+    def write(self, index):
+        """Hand a slot to the encoder, which releases it after writing."""
+        self.queue.put(index)
+
+    def rotate(self, output_path):
+        """Finish the current file after all queued frames and continue in a new one."""
+        self.queue.put(("rotate", output_path))
+        if not self._wait_ack():
+            raise RuntimeError("Failed to open VideoWriter")
+
+    def close(self):
+        """Flush queued frames and close the output file."""
+        self.queue.put(None)
+        self._wait_ack()
+        self.process.join()
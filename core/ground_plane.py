@@ -0,0 +1,175 @@
+import os
+import json
+import cv2
+import numpy as np
+
+
+def ground_homography(intrinsic, rvec, tvec):
+    """
+    Compute the homography mapping image pixels to ground-plane meters (z = 0).
+
+    For points on the ground plane the projection K [R | t] reduces to the 3x3
+    matrix K [r1 r2 t]; its inverse maps pixels back to world (x, y) meters.
+
+    Args:
+        intrinsic (numpy.ndarray): Camera intrinsic matrix
+        rvec (numpy.ndarray): Rotation vector from solvePnP
+        tvec (numpy.ndarray): Translation vector from solvePnP
+
+    Returns:
+        numpy.ndarray: 3x3 image-to-ground homography
+    """
+    rotation, _ = cv2.Rodrigues(np.asarray(rvec, dtype=np.float64))
+    world_to_image = np.asarray(intrinsic, dtype=np.float64) @ np.column_stack(
+        [rotation[:, 0], rotation[:, 1], np.asarray(tvec, dtype=np.float64).reshape(3)])
+    image_to_ground = np.linalg.inv(world_to_image)
+    return image_to_ground / image_to_ground[2, 2]
+
+
+class GroundPlane:
+    def __init__(self, homography):
+        """
+        Initialize the pixel-to-ground mapping of a calibrated camera.
+
+        Args:
+            homography (array-like): 3x3 image-to-ground homography
+        """
+        self.homography = np.asarray(homography, dtype=np.float64).reshape(3, 3)
+
+    def to_ground(self, points):
+        """
+        Map image points to ground-plane coordinates in one vectorized step.
+
+        Args:
+            points (numpy.ndarray): Image points (N, 2)
+
+        Returns:
+            numpy.ndarray: Ground points (N, 2) in meters
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        mapped = points @ self.homography[:, :2].T + self.homography[:, 2]
+        return mapped[:, :2] / mapped[:, 2:3]
+
+
+class SpeedProfiler:
+    def __init__(self, ground_plane, smoothing=0.3, max_gap_s=1.0, spool_path=None):
+        """
+        Initialize per-frame speed estimation for all tracks.
+
+        Every frame, the ground contact points (bottom centers) of all tracks are mapped
+        to meters with one homography product; the displacement since each track's
+        previous frame gives its instantaneous speed, smoothed exponentially.
+
+        With a spool file, the profiles of tracks that are gone are appended to it as
+        JSON lines and dropped from memory, so memory and checkpoints only hold the
+        profiles of live tracks.
+
+        Args:
+            ground_plane (GroundPlane): Pixel-to-ground mapping
+            smoothing (float): Weight of the newest instantaneous speed (0-1]
+            max_gap_s (float): A track unseen for longer restarts its speed estimate
+            spool_path (str, optional): JSON lines file for finished profiles; all
+                profiles stay in memory if None
+        """
+        self.ground_plane = ground_plane
+        self.smoothing = smoothing
+        self.max_gap_s = max_gap_s
+        self.spool_path = spool_path
+        self.last = {}  # Maps track id to [time, x, y, smoothed speed]
+        self.profiles = {}  # Maps track id to its [time, speed_kmh, x, y] samples (live tracks with a spool)
+
+    def update(self, tracks, current_time):
+        """
+        Update the speeds of the tracks of a frame.
+
+        Args:
+            tracks (numpy.ndarray): Tracks [[x1,y1,x2,y2,track_id],...]
+            current_time (float): Time of the frame in seconds
+
+        Returns:
+            numpy.ndarray: Smoothed speed in km/h per track, NaN until a track has two samples
+        """
+        if len(tracks) == 0:
+            return np.empty(0)
+        ids = tracks[:, 4].astype(int)
+        contact = np.stack([(tracks[:, 0] + tracks[:, 2]) / 2, tracks[:, 3]], axis=1)
+        ground = self.ground_plane.to_ground(contact)
+
+        missing = [np.nan] * 4
+        previous = np.array([self.last.get(track_id, missing) for track_id in ids], dtype=np.float64)
+        dt = current_time - previous[:, 0]
+        valid = (dt > 0) & (dt <= self.max_gap_s)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            instant = np.linalg.norm(ground - previous[:, 1:3], axis=1) / dt * 3.6
+        smoothed = np.where(np.isnan(previous[:, 3]), instant,
+                            self.smoothing * instant + (1 - self.smoothing) * previous[:, 3])
+        speeds = np.where(valid, smoothed, np.nan)
+
+        for track_id, (gx, gy), speed in zip(ids, ground, speeds):
+            track_id = int(track_id)
+            self.last[track_id] = [current_time, float(gx), float(gy), float(speed)]
+            if not np.isnan(speed):
+                self.profiles.setdefault(track_id, []).append(
+                    [round(current_time, 3), round(float(speed), 2), round(float(gx), 2), round(float(gy), 2)])
+
+        # Forget positions of tracks that have been gone for too long
+        stale = [track_id for track_id, state in self.last.items() if current_time - state[0] > self.max_gap_s]
+        for track_id in stale:
+            del self.last[track_id]
+        if self.spool_path is not None:
+            self._spool([track_id for track_id in stale if track_id in self.profiles])
+        return speeds
+
+    def _spool(self, track_ids):
+        """Append the profiles of finished tracks to the spool file and drop them from memory."""
+        if not track_ids:
+            return
+        os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+        with open(self.spool_path, 'a') as f:
+            for track_id in track_ids:
+                f.write(json.dumps([track_id, self.profiles.pop(track_id)]) + "\n")
+
+    def spooled_bytes(self):
+        """Get the length of the spool file, 0 without one."""
+        if self.spool_path is None or not os.path.exists(self.spool_path):
+            return 0
+        return os.path.getsize(self.spool_path)
+
+    def clear_spool(self):
+        """Remove the spool file, e.g. when a job starts from frame 0 or has saved its profiles."""
+        if self.spool_path is not None and os.path.exists(self.spool_path):
+            os.remove(self.spool_path)
+
+    def all_profiles(self):
+        """
+        Get the profiles of all tracks, spooled and live.
+
+        Returns:
+            dict: Maps track id to its [time, speed_kmh, x, y] samples
+        """
+        profiles = {}
+        if self.spool_path is not None and os.path.exists(self.spool_path):
+            with open(self.spool_path, 'r') as f:
+                for line in f:
+                    track_id, samples = json.loads(line)
+                    profiles.setdefault(track_id, []).extend(samples)
+        for track_id, samples in self.profiles.items():
+            profiles.setdefault(int(track_id), []).extend(samples)
+        return profiles
+
+    def to_checkpoint(self):
+        """Get the profiler state for a checkpoint: live tracks and the length of the spool."""
+        return {"last": self.last, "profiles": self.profiles, "spooled_bytes": self.spooled_bytes()}
+
+    def restore_checkpoint(self, state):
+        """
+        Restore the state saved by to_checkpoint().
+
+        Profiles spooled after the checkpoint are cut off the spool file, since the
+        resumed run produces them again.
+        """
+        self.last = state["last"]
+        self.profiles = state["profiles"]
+        if self.spool_path is not None and os.path.exists(self.spool_path):
+            with open(self.spool_path, 'r+') as f:
+                f.truncate(state["spooled_bytes"])
@@ -0,0 +1,130 @@
+import os
+import uuid
+import shutil
+import urllib.parse
+
+from core.media_cache import LRUCache, file_key
+from core.ffmpeg_executor import FFmpegError, get_executor
+from config import PROCESSED_VIDEOS_DIRECTORY, HLS_SEGMENT_SECONDS, MEDIA_CACHE_SIZE
+
+HLS_DIRECTORY = os.path.join(PROCESSED_VIDEOS_DIRECTORY, "hls")
+PLAYLIST_NAME = "index.m3u8"
+
+
+def hls_directory(video_filename):
+    """Get the directory holding the HLS playlist and segments of a processed video."""
+    return os.path.join(HLS_DIRECTORY, os.path.basename(video_filename))
+
+
+def package_hls(input_path, video_filename, segment_seconds=HLS_SEGMENT_SECONDS):
+    """
+    Split an H.264 video into fragmented-MP4 HLS segments without re-encoding.
+
+    The input must have keyframes every segment_seconds (see transcode_video), so
+    the segments have equal durations and clip playlists can address them by time.
+    Segment names carry a run id, so a reprocessed video never reuses the name of
+    a segment that players or proxies may have cached.
+
+    Args:
+        input_path (str): Converted H.264 video
+        video_filename (str): Source video filename, names the HLS directory
+        segment_seconds (float): Target segment duration
+
+    Returns:
+        str: Path of the playlist
+    """
+    directory = hls_directory(video_filename)
+    # Package into a fresh directory and swap it in, so players never see a mix
+    staging = f"{directory}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    run = uuid.uuid4().hex[:12]
+    try:
+        get_executor().run_sync([
+            "ffmpeg", "-y", "-i", input_path, "-c", "copy", "-f", "hls",
+            "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+            "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", f"init_{run}.mp4",
+            "-hls_segment_filename", os.path.join(staging, f"seg_{run}_%05d.m4s"),
+            os.path.join(staging, PLAYLIST_NAME)
+        ], label="hls")
+    except FFmpegError:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+    print(f"HLS playlist created: {os.path.join(directory, PLAYLIST_NAME)}")
+    return os.path.join(directory, PLAYLIST_NAME)
+
+
+_playlist_cache = LRUCache(MEDIA_CACHE_SIZE)
+
+
+def parse_playlist(playlist_path):
+    """
+    Parse a VOD media playlist.
+
+    Args:
+        playlist_path (str): Path of the playlist
+
+    Returns:
+        dict: 'header' (tag lines before the first segment, incl. EXT-X-MAP) and
+            'segments' ([start_s, duration_s, uri] in playback order)
+    """
+    def parse():
+        header, segments = [], []
+        start, duration = 0.0, None
+        with open(playlist_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line == "#EXT-X-ENDLIST":
+                    continue
+                if line.startswith("#EXTINF:"):
+                    duration = float(line[len("#EXTINF:"):].split(",")[0])
+                elif not line.startswith("#"):
+                    segments.append([start, duration, line])
+                    start += duration
+                elif not segments:
+                    header.append(line)
+        return {"header": header, "segments": segments}
+
+    return _playlist_cache.get_or_create(file_key(playlist_path), parse)
+
+
+def clip_playlist(video_filename, start, end):
+    """
+    Build a playlist that plays only the segments covering a time range.
+
+    Report clips reference these ranges of the processed video's segments instead
+    of separately encoded files.
+
+    Args:
+        video_filename (str): Source video filename
+        start (float): Range start in seconds
+        end (float): Range end in seconds
+
+    Returns:
+        str: Playlist text, starting playback at `start`
+    """
+    playlist = parse_playlist(os.path.join(hls_directory(video_filename), PLAYLIST_NAME))
+    segments = [s for s in playlist["segments"] if s[0] + s[1] > start and s[0] < end]
+    if not segments:
+        raise ValueError(f"No segments between {start}s and {end}s")
+    lines = [line for line in playlist["header"] if not line.startswith("#EXT-X-MEDIA-SEQUENCE")]
+    lines.append(f"#EXT-X-MEDIA-SEQUENCE:{playlist['segments'].index(segments[0])}")
+    # Begin at the requested time inside the first segment
+    lines.append(f"#EXT-X-START:TIME-OFFSET={max(0.0, start - segments[0][0]):.3f},PRECISE=YES")
+    for segment_start, duration, uri in segments:
+        lines.append(f"#EXTINF:{duration:.6f},")
+        lines.append(uri)
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def hls_url_prefix(video_filename):
+    """Get the URL prefix of the HLS output of a job, with the filename percent-encoded."""
+    return f"/hls/{urllib.parse.quote(video_filename)}/"
+
+
+def clip_playlist_url(video_filename, start, end):
+    """Get the URL of the clip playlist of a time range."""
+    return f"{hls_url_prefix(video_filename)}clip.m3u8?start={start:.2f}&end={end:.2f}"
@@ -0,0 +1,207 @@
+import time
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import Future
+
+
+class InferenceServer:
+    def __init__(self, detector, max_batch_size=8, max_wait_ms=10.0, max_pending_per_client=2):
+        """
+        Initialize an in-process inference service that batches frames across jobs and streams.
+
+        Frames submitted by all clients are collected into batches of up to max_batch_size.
+        A batch is dispatched when it is full, when the oldest frame has waited max_wait_ms,
+        or as soon as every registered client has a frame waiting (nothing more can arrive
+        from synchronous clients, so waiting would only add latency). Clients are served
+        round-robin, one frame per client per round, so a busy job cannot starve others.
+
+        Args:
+            detector (Detector): Detector used for the batched model calls
+            max_batch_size (int): Maximum frames per model call (throughput knob)
+            max_wait_ms (float): Maximum time a frame waits for a batch to fill (latency knob)
+            max_pending_per_client (int): Frames a client may have queued before submit blocks
+        """
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending_per_client = max_pending_per_client
+        self.queues = OrderedDict()  # Maps client id to its deque of (frame, future, submit time)
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.batches = 0  # Number of model calls
+        self.frames = 0  # Number of frames processed
+        self.wait_seconds = 0.0  # Total queueing delay of processed frames
+        self.frames_per_client = {}  # Frames processed per client
+
+    def start(self):
+        """Start the batching thread."""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._serve, name="inference-server", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the batching thread, failing frames that are still queued."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+        for queue in self.queues.values():
+            for _, future, _ in queue:
+                future.set_exception(RuntimeError("Inference server stopped"))
+            queue.clear()
+
+    def client(self, client_id):
+        """
+        Register a client (a job or a camera stream).
+
+        Args:
+            client_id (hashable): Unique client id
+
+        Returns:
+            InferenceClient: Client exposing the Detector.detect interface
+        """
+        with self.condition:
+            if client_id in self.queues:
+                raise ValueError(f"Inference client {client_id} already registered")
+            self.queues[client_id] = deque()
+            self.frames_per_client.setdefault(client_id, 0)
+        return InferenceClient(self, client_id)
+
+    def unregister(self, client_id):
+        """Remove a client; it must not have frames in flight."""
+        with self.condition:
+            self.queues.pop(client_id, None)
+            self.condition.notify_all()
+
+    def submit(self, client_id, frame):
+        """
+        Queue a frame for detection.
+
+        Args:
+            client_id (hashable): Id of a registered client
+            frame (numpy.ndarray): BGR frame
+
+        Returns:
+            Future: Resolves to the detections of the frame
+        """
+        future = Future()
+        with self.condition:
+            queue = self.queues[client_id]
+            while self.running and len(queue) >= self.max_pending_per_client:
+                self.condition.wait()
+            if not self.running:
+                raise RuntimeError("Inference server is not running")
+            queue.append((frame, future, time.perf_counter()))
+            self.condition.notify_all()
+        return future
+
+    def _oldest_submit_time(self):
+        times = [queue[0][2] for queue in self.queues.values() if queue]
+        return min(times) if times else None
+
+    def _pending(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def _take_batch(self):
+        """Pick up to max_batch_size frames round-robin across clients."""
+        batch = []
+        while len(batch) < self.max_batch_size:
+            progressed = False
+            for client_id, queue in self.queues.items():
+                if queue and len(batch) < self.max_batch_size:
+                    batch.append((client_id,) + queue.popleft())
+                    progressed = True
+            if not progressed:
+                break
+        # Rotate so that the next batch starts with a different client
+        if self.queues:
+            self.queues.move_to_end(next(iter(self.queues)))
+        return batch
+
+    def _serve(self):
+        while True:
+            with self.condition:
+                while self.running and self._pending() == 0:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                # Wait for the batch to fill, but not past the deadline of the oldest frame
+                deadline = self._oldest_submit_time() + self.max_wait
+                while self.running:
+                    pending = self._pending()
+                    all_waiting = all(queue for queue in self.queues.values())
+                    remaining = deadline - time.perf_counter()
+                    if pending >= self.max_batch_size or all_waiting or remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = self._take_batch()
+                self.condition.notify_all()  # Wake clients blocked on their pending limit
+
+            if not batch:
+                continue
+            now = time.perf_counter()
+            try:
+                results = self.detector.detect_batch([frame for _, frame, _, _ in batch])
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.frames += len(batch)
+            for (client_id, _, future, submitted), detections in zip(batch, results):
+                self.wait_seconds += now - submitted
+                self.frames_per_client[client_id] = self.frames_per_client.get(client_id, 0) + 1
+                future.set_result(detections)
+
+    def stats(self):
+        """
+        Get batching statistics.
+
+        Returns:
+            dict: Model calls, frames, mean batch size, mean queueing delay and frames per client
+        """
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "mean_batch_size": round(self.frames / self.batches, 2) if self.batches else 0.0,
+            "mean_wait_ms": round(1000 * self.wait_seconds / self.frames, 2) if self.frames else 0.0,
+            "active_clients": len(self.queues),
+            "frames_per_client": {str(k): v for k, v in self.frames_per_client.items()},
+        }
+
+
+class InferenceClient:
+    def __init__(self, server, client_id):
+        """
+        Handle of one job or stream on an InferenceServer; a drop-in for Detector.
+
+        Args:
+            server (InferenceServer): Server the frames are sent to
+            client_id (hashable): Id the client is registered under
+        """
+        self.server = server
+        self.client_id = client_id
+        self.backend = getattr(server.detector, "backend", None)
+
+    def detect(self, frame):
+        """
+        Detect vehicles in a frame through the shared batched model.
+
+        Returns:
+            numpy.ndarray: Detections in the format [[x1,y1,x2,y2,score],...]
+        """
+        return self.server.submit(self.client_id, frame).result()
+
+    def detect_batch(self, frames):
+        """Detect vehicles in several frames, batched together with other clients."""
+        futures = [self.server.submit(self.client_id, frame) for frame in frames]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Unregister from the server."""
+        self.server.unregister(self.client_id)
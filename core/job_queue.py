@@ -0,0 +1,266 @@
+import abc
+import json
+import uuid
+import sqlite3
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from config import DB_CONFIG, JOB_QUEUE_BACKEND, JOB_QUEUE_SQLITE_PATH, JOB_MAX_ATTEMPTS
+
+# Job states: queued -> running -> done, or back to queued on retry, or failed
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class JobQueue(abc.ABC):
+    """
+    Durable queue of process_video jobs stored in a database table.
+
+    Workers claim jobs with a lease that they extend by heartbeats; a job whose
+    lease expires (worker crashed or lost) becomes claimable again until it runs
+    out of attempts. Subclasses provide the connection and the dialect specifics.
+    Video and calibration paths must be reachable from every worker node.
+    """
+    placeholder = "%s"  # Query parameter placeholder of the DB driver
+    now_sql = None  # SQL expression for the current Unix time on the database clock
+    claim_lock_sql = ""  # Row locking clause for the claim subquery
+
+    def __init__(self):
+        self.conn = None  # Will hold the database connection
+        self.cursor = None  # Will hold the database cursor
+
+    @abc.abstractmethod
+    def connect(self):
+        """Open the database connection and cursor."""
+
+    def close(self):
+        """Close the database connection and cursor."""
+        if self.cursor:
+            self.cursor.close()
+        if self.conn:
+            self.conn.close()
+
+    def _sql(self, query):
+        """Fill in dialect placeholders of a query."""
+        return query.replace("{now}", self.now_sql).replace("{lock}", self.claim_lock_sql).replace("?", self.placeholder)
+
+    def _execute(self, query, params=()):
+        """Execute a query and commit, rolling back on error."""
+        try:
+            self.cursor.execute(self._sql(query), params)
+            rows = self.cursor.fetchall() if self.cursor.description else []
+            rowcount = self.cursor.rowcount
+            self.conn.commit()
+            return [self._row_to_dict(row) for row in rows], rowcount
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    @staticmethod
+    def _row_to_dict(row):
+        """Convert a result row to a job dict with decoded JSON fields."""
+        job = dict(row)
+        for key in ("options", "result"):
+            if job.get(key):
+                job[key] = json.loads(job[key])
+        return job
+
+    def create_schema(self):
+        """Create the jobs table and its claim index if they don't exist."""
+        self._execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                video_path TEXT NOT NULL,
+                calibration_path TEXT NOT NULL,
+                options TEXT,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                worker_id TEXT,
+                available_at DOUBLE PRECISION NOT NULL,
+                lease_expires_at DOUBLE PRECISION,
+                heartbeat_at DOUBLE PRECISION,
+                result TEXT,
+                error TEXT,
+                created_at DOUBLE PRECISION NOT NULL,
+                updated_at DOUBLE PRECISION NOT NULL
+            )
+        """)
+        self._execute("CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, priority, available_at)")
+
+    def enqueue(self, video_path, calibration_path, options=None, priority=0, max_attempts=JOB_MAX_ATTEMPTS):
+        """
+        Add a job to the queue.
+
+        Args:
+            video_path (str): Path to the source video
+            calibration_path (str): Path to the calibration JSON
+            options (dict, optional): Keyword options for process_video_job
+            priority (int): Lower values are claimed first
+            max_attempts (int): Attempts before the job is marked failed
+
+        Returns:
+            str: The generated job id
+        """
+        job_id = str(uuid.uuid4())
+        self._execute("""
+            INSERT INTO jobs (id, video_path, calibration_path, options, status, priority, attempts,
+                              max_attempts, available_at, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 'queued', ?, 0, ?, {now}, {now}, {now})
+        """, (job_id, video_path, calibration_path, json.dumps(options or {}), priority, max_attempts))
+        print(f"[INFO] Enqueued job {job_id} for {video_path}")
+        return job_id
+
+    def claim(self, worker_id, lease_seconds):
+        """
+        Claim the next runnable job: a queued job or a running job whose lease expired.
+
+        Args:
+            worker_id (str): Unique id of the claiming worker
+            lease_seconds (float): Lease duration, extended by heartbeat()
+
+        Returns:
+            dict: The claimed job, or None if nothing is runnable
+        """
+        rows, _ = self._execute("""
+            UPDATE jobs
+            SET status = 'running', worker_id = ?, attempts = attempts + 1,
+                lease_expires_at = {now} + ?, heartbeat_at = {now}, updated_at = {now}
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE (status = 'queued' AND available_at <= {now})
+                   OR (status = 'running' AND lease_expires_at < {now} AND attempts < max_attempts)
+                ORDER BY priority, available_at
+                LIMIT 1
+                {lock}
+            )
+            RETURNING *
+        """, (worker_id, lease_seconds))
+        return rows[0] if rows else None
+
+    def heartbeat(self, job_id, worker_id, lease_seconds):
+        """
+        Extend the lease of a running job.
+
+        Returns:
+            bool: False if the worker no longer owns the job (lease lost)
+        """
+        _, rowcount = self._execute("""
+            UPDATE jobs SET lease_expires_at = {now} + ?, heartbeat_at = {now}, updated_at = {now}
+            WHERE id = ? AND worker_id = ? AND status = 'running'
+        """, (lease_seconds, job_id, worker_id))
+        return rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        """
+        Mark a job as done and store its result.
+
+        Returns:
+            bool: False if the worker no longer owned the job
+        """
+        _, rowcount = self._execute("""
+            UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_expires_at = NULL, updated_at = {now}
+            WHERE id = ? AND worker_id = ? AND status = 'running'
+        """, (json.dumps(result), job_id, worker_id))
+        return rowcount == 1
+
+    def fail(self, job_id, worker_id, error, retry_delay=30.0):
+        """
+        Record a failed attempt; the job is retried after a delay until it runs out of attempts.
+
+        Returns:
+            str: New job status ('queued' or 'failed'), None if the worker no longer owned the job
+        """
+        rows, _ = self._execute("""
+            UPDATE jobs
+            SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                available_at = {now} + ?, error = ?, worker_id = NULL, lease_expires_at = NULL,
+                updated_at = {now}
+            WHERE id = ? AND worker_id = ? AND status = 'running'
+            RETURNING status
+        """, (retry_delay, error, job_id, worker_id))
+        return rows[0]["status"] if rows else None
+
+    def reap_expired(self):
+        """
+        Fail running jobs whose lease expired after their last allowed attempt.
+
+        Returns:
+            int: Number of jobs marked failed
+        """
+        _, rowcount = self._execute("""
+            UPDATE jobs SET status = 'failed', error = 'Lease expired', lease_expires_at = NULL, updated_at = {now}
+            WHERE status = 'running' AND lease_expires_at < {now} AND attempts >= max_attempts
+        """)
+        return max(rowcount, 0)
+
+    def get_job(self, job_id):
+        """Retrieve a job by its id, None if not found."""
+        rows, _ = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def stats(self):
+        """Count jobs per status."""
+        rows, _ = self._execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({row["status"]: row["count"] for row in rows})
+        return counts
+
+    def __enter__(self):
+        """Context manager entry - establishes connection."""
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit - ensures connection is closed."""
+        self.close()
+
+
+class PostgresJobQueue(JobQueue):
+    """Job queue on PostgreSQL; concurrent claims skip rows locked by other workers."""
+    placeholder = "%s"
+    now_sql = "EXTRACT(EPOCH FROM clock_timestamp())"
+    claim_lock_sql = "FOR UPDATE SKIP LOCKED"
+
+    def __init__(self, db_config=DB_CONFIG):
+        super().__init__()
+        self.db_config = db_config  # Store DB connection parameters
+
+    def connect(self):
+        """Establish a connection to the PostgreSQL database."""
+        self.conn = psycopg2.connect(**self.db_config, cursor_factory=RealDictCursor)
+        self.cursor = self.conn.cursor()
+
+
+class SQLiteJobQueue(JobQueue):
+    """Single-machine stand-in; claims are serialized by SQLite's database-level write lock."""
+    placeholder = "?"
+    now_sql = "((julianday('now') - 2440587.5) * 86400.0)"
+    claim_lock_sql = ""
+
+    def __init__(self, path=JOB_QUEUE_SQLITE_PATH):
+        super().__init__()
+        self.path = path  # Path to the SQLite database file
+
+    def connect(self):
+        """Open the SQLite database, waiting for other processes' write locks."""
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.cursor = self.conn.cursor()
+
+
+def create_job_queue(backend=JOB_QUEUE_BACKEND):
+    """
+    Create a job queue for the configured backend.
+
+    Args:
+        backend (str): 'postgres' or 'sqlite'
+
+    Returns:
+        JobQueue: An unconnected job queue, use it as a context manager
+    """
+    if backend == "postgres":
+        return PostgresJobQueue()
+    if backend == "sqlite":
+        return SQLiteJobQueue()
+    raise ValueError(f"Unknown job queue backend: {backend}")
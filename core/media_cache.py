@@ -0,0 +1,142 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+import cv2
+
+from config import MEDIA_CACHE_SIZE, SNAPSHOTS_DIRECTORY, FFMPEG_CLIP_TIMEOUT_SECONDS
+
+
+class LRUCache:
+    def __init__(self, max_entries):
+        """
+        Initialize a thread-safe least-recently-used cache.
+
+        Args:
+            max_entries (int): Number of entries kept before the oldest is evicted
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_create(self, key, create):
+        """
+        Get a cached value, computing and caching it on a miss.
+
+        Args:
+            key (hashable): Cache key
+            create (callable): Computes the value on a miss
+
+        Returns:
+            The cached or newly computed value
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        # Computed outside the lock so slow loads don't serialize other keys
+        value = create()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        """Get the cache size and hit/miss counters."""
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+def file_key(path):
+    """
+    Get a cache key that changes when a file is replaced or modified.
+
+    Args:
+        path (str): File path
+
+    Returns:
+        tuple: (absolute path, modification time in ns, size)
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+_probe_cache = LRUCache(MEDIA_CACHE_SIZE)
+
+
+def probe_video(video_path):
+    """
+    Read the metadata of a video, opening it only once per version of the file.
+
+    Args:
+        video_path (str): Path to the video
+
+    Returns:
+        dict: fps, frame_count, width, height and duration (seconds)
+    """
+    def probe():
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise Exception(f"Could not open video file: {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25  # Default to 25 if not available
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        metadata = {
+            "fps": fps,
+            "frame_count": frame_count,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "duration": frame_count / fps if frame_count > 0 else None,
+        }
+        cap.release()
+        print(f"[INFO] Probed {video_path}: {metadata}")
+        return metadata
+
+    return _probe_cache.get_or_create(file_key(video_path), probe)
+
+
+def extract_snapshot(video_path, timestamp, width=None):
+    """
+    Extract the frame at a timestamp as a JPEG, cached on disk per video version.
+
+    FFmpeg seeks on the input (-ss before -i): it jumps to the keyframe preceding the
+    timestamp and decodes only from there, instead of decoding from the start.
+
+    Args:
+        video_path (str): Path to the video
+        timestamp (float): Position in seconds
+        width (int, optional): Thumbnail width, the height keeps the aspect ratio
+
+    Returns:
+        str: Path of the cached JPEG
+    """
+    _, mtime_ns, _ = file_key(video_path)
+    thumbnails_directory = os.path.join(SNAPSHOTS_DIRECTORY, "thumbnails")
+    os.makedirs(thumbnails_directory, exist_ok=True)
+    name = f"{os.path.basename(video_path)}_{mtime_ns}_{int(round(timestamp * 1000))}_{width or 'full'}.jpg"
+    snapshot_path = os.path.join(thumbnails_directory, name)
+    if os.path.exists(snapshot_path):
+        return snapshot_path
+
+    command = ["ffmpeg", "-y", "-ss", f"{timestamp:.3f}", "-i", video_path, "-frames:v", "1"]
+    if width:
+        command += ["-vf", f"scale={int(width)}:-2"]
+    tmp_path = f"{snapshot_path}.{uuid.uuid4().hex}.jpg"
+    # Imported here, the executor module itself depends on this one
+    from core.ffmpeg_executor import FFmpegError, get_executor
+    try:
+        get_executor().run_sync(command + ["-q:v", "3", tmp_path], timeout=FFMPEG_CLIP_TIMEOUT_SECONDS,
+                                label="snapshot")
+    except FFmpegError as e:
+        print(f"FFmpeg snapshot error: {e} {e.stderr}")
+        raise Exception(f"Failed to extract snapshot at {timestamp}s")
+    if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
+        raise Exception(f"No frame at {timestamp}s")
+    # Publish atomically so concurrent requests never serve a partial file
+    os.replace(tmp_path, snapshot_path)
+    return snapshot_path
@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    def __init__(self, method="diff", downscale_width=160, pixel_threshold=25,
+                 min_motion_ratio=0.002, hold_frames=3, band=None):
+        """
+        Initialize a cheap motion detector used to skip inference on static frames.
+
+        Args:
+            method (str): 'diff' for frame differencing or 'mog2' for background subtraction
+            downscale_width (int): Width of the downscaled copy the gate works on
+            pixel_threshold (int): Minimum gray-level change for a pixel to count as moving
+            min_motion_ratio (float): Fraction of moving pixels needed to open the gate
+            hold_frames (int): Frames to keep the gate open after the last motion, so that
+                tracks are not dropped while a vehicle slows down or leaves the frame
+            band (tuple, optional): (y_min, y_max) in full-resolution pixels; only motion
+                inside this band (e.g. the measurement zone) opens the gate
+        """
+        if method not in ("diff", "mog2"):
+            raise ValueError(f"Unknown motion gate method: {method}")
+        self.method = method
+        self.downscale_width = downscale_width
+        self.pixel_threshold = pixel_threshold
+        self.min_motion_ratio = min_motion_ratio
+        self.hold_frames = hold_frames
+        self.band = band
+        self.previous = None  # Previous downscaled gray frame (diff method)
+        self.subtractor = None  # Background subtractor (mog2 method)
+        self.hold = 0  # Remaining frames to keep the gate open
+        self.frames = 0  # Frames seen by the gate
+        self.inferred = 0  # Frames passed on to the detector
+
+    def _prepare(self, frame):
+        """
+        Downscale, convert to gray, blur and crop a frame to the gated band.
+
+        Args:
+            frame (numpy.ndarray): Full-resolution BGR frame
+
+        Returns:
+            numpy.ndarray: Small gray image
+        """
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.downscale_width / float(w))
+        small = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        if self.band is not None:
+            y_min = max(0, int(min(self.band) * scale))
+            y_max = min(gray.shape[0], int(np.ceil(max(self.band) * scale)) + 1)
+            gray = gray[y_min:y_max]
+        return gray
+
+    def _motion_ratio(self, gray):
+        """Compute the fraction of moving pixels in a prepared frame."""
+        if self.method == "mog2":
+            if self.subtractor is None:
+                self.subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+            mask = self.subtractor.apply(gray)
+            return np.count_nonzero(mask) / float(mask.size)
+
+        previous, self.previous = self.previous, gray
+        if previous is None or previous.shape != gray.shape:
+            return 1.0  # No reference yet, treat as moving
+        diff = cv2.absdiff(gray, previous)
+        return np.count_nonzero(diff > self.pixel_threshold) / float(diff.size)
+
+    def has_motion(self, frame):
+        """
+        Decide whether a frame needs to be passed to the detector.
+
+        Args:
+            frame (numpy.ndarray): Full-resolution BGR frame
+
+        Returns:
+            bool: True if the frame contains motion (or is within the hold window)
+        """
+        self.frames += 1
+        gray = self._prepare(frame)
+        if gray.size == 0:
+            moving = True
+        else:
+            moving = bool(self._motion_ratio(gray) >= self.min_motion_ratio)
+
+        if moving:
+            self.hold = self.hold_frames
+        elif self.hold > 0:
+            self.hold -= 1
+            moving = True
+
+        if moving:
+            self.inferred += 1
+        return moving
+
+    def to_checkpoint(self):
+        """
+        Get the gate state for checkpointing. The MOG2 background model cannot be
+        serialized and is relearned after a restore.
+
+        Returns:
+            dict: Reference frame, hold counter and statistics
+        """
+        return {"previous": self.previous, "hold": self.hold, "frames": self.frames, "inferred": self.inferred}
+
+    def restore_checkpoint(self, state):
+        """Restore the gate state saved by to_checkpoint()."""
+        self.previous = state["previous"]
+        self.hold = state["hold"]
+        self.frames = state["frames"]
+        self.inferred = state["inferred"]
+
+    def stats(self):
+        """
+        Get gating statistics.
+
+        Returns:
+            dict: Frames seen, inferred and skipped, and the skip ratio
+        """
+        skipped = self.frames - self.inferred
+        return {
+            "method": self.method,
+            "frames": self.frames,
+            "inferred_frames": self.inferred,
+            "skipped_frames": skipped,
+            "skip_ratio": round(skipped / self.frames, 4) if self.frames else 0.0
+        }
@@ -0,0 +1,722 @@
+import os
+import json
+import time
+import functools
+import cv2
+
+from core.camera_calibration import CameraCalibrator
+from core.vehicle_tracker import VehicleTracker, stride_sort_params
+from core.sort import Sort
+from core.database import Database
+from core.detector import BACKENDS
+from core.motion_gate import MotionGate
+from core.zones import Zone, ZoneMap
+from core.checkpoint import CheckpointStore, segment_path, remove_segments
+from core.frame_ring import RingDecoder, RingEncoder
+from core.report_sink import ReportSink, cut_clips, hls_clip_url
+from core.ffmpeg_executor import FFmpegError, get_executor
+from core.hls import package_hls, hls_directory, hls_url_prefix
+from core.media_cache import LRUCache, file_key, probe_video
+from core.storage import get_storage
+from core.video_decoder import DECODERS, FFmpegDecoder, scaled_size
+from core.profiler import JobProbe
+from core.rollups import camera_id, job_key, record_job_statistics
+from core.previews import PreviewRecorder
+from config import (SPEED_THRESHOLD_KMH, REAL_DISTANCE_METERS, DETECTOR_BACKEND, MODEL_PATH,
+                    MOTION_GATE_MIN_RATIO, MOTION_GATE_BAND_MARGIN, PROCESSED_VIDEOS_DIRECTORY,
+                    VIDEO_CLIPS_DIRECTORY, UPLOAD_DIRECTORY, CALIBRATION_DIRECTORY, SNAPSHOTS_DIRECTORY, PREVIEWS_DIRECTORY,
+                    DB_CONFIG, CHECKPOINT_DIRECTORY, CHECKPOINT_INTERVAL_FRAMES, PIPELINE_MULTIPROCESS,
+                    FRAME_RING_SLOTS, INCREMENTAL_REPORTS, REPORT_SINK_BATCH_SIZE, REPORT_SINK_FLUSH_SECONDS,
+                    MEDIA_CACHE_SIZE, HLS_OUTPUT, HLS_SEGMENT_SECONDS, VIDEO_DECODER, PROFILE_POLL_FRAMES,
+                    STORAGE_JOB_REFRESH_SECONDS)
+
+
+class JobError(Exception):
+    def __init__(self, message, status_code=500):
+        """
+        Error raised by the processing pipeline.
+
+        Args:
+            message (str): Error description
+            status_code (int): HTTP status code the web app should answer with
+        """
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def ensure_directories():
+    """Create the storage directories if they don't exist."""
+    for directory in (UPLOAD_DIRECTORY, CALIBRATION_DIRECTORY, PROCESSED_VIDEOS_DIRECTORY,
+                      VIDEO_CLIPS_DIRECTORY, SNAPSHOTS_DIRECTORY, PREVIEWS_DIRECTORY):
+        os.makedirs(directory, exist_ok=True)
+
+
+def migrate_database():
+    """
+    Add the columns of newer features to the reports table, once per process before
+    jobs run. A database that can't be reached is reported and left to the jobs.
+    """
+    try:
+        with Database(DB_CONFIG) as db:
+            db.add_preview_columns()
+    except Exception as e:
+        print(f"[WARN] Could not migrate the reports table: {e}")
+
+
+def job_paths(video_filename):
+    """
+    Get the output paths of a processing job.
+
+    Args:
+        video_filename (str): Source video filename
+
+    Returns:
+        dict: Paths of the annotated, converted video, speed log, speed profiles and job summary
+    """
+    return {
+        "output_video_path": os.path.join(PROCESSED_VIDEOS_DIRECTORY, f"processed_{video_filename}"),
+        "converted_video_path": os.path.join(PROCESSED_VIDEOS_DIRECTORY, f"converted_{video_filename}"),
+        "log_file_path": os.path.join(PROCESSED_VIDEOS_DIRECTORY, f"speed_log_{video_filename}.json"),
+        "profile_path": os.path.join(PROCESSED_VIDEOS_DIRECTORY, f"speed_profile_{video_filename}.json"),
+        "summary_path": os.path.join(PROCESSED_VIDEOS_DIRECTORY, f"job_{video_filename}.json"),
+        "checkpoint_path": os.path.join(CHECKPOINT_DIRECTORY, f"{video_filename}.ckpt"),
+        "profile_spool_path": os.path.join(CHECKPOINT_DIRECTORY, f"{video_filename}.profiles.jsonl"),
+    }
+
+
+def is_job_done(video_filename):
+    """Check whether a video has already been processed to completion."""
+    return os.path.exists(job_paths(video_filename)["summary_path"])
+
+
+# Parsed calibrations with their derived zones, keyed by the video and calibration file versions
+_calibration_cache = LRUCache(MEDIA_CACHE_SIZE)
+
+
+def load_camera(video_path, calibration_path):
+    """
+    Load the calibration of a video and derive its measurement zones.
+
+    Results are cached until the video or calibration file changes, so repeated
+    jobs don't re-parse the calibration or touch the video.
+
+    Args:
+        video_path (str): Path to the source video
+        calibration_path (str): Path to the calibration JSON
+
+    Returns:
+        tuple: (Zone objects, the calibrated zones or the single band between the markers;
+            image-to-ground homography; tuned inference size or None)
+    """
+    def load():
+        # Initialize and configure camera calibrator
+        calibrator = CameraCalibrator(video_path)
+        calibrator.load_calibration(calibration_path)
+        # Get y-coordinates of green and red marker lines for speed calculation
+        marker_lines = calibrator.compute_marker_lines()
+        green_line_y = marker_lines.get('green')
+        red_line_y = marker_lines.get('red')
+
+        if green_line_y is None or red_line_y is None:
+            raise JobError("Failed to determine marker lines")
+
+        # Use the calibrated zones/lanes if present, otherwise the single band between the markers
+        zones = calibrator.zones or [Zone("default", REAL_DISTANCE_METERS, band=(green_line_y, red_line_y))]
+        return zones, calibrator.ground_homography, calibrator.inference.get('imgsz')
+
+    return _calibration_cache.get_or_create((file_key(video_path), file_key(calibration_path)), load)
+
+
+def transcode_video(input_path, output_path):
+    """
+    Convert a video to a browser-compatible format using FFmpeg.
+
+    Keyframes are forced every HLS_SEGMENT_SECONDS, so the video can be split into
+    equal HLS segments without re-encoding.
+
+    Args:
+        input_path (str): Path to the mp4v video written by OpenCV
+        output_path (str): Path to the H.264 output video
+    """
+    try:
+        get_executor().run_sync([
+            "ffmpeg", "-y", "-i", input_path, "-c:v", "libx264", "-c:a", "aac",
+            "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+            "-movflags", "+faststart", "-strict", "-2", output_path
+        ], label="transcode")
+        print(f"Converted video created: {output_path}")
+    except FFmpegError as e:
+        print(f"FFmpeg error: {e} {e.stderr}")
+        raise JobError(f"FFmpeg conversion failed: {e} {e.stderr}")
+
+
+def open_capture_at(video_path, frame_offset=0):
+    """
+    Open a video positioned at a frame offset.
+
+    Seeking is verified; if the container cannot seek exactly, frames are skipped by
+    grabbing them without decoding to the output image, so the position is always exact.
+
+    Args:
+        video_path (str): Path to the video
+        frame_offset (int): Index of the next frame to read
+
+    Returns:
+        cv2.VideoCapture: Opened capture positioned at frame_offset
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise JobError("Failed to open input video")
+    if frame_offset > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_offset)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_offset:
+            print(f"[WARN] Inexact seek, skipping {frame_offset} frames sequentially")
+            cap.release()
+            cap = cv2.VideoCapture(video_path)
+            for _ in range(frame_offset):
+                if not cap.grab():
+                    break
+    return cap
+
+
+def concat_segments(segments, output_path):
+    """
+    Join annotated output segments into one video without re-encoding.
+
+    Args:
+        segments (list): Segment paths in playback order
+        output_path (str): Path to the joined video
+    """
+    if len(segments) == 1:
+        os.replace(segments[0], output_path)
+        return
+    list_path = f"{output_path}.segments.txt"
+    with open(list_path, 'w') as f:
+        for segment in segments:
+            f.write(f"file '{os.path.abspath(segment)}'\n")
+    try:
+        get_executor().run_sync([
+            "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path
+        ], label="concat")
+    except FFmpegError as e:
+        print(f"FFmpeg concat error: {e} {e.stderr}")
+        raise JobError(f"FFmpeg segment concatenation failed: {e} {e.stderr}")
+    finally:
+        os.remove(list_path)
+    for segment in segments:
+        os.remove(segment)
+
+
+def create_reports(logs, clip_source_path, video_filename, hls_clips=False):
+    """
+    Cut clips and insert reports for vehicles exceeding the speed threshold.
+
+    Args:
+        logs (list): Speed logs of the job
+        clip_source_path (str): Video the clips are cut from
+        video_filename (str): Source video filename stored with the reports
+        hls_clips (bool): Reference time ranges of the HLS segments instead of cutting clips
+
+    Returns:
+        int: Number of inserted reports
+    """
+    violations = []
+    for log in logs:
+        print(f"Processing log for track_id {log['track_id']}: speed={log['speed_kmh']} km/h")
+        # Skip vehicles below speed threshold
+        if log['speed_kmh'] <= SPEED_THRESHOLD_KMH:
+            print(f"Skipping report for track_id {log['track_id']}: speed {log['speed_kmh']} km/h <= {SPEED_THRESHOLD_KMH} km/h")
+            continue
+        violations.append((log, f"clip_track_{log['track_id']}_{int(log['timestamp'])}.mp4"))
+
+    # Generate the video clips of all reports concurrently, or point at HLS segment ranges
+    if hls_clips:
+        clip_urls = [hls_clip_url(video_filename, log) for log, _ in violations]
+    elif violations:
+        clip_urls = cut_clips(violations, clip_source_path)
+    else:
+        clip_urls = []
+
+    inserted = 0
+    with Database(DB_CONFIG) as db:
+        for (log, _), clip_url in zip(violations, clip_urls):
+            if clip_url is None:
+                continue
+
+            # Insert report into database
+            track_id = log['track_id']
+            db.insert_report(
+                track_id=track_id,
+                speed_kmh=log['speed_kmh'],
+                duration_s=log['duration_s'],
+                timestamp=log['timestamp'],
+                clip_path=clip_url,
+                video_filename=video_filename,
+                poster_path=log.get('poster_path'),
+                sprite_path=log.get('sprite_path')
+            )
+            inserted += 1
+            print(f"Inserted report for track_id {track_id} with clip_path: {clip_url}")
+    return inserted
+
+
+def fails_storage_job(function):
+    """
+    Mark the storage job of the video failed when the decorated job function raises,
+    so a failed or cancelled job is not treated as running until it ages out.
+    """
+    @functools.wraps(function)
+    def wrapper(video_path, *args, **kwargs):
+        try:
+            return function(video_path, *args, **kwargs)
+        except BaseException:
+            try:
+                get_storage().fail_job(os.path.basename(video_path))
+            except Exception as e:
+                print(f"[WARN] Could not mark the job of {video_path} as failed: {e}")
+            raise
+    return wrapper
+
+
+@fails_storage_job
+def process_video_job(video_path, calibration_path, analytics_only=False, backend=DETECTOR_BACKEND,
+                      motion_gate=None, motion_gate_band_only=True, motion_gate_band_margin=MOTION_GATE_BAND_MARGIN,
+                      checkpoint_interval=CHECKPOINT_INTERVAL_FRAMES, detector=None,
+                      multiprocess=PIPELINE_MULTIPROCESS, incremental_reports=INCREMENTAL_REPORTS,
+                      decoder=VIDEO_DECODER, decode_width=None, frame_stride=1, imgsz=None, default_imgsz=None,
+                      cancel_event=None):
+    """
+    Run the calibration -> VehicleTracker -> reports pipeline on one video.
+
+    Args:
+        video_path (str): Path to the source video
+        calibration_path (str): Path to the calibration JSON
+        analytics_only (bool): Skip drawing, VideoWriter and transcoding; produce only
+            logs, reports and clips cut from the source video
+        backend (str): Detector inference backend
+        motion_gate (str, optional): Motion gate method ('diff' or 'mog2'), disabled if None
+        motion_gate_band_only (bool): Only consider motion inside the measurement zones
+        motion_gate_band_margin (int): Pixels added around the zones when gating inside them
+        checkpoint_interval (int): Frames between checkpoints of the tracking state and
+            partial outputs; a restarted job resumes from the last one. 0 disables checkpoints
+        detector (optional): Shared detector for the backend (e.g. an InferenceClient),
+            the model is loaded for this job if None
+        multiprocess (bool): Decode and encode in separate processes that exchange frames
+            with the frame loop through a shared-memory ring instead of copies
+        incremental_reports (bool): Create reports while the video is processed, with
+            clips cut from the source video, instead of after the whole job
+        decoder (str): Frame decoder, 'opencv' or 'ffmpeg' (scales and decimates
+            inside ffmpeg and passes exact frame timestamps to the tracker)
+        decode_width (int, optional): Decode frames scaled to this width (ffmpeg
+            decoder, analytics-only mode); detections are mapped back to source pixels
+        frame_stride (int): Process every frame_stride-th frame only
+        imgsz (int, optional): Detector input size; the size tuned for the camera and
+            stored in the calibration, or the model default, if None. Ignored when a
+            shared detector is passed, which has its own size
+        default_imgsz (int, optional): Detector input size for cameras without a tuned
+            size, e.g. from the autotune profile
+        cancel_event (threading.Event, optional): Aborts the job with a JobError when set,
+            e.g. by a worker that lost the lease of the job; checked for every frame
+
+    Returns:
+        dict: Job result with output paths, per-zone log counts and throughput figures
+    """
+    job_start = time.perf_counter()
+    video_filename = os.path.basename(video_path)
+    paths = job_paths(video_filename)
+    output_video_path = paths["output_video_path"]
+    converted_video_path = paths["converted_video_path"]
+    log_file_path = paths["log_file_path"]
+
+    # Validate file existence
+    if not os.path.exists(video_path):
+        raise JobError(f"Video file {video_path} not found", status_code=400)
+    if not os.path.exists(calibration_path):
+        raise JobError(f"Calibration file {calibration_path} not found", status_code=400)
+    if backend not in BACKENDS:
+        raise JobError(f"Unknown detector backend: {backend}", status_code=400)
+    if decoder not in DECODERS:
+        raise JobError(f"Unknown decoder: {decoder}", status_code=400)
+    if frame_stride < 1:
+        raise JobError("frame_stride must be at least 1", status_code=400)
+    if decode_width and (decoder != "ffmpeg" or not analytics_only):
+        raise JobError("decode_width requires the ffmpeg decoder and analytics_only", status_code=400)
+    if multiprocess and (decoder != "opencv" or frame_stride > 1):
+        raise JobError("Multi-process decoding requires the opencv decoder without frame_stride", status_code=400)
+
+    # Get video properties and the size frames are decoded at
+    metadata = probe_video(video_path)
+    frame_width = metadata["width"]
+    frame_height = metadata["height"]
+    fps = int(metadata["fps"])
+    # Frame times use the exact rate, like the tracker's own clock at stride 1 (29.97, not 29)
+    source_fps = metadata["fps"]
+    decode_size = scaled_size(frame_width, frame_height, decode_width)
+    print(f"Video properties: width={frame_width}, height={frame_height}, fps={fps}, decoded at {decode_size}")
+
+    # Protect the upload and outputs of the job from storage sweeps while it runs
+    storage = get_storage()
+    storage.begin_job(video_filename)
+    storage_refreshed_at = time.time()
+
+    zones, homography, calibrated_imgsz = load_camera(video_path, calibration_path)
+    # Run the detector at the camera's tuned resolution unless a size was requested
+    imgsz = imgsz or calibrated_imgsz or default_imgsz
+    zone_map = ZoneMap(zones)
+
+    # Initialize motion gate, restricted to the measurement band if requested
+    gate = None
+    if motion_gate:
+        band = None
+        if motion_gate_band_only:
+            y_min, y_max = zone_map.vertical_extent()
+            band = (y_min - motion_gate_band_margin, y_max + motion_gate_band_margin)
+            # The gate sees the decoded frames
+            band = tuple(y * decode_size[1] / frame_height for y in band)
+        try:
+            gate = MotionGate(method=motion_gate, min_motion_ratio=MOTION_GATE_MIN_RATIO, band=band)
+        except ValueError as e:
+            raise JobError(str(e), status_code=400)
+
+    # Violations are turned into reports by a background sink as soon as they are logged;
+    # with HLS output they reference segment ranges once the output is packaged
+    sink = None
+    if incremental_reports:
+        sink = ReportSink(video_path, video_filename, batch_size=REPORT_SINK_BATCH_SIZE,
+                          flush_seconds=REPORT_SINK_FLUSH_SECONDS, hls_clips=HLS_OUTPUT and not analytics_only)
+    # Posters and preview sprites of violations are rendered from the frames in memory
+    # and added to the speed logs before they reach the sink
+    previews = PreviewRecorder(video_filename, on_ready=sink.submit if sink is not None else None)
+
+    # Initialize vehicle tracker with YOLO model and configuration
+    tracker = VehicleTracker(
+        yolo_model_path=MODEL_PATH,
+        log_file_path=log_file_path,
+        video_path=video_path,
+        real_distance_meters=REAL_DISTANCE_METERS,
+        backend=backend,
+        motion_gate=gate,
+        sort_tracker=Sort(**stride_sort_params(frame_stride)),
+        detector=detector,
+        imgsz=imgsz,
+        on_speed_logged=previews.submit
+    )
+    tracker.set_zones(zones)
+    # Profiles of finished tracks are spooled next to the checkpoint instead of kept in memory
+    tracker.set_ground_plane(homography, spool_path=paths["profile_spool_path"])
+    if decode_size != (frame_width, frame_height):
+        tracker.set_source_size(frame_width, frame_height)
+
+    # Resume from the last checkpoint of this job, if any. Options that change the
+    # outputs are part of the key, so a checkpoint is never resumed with other settings.
+    checkpoints = CheckpointStore(paths["checkpoint_path"], {
+        "video_path": os.path.abspath(video_path),
+        "calibration_path": os.path.abspath(calibration_path),
+        "analytics_only": analytics_only,
+        "backend": backend,
+        "motion_gate": motion_gate,
+        "motion_gate_band_only": motion_gate_band_only,
+        "motion_gate_band_margin": motion_gate_band_margin,
+        "decoder": decoder,
+        "decode_width": decode_width,
+        "frame_stride": frame_stride,
+        "imgsz": imgsz,
+    })
+    checkpoint = checkpoints.load() if checkpoint_interval else None
+    frame_offset = 0
+    segments = []  # Completed annotated output segments
+    if checkpoint is not None and not all(os.path.exists(segment) for segment in checkpoint["segments"]):
+        print("[WARN] Checkpointed output segments are missing, starting from frame 0")
+        checkpoint = None
+    if checkpoint is not None:
+        tracker.restore_checkpoint(checkpoint["tracker"])
+        frame_offset = checkpoint["frame_offset"]
+        segments = checkpoint["segments"]
+    # Drop segments written after the last checkpoint (or left by an earlier run)
+    remove_segments(output_video_path, keep=len(segments))
+    if checkpoint is None:
+        tracker.speed_profiler.clear_spool()  # Left by an earlier run
+
+    # Open input video at the resume position; ffmpeg seeks on the input itself
+    cap = None
+    ffmpeg_decoder = None
+    if decoder == "ffmpeg":
+        try:
+            ffmpeg_decoder = FFmpegDecoder(video_path, frame_offset, decode_width=decode_width, stride=frame_stride)
+        except (OSError, FFmpegError) as e:
+            raise JobError(f"Could not start the ffmpeg decoder: {e}")
+    else:
+        cap = open_capture_at(video_path, frame_offset)
+    # The annotated output keeps real-time playback when frames are skipped
+    output_fps = fps if frame_stride == 1 else source_fps / frame_stride
+
+    # In multi-process mode the decoder process reads frames into shared ring slots;
+    # only slot indices cross the process boundaries
+    ring_decoder = None
+    if multiprocess:
+        cap.release()
+        ring_decoder = RingDecoder(video_path, frame_offset, (frame_height, frame_width, 3), slots=FRAME_RING_SLOTS)
+
+    def read_frames():
+        # Yields (frame, ring slot, timestamp, source frame index); a None timestamp
+        # lets the tracker derive the time from its frame count
+        if ffmpeg_decoder is not None:
+            for frame, timestamp, index in ffmpeg_decoder.frames():
+                yield frame, None, timestamp, index
+            return
+        if ring_decoder is not None:
+            for index, (frame, slot) in enumerate(ring_decoder.frames(), start=frame_offset):
+                yield frame, slot, None, index
+            return
+        index = frame_offset
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield frame, None, None if frame_stride == 1 else (index + 1) / source_fps, index
+            # Skipped frames are only demuxed and decoded, not converted
+            for _ in range(frame_stride - 1):
+                if not cap.grab():
+                    return
+            index += frame_stride
+
+    def open_segment():
+        # The annotated output is written in segments that are closed at every checkpoint
+        path = segment_path(output_video_path, len(segments))
+        if ring_decoder is not None:
+            return RingEncoder(ring_decoder.ring, path, fps, (frame_width, frame_height))
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        writer = cv2.VideoWriter(path, fourcc, output_fps, (frame_width, frame_height))
+        if not writer.isOpened():
+            raise RuntimeError("Failed to open VideoWriter")
+        return writer
+
+    def close_segment(writer):
+        segments.append(segment_path(output_video_path, len(segments)))
+        if ring_decoder is not None:
+            writer.rotate(segment_path(output_video_path, len(segments)))
+        else:
+            writer.release()
+            writer = open_segment()
+        return writer
+
+    out = None
+    probe = None
+    if sink is not None:
+        sink.start()
+        if checkpoint is not None:
+            # Violations measured before the checkpoint may not have been reported when the
+            # earlier run stopped; the sink skips those whose clip is already recorded
+            for log in tracker.speed_logs:
+                sink.submit(log)
+    try:
+        # Initialize video writer for processed output (not needed in analytics-only mode)
+        if not analytics_only:
+            out = open_segment()
+
+        # Process video frames; frame_count is the index of the next source frame
+        frame_count = frame_offset
+        decoded_frames = 0
+        next_checkpoint = (frame_offset // checkpoint_interval + 1) * checkpoint_interval if checkpoint_interval else None
+        # Serves on-demand profiling requests (see /admin/profile) from this thread
+        probe = JobProbe(video_filename)
+        loop_start = time.perf_counter()
+        wait_start = loop_start
+        for frame, slot, timestamp, index in read_frames():
+            if cancel_event is not None and cancel_event.is_set():
+                raise JobError(f"Processing of {video_filename} was cancelled", status_code=409)
+            decode_seconds = time.perf_counter() - wait_start
+            # Track objects in the frame (drawing happens in place, also in a ring slot)
+            frame = tracker.track_objects(frame, draw=not analytics_only, timestamp=timestamp)
+            write_start = time.perf_counter()
+            if out is not None:
+                # Draw measurement zones (green and red marker lines for bands)
+                zone_map.draw(frame)
+            # Before the slot is handed to the encoder process
+            previews.add_frame(frame, tracker.current_time)
+            if out is not None:
+                if slot is None:
+                    out.write(frame)
+                else:
+                    # The encoder process writes the slot and recycles it
+                    out.write(slot)
+            elif slot is not None:
+                ring_decoder.release(slot)
+            frame_count = index + frame_stride
+            decoded_frames += 1
+            if decoded_frames % 100 == 0:
+                print(f"Processed {frame_count} frames")
+            if probe.recording_stages:
+                probe.record_frame(index, timestamp, dict(decode=decode_seconds, **tracker.stage_seconds,
+                                                          write=time.perf_counter() - write_start))
+            if decoded_frames % PROFILE_POLL_FRAMES == 0:
+                probe.poll()
+                # Jobs running longer than STORAGE_ACTIVE_JOB_SECONDS stay protected
+                if time.time() - storage_refreshed_at > STORAGE_JOB_REFRESH_SECONDS:
+                    storage.refresh_job(video_filename)
+                    storage_refreshed_at = time.time()
+
+            # Periodically checkpoint tracker state, frame offset and completed segments
+            if next_checkpoint is not None and frame_count >= next_checkpoint:
+                next_checkpoint += checkpoint_interval
+                if out is not None:
+                    out = close_segment(out)
+                checkpoints.save({
+                    "frame_offset": frame_count,
+                    "tracker": tracker.to_checkpoint(),
+                    "segments": segments,
+                })
+            wait_start = time.perf_counter()
+        loop_seconds = time.perf_counter() - loop_start
+        probe.finish()
+        previews.finish()
+        if metadata["frame_count"] > 0:
+            frame_count = min(frame_count, metadata["frame_count"])  # The last stride may overshoot
+        frames_this_run = frame_count - frame_offset
+        print(f"Total frames processed: {frame_count} ({frames_this_run} in this run)")
+
+        if out is not None:
+            if ring_decoder is not None:
+                out.close()
+            else:
+                out.release()
+            out = None
+            segments.append(segment_path(output_video_path, len(segments)))
+    except BaseException as e:
+        if probe is not None:
+            probe.finish()
+        # Keep the violations found before the failure
+        previews.finish()
+        if sink is not None:
+            sink.close(packaged=False)
+        if isinstance(e, RuntimeError):
+            raise JobError(str(e))
+        raise
+    finally:
+        if out is not None:
+            if ring_decoder is not None:
+                out.close()
+            else:
+                out.release()
+        if ffmpeg_decoder is not None:
+            ffmpeg_decoder.close()
+        elif ring_decoder is not None:
+            ring_decoder.close()
+        else:
+            cap.release()
+
+    transcode_seconds = 0.0
+    # The report sink keeps cutting clips while the output is joined and transcoded
+    try:
+        if not analytics_only:
+            concat_segments(segments, output_video_path)
+
+            # Verify output video was created
+            if not os.path.exists(output_video_path):
+                raise JobError("Output video file was not created")
+            file_size = os.path.getsize(output_video_path)
+            print(f"Output video created: {output_video_path}, size={file_size} bytes")
+
+            transcode_start = time.perf_counter()
+            transcode_video(output_video_path, converted_video_path)
+            if HLS_OUTPUT:
+                try:
+                    package_hls(converted_video_path, video_filename)
+                except FFmpegError as e:
+                    raise JobError(f"HLS packaging failed: {e} {e.stderr}")
+            transcode_seconds = time.perf_counter() - transcode_start
+    except JobError:
+        if sink is not None:
+            sink.close(packaged=False)
+        raise
+
+    # Save tracking logs and per-frame speed profiles
+    tracker.save_logs()
+    tracker.save_speed_profiles(paths["profile_path"])
+    tracker.speed_profiler.clear_spool()
+
+    # Load speed logs
+    with open(log_file_path, 'r') as f:
+        logs = json.load(f)
+
+    print(f"Loaded logs: {json.dumps(logs, indent=2)}")
+
+    if not logs:
+        print("Warning: No speed logs found in the log file")
+
+    # Fold every measurement, not only violations, into the traffic statistics
+    try:
+        record_job_statistics(video_filename, camera_id(calibration_path), logs, job_key(video_path))
+    except Exception as e:
+        print(f"[WARN] Failed to update the traffic statistics of {video_filename}: {e}")
+
+    # Clips are cut from (or reference the HLS segments of) the annotated video,
+    # or are cut from the source in analytics-only mode
+    clip_source_path = video_path if analytics_only else converted_video_path
+
+    # Insert speed reports into database for vehicles exceeding threshold; with the
+    # report sink only the violations still queued at the end of the loop remain
+    clips_start = time.perf_counter()
+    if sink is not None:
+        sink.close()
+        reports = sink.inserted
+    else:
+        reports = create_reports(logs, clip_source_path, video_filename,
+                                 hls_clips=HLS_OUTPUT and not analytics_only)
+    clips_seconds = time.perf_counter() - clips_start
+
+    # Report throughput of each stage so modes can be compared
+    total_seconds = time.perf_counter() - job_start
+    throughput = {
+        "mode": "analytics" if analytics_only else "annotated",
+        "backend": backend,
+        "multiprocess": multiprocess,
+        "decoder": decoder,
+        "decode_size": list(decode_size),
+        "frame_stride": frame_stride,
+        "decoded_frames": decoded_frames,
+        "imgsz": imgsz,
+        "frames": frame_count,
+        "resumed_from_frame": frame_offset,
+        "frame_loop_seconds": round(loop_seconds, 3),
+        "frame_loop_fps": round(frames_this_run / loop_seconds, 2) if loop_seconds > 0 else None,
+        "transcode_seconds": round(transcode_seconds, 3),
+        "clips_seconds": round(clips_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "effective_fps": round(frames_this_run / total_seconds, 2) if total_seconds > 0 else None
+    }
+    if gate is not None:
+        throughput["motion_gate"] = gate.stats()
+    if sink is not None:
+        throughput["report_sink"] = sink.stats()
+    throughput["previews"] = previews.stats()
+    print(f"Throughput: {throughput}")
+
+    result = {
+        "status": "success",
+        "video_path": None if analytics_only else f"/processed_videos/converted_{video_filename}",
+        "hls_path": f"{hls_url_prefix(video_filename)}index.m3u8" if HLS_OUTPUT and not analytics_only else None,
+        "log_path": f"/processed_videos/speed_log_{video_filename}.json",
+        "profile_path": f"/processed_videos/speed_profile_{video_filename}.json",
+        "zones": {name: len(zone_logs) for name, zone_logs in tracker.logs_by_zone().items()},
+        "reports": reports,
+        "throughput": throughput
+    }
+
+    # Another worker may own the job now; leave its checkpoints and summary alone
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobError(f"Processing of {video_filename} was cancelled", status_code=409)
+
+    # The job summary marks the video as done for batch processing
+    with open(paths["summary_path"], 'w') as f:
+        json.dump(result, f, indent=4)
+    checkpoints.clear()
+
+    # Index the outputs of the job; the mp4v video was only needed for transcoding
+    storage.complete_job(
+        video_filename,
+        outputs=[converted_video_path, log_file_path, paths["profile_path"], paths["summary_path"],
+                 hls_directory(video_filename)],
+        intermediates=[] if analytics_only else [output_video_path]
+    )
+    return result
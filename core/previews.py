@@ -0,0 +1,140 @@
+import os
+import math
+from collections import deque
+import cv2
+import numpy as np
+
+from core.report_sink import slugify
+from config import (SPEED_THRESHOLD_KMH, PREVIEWS_DIRECTORY, PREVIEW_WIDTH, PREVIEW_BUFFER_FPS,
+                    PREVIEW_BUFFER_SECONDS, PREVIEW_SPRITE_FRAMES, PREVIEW_SPRITE_COLUMNS,
+                    PREVIEW_SPRITE_TILE_WIDTH, PREVIEW_JPEG_QUALITY)
+
+# Seconds shown before a vehicle enters and after it leaves a zone, like the clips
+PREVIEW_PADDING_SECONDS = 0.5
+
+
+def preview_filenames(video_filename, log):
+    """Get the deterministic poster and sprite filenames of a speed log."""
+    stem = f"preview_{os.path.splitext(video_filename)[0]}_track_{log['track_id']}_{slugify(log['zone'])}_{int(log['start_time'] * 1000)}"
+    return f"{stem}_poster.jpg", f"{stem}_sprite.jpg"
+
+
+def build_sprite(frames, columns=PREVIEW_SPRITE_COLUMNS, tile_width=PREVIEW_SPRITE_TILE_WIDTH):
+    """
+    Tile frames into a sprite sheet, row by row.
+
+    Args:
+        frames (list): Frames of equal size
+        columns (int): Tiles per row
+        tile_width (int): Width of a tile; the height keeps the aspect ratio
+
+    Returns:
+        numpy.ndarray: The sprite sheet, unused tiles are black
+    """
+    height, width = frames[0].shape[:2]
+    tile_height = max(1, round(height * tile_width / width))
+    rows = math.ceil(len(frames) / columns)
+    sheet = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        row, column = divmod(i, columns)
+        sheet[row * tile_height:(row + 1) * tile_height, column * tile_width:(column + 1) * tile_width] = \
+            cv2.resize(frame, (tile_width, tile_height), interpolation=cv2.INTER_AREA)
+    return sheet
+
+
+class PreviewRecorder:
+    def __init__(self, video_filename, on_ready=None, width=PREVIEW_WIDTH, buffer_fps=PREVIEW_BUFFER_FPS,
+                 buffer_seconds=PREVIEW_BUFFER_SECONDS, threshold=SPEED_THRESHOLD_KMH):
+        """
+        Render the poster frame and preview sprite of violations from frames in memory.
+
+        The frame loop hands over every frame; a few per second are downscaled into a
+        ring buffer covering the last buffer_seconds of video. A violation is rendered
+        once the video has advanced past its padded end, so no frame is decoded again
+        and no clip has to be read back. The preview URLs are added to the speed log
+        ('poster_path', 'sprite_path') before it is passed on to on_ready, so they are
+        stored with the report.
+
+        Args:
+            video_filename (str): Source video filename, part of the preview names
+            on_ready (callable, optional): Receives every speed log once its previews
+                are rendered (immediately for logs below the threshold)
+            width (int): Width of the buffered frames and the poster
+            buffer_fps (float): Frames per second kept in the buffer
+            buffer_seconds (float): Video time covered by the buffer
+            threshold (float): Speed above which a log gets previews
+        """
+        self.video_filename = video_filename
+        self.on_ready = on_ready
+        self.width = width
+        self.interval = 1.0 / buffer_fps
+        self.frames = deque(maxlen=max(1, int(buffer_fps * buffer_seconds)))  # (time, downscaled frame)
+        self.threshold = threshold
+        self.pending = []  # Violations waiting for the frames after their zone exit
+        self.rendered = 0
+        self.missed = 0  # Violations whose frames had already left the buffer
+
+    def submit(self, log):
+        """Hand over a speed log; called from VehicleTracker for every measurement."""
+        if log['speed_kmh'] > self.threshold:
+            self.pending.append(log)
+        elif self.on_ready is not None:
+            self.on_ready(log)
+
+    def add_frame(self, frame, current_time):
+        """
+        Buffer a frame of the frame loop and render the violations it completes.
+
+        Args:
+            frame (numpy.ndarray): Frame as written to the output (or as tracked)
+            current_time (float): Time of the frame in the video timeline
+        """
+        if not self.frames or current_time - self.frames[-1][0] >= self.interval:
+            height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+            self.frames.append((current_time, cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)))
+        ready = [log for log in self.pending if current_time >= log['end_time'] + PREVIEW_PADDING_SECONDS]
+        for log in ready:
+            self.pending.remove(log)
+            self._render(log)
+
+    def finish(self):
+        """Render the violations still waiting at the end of the video."""
+        pending, self.pending = self.pending, []
+        for log in pending:
+            self._render(log)
+
+    def _render(self, log):
+        start = log['start_time'] - PREVIEW_PADDING_SECONDS
+        end = log['end_time'] + PREVIEW_PADDING_SECONDS
+        window = [(t, frame) for t, frame in self.frames if start <= t <= end]
+        if window:
+            poster_filename, sprite_filename = preview_filenames(self.video_filename, log)
+            # The poster shows the vehicle in the middle of the zone
+            middle = (log['start_time'] + log['end_time']) / 2
+            poster = min(window, key=lambda entry: abs(entry[0] - middle))[1]
+            # Sprite tiles are spread evenly over the padded crossing; short windows repeat
+            # frames, so every sprite has the same layout
+            tiles = [window[round(i * (len(window) - 1) / max(1, PREVIEW_SPRITE_FRAMES - 1))][1]
+                     for i in range(PREVIEW_SPRITE_FRAMES)]
+            params = [cv2.IMWRITE_JPEG_QUALITY, PREVIEW_JPEG_QUALITY]
+            if (cv2.imwrite(os.path.join(PREVIEWS_DIRECTORY, poster_filename), poster, params)
+                    and cv2.imwrite(os.path.join(PREVIEWS_DIRECTORY, sprite_filename), build_sprite(tiles), params)):
+                log['poster_path'] = f"/previews/{poster_filename}"
+                log['sprite_path'] = f"/previews/{sprite_filename}"
+                self.rendered += 1
+            else:
+                print(f"[WARN] Could not write the previews of track {log['track_id']}")
+                self.missed += 1
+        else:
+            self.missed += 1
+        if self.on_ready is not None:
+            self.on_ready(log)
+
+    def stats(self):
+        """
+        Get preview statistics.
+
+        Returns:
+            dict: Rendered and missed violations
+        """
+        return {"rendered": self.rendered, "missed": self.missed}
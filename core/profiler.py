@@ -0,0 +1,220 @@
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+from collections import Counter
+import numpy as np
+
+from config import PROFILE_DIRECTORY, PROFILE_SAMPLE_INTERVAL_S, PROFILE_MAX_SECONDS
+
+# Capture kinds and the extension of their result files
+CAPTURE_KINDS = {"sample": "folded", "cprofile": "txt", "stages": "json"}
+
+
+def frame_label(frame):
+    """Get the flamegraph label of a stack frame, e.g. 'vehicle_tracker.py:detect'."""
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL_S):
+        """
+        Sample the Python stack of one thread from a background thread.
+
+        The sampled thread runs unmodified: every interval the sampler reads its
+        current frame from sys._current_frames() and counts the stack, so the
+        overhead stays small and independent of how many calls the job makes.
+
+        Args:
+            thread_id (int): Ident of the thread to sample
+            interval (float): Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()  # Folded stack -> number of samples
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return  # The sampled thread has finished
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop sampling.
+
+        Returns:
+            str: Folded stacks ('frame;frame;frame count' per line), as read by
+                flamegraph.pl, speedscope and inferno
+        """
+        self.stopped.set()
+        self.thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def summarize_stages(frames):
+    """
+    Summarize per-frame stage timings.
+
+    Args:
+        frames (list): Dicts with 'frame', 'timestamp' and seconds per stage
+
+    Returns:
+        dict: Mean, p95 and max milliseconds and share of the frame time per stage
+    """
+    stages = [key for key in (frames[0] if frames else {}) if key not in ("frame", "timestamp")]
+    totals = np.array([sum(f[stage] for stage in stages) for f in frames]) if frames else np.zeros(0)
+    summary = {}
+    for stage in stages:
+        values = np.array([f[stage] for f in frames]) * 1000
+        summary[stage] = {
+            "mean_ms": round(float(values.mean()), 3),
+            "p95_ms": round(float(np.percentile(values, 95)), 3),
+            "max_ms": round(float(values.max()), 3),
+            "share": round(float(values.sum() / 1000 / totals.sum()), 4) if totals.sum() > 0 else 0.0,
+        }
+    return summary
+
+
+def request_paths(job):
+    """Get the request file of a job and the prefix of its result files."""
+    return os.path.join(PROFILE_DIRECTORY, f"{job}.request.json"), os.path.join(PROFILE_DIRECTORY, job)
+
+
+def request_capture(job, kind, seconds=None, frames=None):
+    """
+    Ask a running job to capture a profile.
+
+    Requests and results are files, so jobs running in the web app, in batch processes
+    or in queue workers on this machine are reached the same way.
+
+    Args:
+        job (str): Job name (the source video filename)
+        kind (str): 'sample' (sampling profiler), 'cprofile' (time-boxed cProfile of
+            the frame loop thread) or 'stages' (per-frame stage timings)
+        seconds (float, optional): Capture duration of 'sample' and 'cprofile'
+        frames (int, optional): Number of frames of 'stages'
+
+    Returns:
+        str: Path the result will be written to
+    """
+    if kind not in CAPTURE_KINDS:
+        raise ValueError(f"Unknown capture kind: {kind} (expected one of {', '.join(CAPTURE_KINDS)})")
+    os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+    request_path, prefix = request_paths(job)
+    capture_id = uuid.uuid4().hex
+    tmp_path = f"{request_path}.{capture_id}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"id": capture_id, "kind": kind, "seconds": seconds, "frames": frames}, f)
+    os.replace(tmp_path, request_path)
+    return f"{prefix}.{capture_id}.{CAPTURE_KINDS[kind]}"
+
+
+def _write_result(path, content):
+    """Publish a result atomically, so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class JobProbe:
+    def __init__(self, job):
+        """
+        Serve profiling requests from inside a job's frame loop.
+
+        Must be created and polled on the thread running the frame loop. poll() only
+        checks for a request file, so it is cheap enough to call every few frames.
+
+        Args:
+            job (str): Job name (the source video filename)
+        """
+        self.job = job
+        self.thread_id = threading.get_ident()
+        self.request_path, self.result_prefix = request_paths(job)
+        self.capture = None  # The running capture request
+        self.deadline = None  # End of a timed capture
+        self.profiler = None  # SamplingProfiler or cProfile.Profile
+        self.stage_frames = None  # Per-frame stage timings while a stage capture runs
+
+    def _result_path(self):
+        return f"{self.result_prefix}.{self.capture['id']}.{CAPTURE_KINDS[self.capture['kind']]}"
+
+    def poll(self):
+        """Start a requested capture, or finish the running one when its time is up."""
+        if self.capture is None:
+            if not os.path.exists(self.request_path):
+                return
+            try:
+                with open(self.request_path, 'r') as f:
+                    self.capture = json.load(f)
+                os.remove(self.request_path)
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Ignoring profiling request of {self.job}: {e}")
+                self.capture = None
+                return
+            kind = self.capture["kind"]
+            print(f"[INFO] Starting {kind} capture of {self.job}: {self.capture}")
+            if kind == "stages":
+                self.stage_frames = []
+                return
+            self.deadline = time.perf_counter() + min(self.capture.get("seconds") or 10, PROFILE_MAX_SECONDS)
+            if kind == "sample":
+                self.profiler = SamplingProfiler(self.thread_id).start()
+            else:
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.finish()
+
+    def record_frame(self, index, timestamp, stage_seconds):
+        """
+        Record the stage timings of a frame while a stage capture runs.
+
+        Args:
+            index (int): Source frame index
+            timestamp (float): Frame time in the video, None if derived from the FPS
+            stage_seconds (dict): Seconds per stage
+        """
+        self.stage_frames.append(dict(stage_seconds, frame=index, timestamp=timestamp))
+        if len(self.stage_frames) >= (self.capture.get("frames") or 100):
+            self.finish()
+
+    @property
+    def recording_stages(self):
+        return self.stage_frames is not None
+
+    def finish(self):
+        """Write the result of the running capture (also when the job ends early)."""
+        if self.capture is None:
+            return
+        kind = self.capture["kind"]
+        if kind == "sample":
+            content = self.profiler.stop()
+        elif kind == "cprofile":
+            self.profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(self.profiler, stream=output).sort_stats("cumulative").print_stats(60)
+            content = output.getvalue()
+        else:
+            content = json.dumps({"job": self.job, "summary": summarize_stages(self.stage_frames),
+                                  "frames": self.stage_frames}, indent=4)
+        _write_result(self._result_path(), content)
+        print(f"[INFO] Finished {kind} capture of {self.job}: {self._result_path()}")
+        self.capture = self.deadline = self.profiler = self.stage_frames = None
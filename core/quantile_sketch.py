@@ -0,0 +1,101 @@
+import math
+
+from config import SKETCH_RELATIVE_ACCURACY
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=SKETCH_RELATIVE_ACCURACY):
+        """
+        Mergeable streaming quantile sketch with relative error guarantees (DDSketch).
+
+        Positive values are counted in logarithmically sized bins, so every quantile
+        estimate is within relative_accuracy of the true value, and two sketches with
+        the same accuracy merge exactly by adding their bin counts. Speeds span a
+        bounded range (about 300 bins at 1% accuracy), so bins are never collapsed.
+
+        Args:
+            relative_accuracy (float): Maximum relative error of quantile estimates (0-1)
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}  # Bin key -> number of values
+        self.zero_count = 0  # Values <= 0, which have no logarithmic bin
+        self.count = 0
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _value(self, key):
+        """Get the estimate of a bin: the point with equal relative distance to both edges."""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        """Add a value to the sketch."""
+        if value > 0:
+            key = self._key(value)
+            self.bins[key] = self.bins.get(key, 0) + count
+        else:
+            self.zero_count += count
+        self.count += count
+
+    def merge(self, other):
+        """
+        Add the values of another sketch to this one.
+
+        Args:
+            other (QuantileSketch): Sketch with the same relative accuracy
+
+        Returns:
+            QuantileSketch: This sketch
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """
+        Estimate a quantile.
+
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            float: The estimate, None if the sketch is empty
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.bins))
+
+    def to_dict(self):
+        """Serialize the sketch to JSON-compatible data."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "bins": {str(key): count for key, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restore a sketch serialized by to_dict()."""
+        sketch = cls(data["relative_accuracy"])
+        sketch.bins = {int(key): count for key, count in data["bins"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
@@ -0,0 +1,170 @@
+import io
+import csv
+import json
+import uuid
+from datetime import datetime, date
+from decimal import Decimal
+
+from core.database import Database
+from config import DB_CONFIG, REPORT_EXPORT_CHUNK_ROWS
+
+# Export format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+EXPORT_COLUMNS = ("id", "track_id", "speed_kmh", "duration_s", "timestamp", "clip_path", "video_filename")
+
+
+def _plain_value(value):
+    """Convert database values to JSON/CSV friendly values."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _chunks(rows, chunk_rows):
+    """Group rows into lists of at most chunk_rows."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(rows, chunk_rows=REPORT_EXPORT_CHUNK_ROWS):
+    """Encode rows as CSV, yielding one bytes chunk per chunk_rows rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+    for chunk in _chunks(rows, chunk_rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_plain_value(row.get(column)) for column in EXPORT_COLUMNS] for row in chunk)
+        yield buffer.getvalue().encode()
+
+
+def iter_ndjson(rows, chunk_rows=REPORT_EXPORT_CHUNK_ROWS):
+    """Encode rows as newline-delimited JSON, yielding one bytes chunk per chunk_rows rows."""
+    for chunk in _chunks(rows, chunk_rows):
+        yield "".join(
+            json.dumps({column: _plain_value(row.get(column)) for column in EXPORT_COLUMNS}) + "\n"
+            for row in chunk
+        ).encode()
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes out in chunks instead of keeping them."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def iter_parquet(rows, chunk_rows=REPORT_EXPORT_CHUNK_ROWS):
+    """Encode rows as Parquet, one row group per chunk_rows rows (requires pyarrow)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("track_id", pa.int64()),
+        ("speed_kmh", pa.float64()),
+        ("duration_s", pa.float64()),
+        ("timestamp", pa.timestamp("us")),
+        ("clip_path", pa.string()),
+        ("video_filename", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    for chunk in _chunks(rows, chunk_rows):
+        columns = {column: [row.get(column) for row in chunk] for column in EXPORT_COLUMNS}
+        columns["id"] = [str(value) for value in columns["id"]]
+        columns["speed_kmh"] = [float(value) for value in columns["speed_kmh"]]
+        columns["duration_s"] = [float(value) for value in columns["duration_s"]]
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def check_export_format(export_format):
+    """
+    Validate an export format before streaming starts.
+
+    Args:
+        export_format (str): 'csv', 'ndjson' or 'parquet'
+
+    Returns:
+        tuple: (media type, file extension)
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format} (expected one of {', '.join(EXPORT_FORMATS)})")
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+    return EXPORT_FORMATS[export_format]
+
+
+def stream_export(export_format, start=None, end=None, min_speed=None, max_speed=None,
+                  chunk_rows=REPORT_EXPORT_CHUNK_ROWS):
+    """
+    Stream filtered reports from the database in an export format.
+
+    Rows are read through a server-side cursor and encoded chunk by chunk, so memory
+    use does not grow with the number of exported reports.
+
+    Args:
+        export_format (str): 'csv', 'ndjson' or 'parquet'
+        start (datetime, optional): Earliest report timestamp (inclusive)
+        end (datetime, optional): Latest report timestamp (exclusive)
+        min_speed (float, optional): Minimum speed in km/h
+        max_speed (float, optional): Maximum speed in km/h
+        chunk_rows (int): Rows per cursor fetch and per output chunk
+
+    Yields:
+        bytes: Encoded chunks of the export
+    """
+    check_export_format(export_format)
+    encoders = {"csv": iter_csv, "ndjson": iter_ndjson, "parquet": iter_parquet}
+    with Database(DB_CONFIG) as db:
+        rows = db.stream_reports(start=start, end=end, min_speed=min_speed, max_speed=max_speed,
+                                 itersize=chunk_rows)
+        yield from encoders[export_format](rows, chunk_rows)
@@ -0,0 +1,247 @@
+import os
+import re
+import time
+import queue
+import threading
+
+from core.database import Database
+from core.ffmpeg_executor import FFmpegError, get_executor, clip_command
+from core.hls import clip_playlist_url
+from config import SPEED_THRESHOLD_KMH, VIDEO_CLIPS_DIRECTORY, DB_CONFIG, FFMPEG_CLIP_TIMEOUT_SECONDS
+
+
+def slugify(name):
+    """Make a zone name safe for filenames and URLs."""
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', str(name)).strip('_') or "zone"
+
+
+def cut_clips(clips, clip_source_path):
+    """
+    Cut the clips of several speed logs concurrently through the ffmpeg executor.
+
+    Args:
+        clips (list): (log, clip_filename) tuples; logs need start_time and end_time
+        clip_source_path (str): Video the clips are cut from
+
+    Returns:
+        list: URL of each clip, or None where it could not be created
+    """
+    commands, clip_paths = [], []
+    for log, clip_filename in clips:
+        # Calculate clip time range with padding
+        start_time = log['start_time'] - 0.5
+        end_time = log['end_time'] + 0.5
+        duration = end_time - start_time
+        if start_time < 0:
+            start_time = 0
+            duration = end_time + 0.5
+
+        clip_path = os.path.join(VIDEO_CLIPS_DIRECTORY, clip_filename)
+        args, mode = clip_command(clip_source_path, start_time, duration, clip_path)
+        print(f"Creating clip for track_id {log['track_id']} ({mode}): start_time={start_time}, end_time={end_time}, duration={duration}")
+        commands.append((args, f"clip-{mode}"))
+        clip_paths.append(clip_path)
+
+    results = get_executor().map_sync(commands, timeout=FFMPEG_CLIP_TIMEOUT_SECONDS)
+    urls = []
+    for (_, clip_filename), clip_path, result in zip(clips, clip_paths, results):
+        if isinstance(result, FFmpegError):
+            print(f"FFmpeg clip error: {result} {result.stderr}")
+            urls.append(None)
+        # Verify clip was created successfully
+        elif not os.path.exists(clip_path) or os.path.getsize(clip_path) == 0:
+            print(f"Clip {clip_path} is empty or not created")
+            urls.append(None)
+        else:
+            print(f"Created video clip: {clip_path}, size={os.path.getsize(clip_path)} bytes")
+            urls.append(f"/video_clips/{clip_filename}")
+    return urls
+
+
+def hls_clip_url(video_filename, log):
+    """Get the clip playlist URL of a speed log: the HLS segments of its padded zone crossing."""
+    return clip_playlist_url(video_filename, max(0.0, log['start_time'] - 0.5), log['end_time'] + 0.5)
+
+
+class ReportSink:
+    def __init__(self, clip_source_path, video_filename, batch_size=10, flush_seconds=2.0, hls_clips=False):
+        """
+        Materialize speed violations as clip-plus-report records while a video is processed.
+
+        Speed logs are handed over from the frame loop without blocking it. A background
+        thread cuts the clips from the source video and inserts the reports in batches,
+        so violations appear on /reports while the job runs. Clip names are derived from
+        the video, track and zone entry time, so logs repeated after a checkpoint resume
+        are recognized and not reported twice.
+
+        With hls_clips, reports reference clip playlists of the job's HLS output
+        instead of cut clips. The playlists only exist once the output is packaged, so
+        these violations are held back until close() and reported in one pass.
+
+        Args:
+            clip_source_path (str): Video the clips are cut from
+            video_filename (str): Source video filename stored with the reports
+            batch_size (int): Reports per database transaction
+            flush_seconds (float): Maximum time a report waits for its batch to fill
+            hls_clips (bool): Reference HLS segment ranges instead of cutting clips
+        """
+        self.clip_source_path = clip_source_path
+        self.video_filename = video_filename
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.hls_clips = hls_clips
+        self.queue = queue.Queue()  # Speed logs waiting for their clip and report
+        self.thread = None
+        self.db = None  # Connection used to insert the reports
+        self.reported = set()  # Clip URLs already in the database for this video
+        self.inserted = 0  # Reports inserted by this sink
+        self.failed = 0  # Violations that could not be materialized
+        self.clip_seconds = 0.0  # Time spent cutting clips
+        self.db_seconds = 0.0  # Time spent inserting reports
+
+    def start(self):
+        """Connect to the database and start the background thread."""
+        self.db = Database(DB_CONFIG)
+        self.db.connect()
+        self.reported = set(self.db.fetch_clip_paths(self.video_filename))
+        # Violations with HLS clips wait in the queue until the output is packaged
+        if not self.hls_clips:
+            self.thread = threading.Thread(target=self._run, name="report-sink", daemon=True)
+            self.thread.start()
+        return self
+
+    def submit(self, log):
+        """
+        Hand over a speed log; called from VehicleTracker for every measurement.
+
+        Args:
+            log (dict): Speed log entry
+        """
+        if log['speed_kmh'] > SPEED_THRESHOLD_KMH:
+            self.queue.put(log)
+
+    def clip_filename(self, log):
+        """Get the deterministic clip filename of a speed log."""
+        stem = os.path.splitext(self.video_filename)[0]
+        return f"clip_{stem}_track_{log['track_id']}_{slugify(log['zone'])}_{int(log['start_time'] * 1000)}.mp4"
+
+    def _clip_url(self, log):
+        """Get the deterministic clip URL of a speed log."""
+        if self.hls_clips:
+            return hls_clip_url(self.video_filename, log)
+        return f"/video_clips/{self.clip_filename(log)}"
+
+    def _materialize(self, logs):
+        """Cut the clips of violations concurrently (or reference HLS ranges) and build their report rows."""
+        pending = []
+        for log in logs:
+            clip_url = self._clip_url(log)
+            if clip_url in self.reported:
+                continue
+            self.reported.add(clip_url)  # Also skips repeats within the batch
+            pending.append((log, clip_url))
+        if not pending:
+            return []
+        if self.hls_clips:
+            clip_urls = [clip_url for _, clip_url in pending]
+        else:
+            clip_start = time.perf_counter()
+            clip_urls = cut_clips([(log, self.clip_filename(log)) for log, _ in pending], self.clip_source_path)
+            self.clip_seconds += time.perf_counter() - clip_start
+        reports = []
+        for (log, expected_url), clip_url in zip(pending, clip_urls):
+            if clip_url is None:
+                self.failed += 1
+                self.reported.discard(expected_url)
+                continue
+            reports.append({
+                "track_id": log['track_id'],
+                "speed_kmh": log['speed_kmh'],
+                "duration_s": log['duration_s'],
+                "timestamp": log['timestamp'],
+                "clip_path": clip_url,
+                "video_filename": self.video_filename,
+                "poster_path": log.get('poster_path'),
+                "sprite_path": log.get('sprite_path')
+            })
+        return reports
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        db_start = time.perf_counter()
+        try:
+            self.db.insert_reports(batch)
+            self.inserted += len(batch)
+            print(f"[INFO] Inserted {len(batch)} reports for {self.video_filename}")
+        except Exception as e:
+            self.failed += len(batch)
+            for report in batch:
+                self.reported.discard(report["clip_path"])
+            print(f"[ERROR] Failed to insert {len(batch)} reports: {e}")
+        self.db_seconds += time.perf_counter() - db_start
+        batch.clear()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                logs = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                self._flush(batch)
+                deadline = None
+                continue
+            # Take whatever else is waiting, so its clips are cut in parallel
+            while len(logs) < self.batch_size:
+                try:
+                    logs.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in logs:
+                stopping = True
+                logs = [log for log in logs if log is not None]
+            batch.extend(self._materialize(logs))
+            if batch and deadline is None:
+                deadline = time.perf_counter() + self.flush_seconds
+            if stopping or len(batch) >= self.batch_size or (deadline is not None and time.perf_counter() >= deadline):
+                self._flush(batch)
+                deadline = None
+
+    def close(self, packaged=True):
+        """
+        Materialize the remaining violations, flush and disconnect.
+
+        Args:
+            packaged (bool): The HLS output of the job exists; held-back violations
+                with HLS clips are dropped otherwise (a resumed run reports them)
+        """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+            self.db.close()
+        elif self.hls_clips and self.db is not None:
+            if packaged:
+                self.queue.put(None)
+                self._run()
+            else:
+                self.queue = queue.Queue()
+            self.db.close()
+            self.db = None
+
+    def stats(self):
+        """
+        Get sink statistics.
+
+        Returns:
+            dict: Inserted and failed reports, clip and database seconds
+        """
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "clip_seconds": round(self.clip_seconds, 3),
+            "db_seconds": round(self.db_seconds, 3),
+        }
@@ -0,0 +1,108 @@
+import time
+import numpy as np
+
+from core.camera_calibration import CameraCalibrator
+from core.detector import Detector, sample_frames, match_detections
+from core.zones import ZoneMap
+from core.pipeline import load_camera
+from config import INFERENCE_SIZE_CANDIDATES, RESOLUTION_RECALL_TOLERANCE, RESOLUTION_MIN_OBJECT_PX
+
+
+def zone_detections(detections, zone_map, frame_shape):
+    """Keep the detections whose box center lies in a measurement zone."""
+    if len(detections) == 0:
+        return detections
+    centers = np.stack([(detections[:, 0] + detections[:, 2]) / 2, (detections[:, 1] + detections[:, 3]) / 2], axis=1)
+    return detections[zone_map.lookup(centers, frame_shape).any(axis=1)]
+
+
+def tune_inference_size(model_path, video_path, calibration_path, backend="pytorch",
+                        sizes=INFERENCE_SIZE_CANDIDATES, num_frames=60,
+                        recall_tolerance=RESOLUTION_RECALL_TOLERANCE, iou_threshold=0.5,
+                        min_object_px=RESOLUTION_MIN_OBJECT_PX, save=True):
+    """
+    Find the smallest detector input size that keeps recall inside the measurement zones.
+
+    Vehicles are detected on sampled frames at the largest size as the reference, and
+    their sizes inside the zones are measured. Sizes at which the smallest vehicles
+    (5th percentile of the shorter box side) would shrink below min_object_px model
+    pixels are skipped; the others are run from small to large, and the first whose
+    recall of the in-zone reference detections is within the tolerance is chosen.
+
+    Args:
+        model_path (str): Path to the PyTorch weights
+        video_path (str): Video of the camera to sample frames from
+        calibration_path (str): Calibration JSON of the camera, receives the result
+        backend (str): Detector backend the size is tuned for
+        sizes (tuple): Candidate input sizes (multiples of 32)
+        num_frames (int): Number of frames to sample
+        recall_tolerance (float): Maximum recall loss against the reference size
+        iou_threshold (float): Minimum IoU for a detection to count as found
+        min_object_px (float): Smallest vehicle size in model pixels worth trying
+        save (bool): Store the chosen size as 'inference' in the calibration file
+
+    Returns:
+        dict: Chosen imgsz, vehicle size statistics and per-size recall and latency
+    """
+    zones, _, _ = load_camera(video_path, calibration_path)
+    zone_map = ZoneMap(zones)
+    frames = sample_frames(video_path, num_frames)
+    if not frames:
+        raise ValueError(f"No frames could be read from {video_path}")
+    print(f"[INFO] Sampled {len(frames)} frames from {video_path}")
+    sizes = sorted(sizes)
+    long_side = max(frames[0].shape[:2])
+
+    def run(imgsz):
+        detector = Detector(model_path, backend=backend, imgsz=imgsz)
+        detector.detect(frames[0])  # Warm up once so that lazy initialization is not counted
+        start = time.perf_counter()
+        detections = [detector.detect(frame) for frame in frames]
+        return detections, 1000 * (time.perf_counter() - start) / len(frames)
+
+    reference_detections, reference_ms = run(sizes[-1])
+    reference = [zone_detections(d, zone_map, frame.shape) for d, frame in zip(reference_detections, frames)]
+    boxes = np.concatenate([d for d in reference if len(d)] or [np.empty((0, 5))])
+    if len(boxes) == 0:
+        raise ValueError("No vehicles detected in the measurement zones of the sampled frames")
+    sides = np.minimum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    smallest = float(np.percentile(sides, 5))
+
+    report = {
+        "video_path": video_path,
+        "backend": backend,
+        "frames": len(frames),
+        "zone_detections": len(boxes),
+        "vehicle_px": {"p5": round(smallest, 1), "median": round(float(np.median(sides)), 1)},
+        "sizes": {sizes[-1]: {"recall": 1.0, "ms_per_frame": round(reference_ms, 2)}},
+        "imgsz": sizes[-1],
+    }
+    for imgsz in sizes[:-1]:
+        # Letterboxing scales the long side of the frame to imgsz
+        object_px = smallest * imgsz / long_side
+        if object_px < min_object_px:
+            report["sizes"][imgsz] = {"skipped": f"smallest vehicles would be {object_px:.1f} px"}
+            continue
+        candidate_detections, ms = run(imgsz)
+        matched = 0
+        for ref, cand in zip(reference, candidate_detections):
+            matched += match_detections(ref, cand, iou_threshold)[0]
+        recall = matched / len(boxes)
+        report["sizes"][imgsz] = {"recall": round(recall, 4), "ms_per_frame": round(ms, 2)}
+        print(f"[INFO] imgsz {imgsz}: {report['sizes'][imgsz]}")
+        if recall >= 1.0 - recall_tolerance:
+            report["imgsz"] = imgsz
+            break
+
+    if save:
+        calibrator = CameraCalibrator(video_path)
+        calibrator.load_calibration(calibration_path)
+        calibrator.inference = {
+            "imgsz": report["imgsz"],
+            "backend": backend,
+            "recall": report["sizes"][report["imgsz"]]["recall"],
+            "reference_imgsz": sizes[-1],
+        }
+        calibrator.save_calibration(calibration_path)
+        print(f"[INFO] Inference size {report['imgsz']} saved to {calibration_path}")
+    return report
@@ -0,0 +1,206 @@
+import os
+from datetime import datetime, timedelta
+
+from core.database import Database
+from core.quantile_sketch import QuantileSketch
+from config import DB_CONFIG, SPEED_THRESHOLD_KMH, STATISTICS_QUANTILES, STATISTICS_MAX_BUCKETS
+
+# Bucket sizes of the rollup tables
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def camera_id(calibration_path):
+    """Get the camera name of a job: the name of its calibration file without extension."""
+    return os.path.splitext(os.path.basename(calibration_path))[0]
+
+
+def job_key(path):
+    """
+    Identify the version of a job's video: filename, size and modification time.
+
+    Reprocessing the same file keeps the key, so it is not counted twice; a new
+    upload under the same filename gets a new key and is counted.
+    """
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def bucket_start(timestamp, granularity):
+    """
+    Get the start of the bucket a measurement falls into.
+
+    Buckets use local time, like the report timestamps.
+
+    Args:
+        timestamp (float): Unix timestamp of the measurement
+        granularity (str): 'hour' or 'day'
+
+    Returns:
+        datetime: Start of the hour or day
+    """
+    moment = datetime.fromtimestamp(timestamp)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def local_time(moment):
+    """Convert an aware datetime to naive local time, the time of the buckets; naive ones are kept."""
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone().replace(tzinfo=None)
+
+
+def empty_bucket():
+    return {"vehicles": 0, "violations": 0, "speed_sum": 0.0, "speed_min": None, "speed_max": None,
+            "sketch": QuantileSketch()}
+
+
+def merge_buckets(stored, row):
+    """
+    Combine two bucket rows. Sketches may be serialized (as stored) or QuantileSketch objects.
+
+    Returns:
+        dict: The combined row with a QuantileSketch
+    """
+    merged = empty_bucket()
+    for bucket in (stored, row):
+        sketch = bucket["sketch"]
+        if sketch is None:  # Bucket created empty by the merge transaction
+            continue
+        merged["sketch"].merge(sketch if isinstance(sketch, QuantileSketch) else QuantileSketch.from_dict(sketch))
+        merged["vehicles"] += bucket["vehicles"]
+        merged["violations"] += bucket["violations"]
+        merged["speed_sum"] += bucket["speed_sum"]
+        for key, pick in (("speed_min", min), ("speed_max", max)):
+            if bucket[key] is not None:
+                merged[key] = bucket[key] if merged[key] is None else pick(merged[key], bucket[key])
+    return merged
+
+
+def merge_stored_bucket(stored, row):
+    """Combine a stored bucket row with a row of a job, serialized for storage."""
+    merged = merge_buckets(stored, row)
+    merged["sketch"] = merged["sketch"].to_dict()
+    return merged
+
+
+def aggregate_logs(logs, threshold=SPEED_THRESHOLD_KMH):
+    """
+    Fold speed logs into hourly and daily buckets.
+
+    Measurements are bucketed by their log timestamp, the wall-clock time at which
+    they were processed, not the time they were recorded: a recording processed (or
+    backfilled) later lands in the buckets of its processing time.
+
+    Args:
+        logs (list): Speed logs with speed_kmh and timestamp
+        threshold (float): Speed above which a measurement counts as a violation
+
+    Returns:
+        dict: (granularity, bucket_start) -> bucket row
+    """
+    rollups = {}
+    for log in logs:
+        speed = log["speed_kmh"]
+        for granularity in GRANULARITIES:
+            bucket = rollups.setdefault((granularity, bucket_start(log["timestamp"], granularity)), empty_bucket())
+            bucket["vehicles"] += 1
+            bucket["violations"] += int(speed > threshold)
+            bucket["speed_sum"] += speed
+            bucket["speed_min"] = speed if bucket["speed_min"] is None else min(bucket["speed_min"], speed)
+            bucket["speed_max"] = speed if bucket["speed_max"] is None else max(bucket["speed_max"], speed)
+            bucket["sketch"].add(speed)
+    return rollups
+
+
+def record_job_statistics(video_filename, camera, logs, key):
+    """
+    Fold every speed measurement of a completed job into the rollup tables.
+
+    Violations are counted against the threshold configured when the job completes.
+
+    Args:
+        video_filename (str): Source video filename of the job
+        key (str): Identity of the video version, see job_key()
+        camera (str): Camera the video was recorded by
+        logs (list): All speed logs of the job, not only violations
+
+    Returns:
+        bool: True if the job was folded, False if it had been folded before
+    """
+    rollups = aggregate_logs(logs)
+    with Database(DB_CONFIG) as db:
+        db.create_rollup_tables()
+        folded = db.merge_rollups(key, video_filename, camera, len(logs), rollups, merge_stored_bucket)
+    if folded:
+        print(f"[INFO] Folded {len(logs)} measurements of {video_filename} into the statistics of {camera}")
+    else:
+        print(f"[INFO] Statistics of {video_filename} were already recorded")
+    return folded
+
+
+def summarize_bucket(bucket, quantiles=STATISTICS_QUANTILES):
+    """Get the statistics of a bucket row with a QuantileSketch."""
+    vehicles = bucket["vehicles"]
+    summary = {
+        "vehicles": vehicles,
+        "violations": bucket["violations"],
+        "violation_rate": round(bucket["violations"] / vehicles, 4) if vehicles else None,
+        "mean_kmh": round(bucket["speed_sum"] / vehicles, 2) if vehicles else None,
+        "min_kmh": bucket["speed_min"],
+        "max_kmh": bucket["speed_max"],
+    }
+    for q in quantiles:
+        value = bucket["sketch"].quantile(q)
+        summary[f"p{round(q * 100):g}_kmh"] = round(value, 2) if value is not None else None
+    return summary
+
+
+def query_statistics(granularity, start, end, camera=None, quantiles=STATISTICS_QUANTILES):
+    """
+    Answer traffic statistics from the rollup tables.
+
+    Only the buckets of the range are read, so the cost depends on the number of
+    buckets and not on the number of measurements. Without a camera, the buckets of
+    all cameras are merged. Buckets hold measurements by processing time (see
+    aggregate_logs).
+
+    Args:
+        granularity (str): 'hour' or 'day'
+        start (datetime): Start of the range, rounded down to a bucket; naive values are
+            local time, aware ones are converted to it
+        end (datetime): End of the range (exclusive)
+        camera (str, optional): Camera name, all cameras if None
+        quantiles (tuple): Speed quantiles to report
+
+    Returns:
+        dict: Statistics per bucket and for the whole range
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity} (expected one of {', '.join(GRANULARITIES)})")
+    start = bucket_start(start.timestamp(), granularity)
+    end = local_time(end)
+    if end <= start:
+        raise ValueError("end must be after start")
+    if (end - start) / GRANULARITIES[granularity] > STATISTICS_MAX_BUCKETS:
+        raise ValueError(f"The range spans more than {STATISTICS_MAX_BUCKETS} {granularity} buckets; "
+                         f"use a shorter range or a coarser granularity")
+    with Database(DB_CONFIG) as db:
+        db.create_rollup_tables()
+        rows = db.fetch_rollups(granularity, start, end, camera=camera)
+    buckets = {}
+    total = empty_bucket()
+    for row in rows:
+        buckets[row["bucket_start"]] = merge_buckets(buckets.get(row["bucket_start"], empty_bucket()), row)
+    for bucket in buckets.values():
+        total = merge_buckets(total, bucket)
+    return {
+        "granularity": granularity,
+        "camera": camera,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "total": summarize_bucket(total, quantiles),
+        "buckets": [dict(summarize_bucket(bucket, quantiles), bucket_start=moment.isoformat())
+                    for moment, bucket in sorted(buckets.items())],
+    }
@@ -0,0 +1,162 @@
+import time
+import asyncio
+from collections import OrderedDict, deque
+
+# Priority classes, most urgent first
+PRIORITY_CLASSES = ("live", "interactive", "backlog")
+
+
+class SchedulerFull(Exception):
+    def __init__(self, priority, retry_after):
+        """
+        Raised when the wait queue of a priority class is full.
+
+        Args:
+            priority (str): Priority class of the rejected job
+            retry_after (int): Suggested seconds before retrying
+        """
+        super().__init__(f"Too many queued {priority} jobs, retry in {retry_after}s")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    def __init__(self, max_concurrent=3, max_queued=None, reserved_slots=1):
+        """
+        Initialize the admission controller in front of the processing pipeline.
+
+        At most max_concurrent jobs run on this node. Waiting jobs are started by priority
+        class; within a class, tenants take turns so one tenant's burst cannot starve the
+        others. reserved_slots are only ever used by the most urgent class, so live jobs
+        start without waiting for backlog work to finish. Jobs beyond a class's queue
+        limit are rejected immediately instead of piling up.
+
+        All methods must be called from the event loop thread.
+
+        Args:
+            max_concurrent (int): Jobs running at the same time
+            max_queued (dict, optional): Maximum waiting jobs per priority class
+            reserved_slots (int): Slots held back for the most urgent class
+        """
+        if not 0 <= reserved_slots < max_concurrent:
+            raise ValueError("reserved_slots must be smaller than max_concurrent")
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued or {priority: 10 for priority in PRIORITY_CLASSES}
+        self.reserved_slots = reserved_slots
+        self.running = 0
+        # Per priority class: tenant -> deque of waiting futures, in round-robin order
+        self.waiting = {priority: OrderedDict() for priority in PRIORITY_CLASSES}
+        self.mean_job_seconds = 60.0  # Moving average used for Retry-After estimates
+        self.admitted = {priority: 0 for priority in PRIORITY_CLASSES}
+        self.rejected = {priority: 0 for priority in PRIORITY_CLASSES}
+        self.wait_seconds = {priority: 0.0 for priority in PRIORITY_CLASSES}
+
+    def _queued(self, priority):
+        return sum(len(waiters) for waiters in self.waiting[priority].values())
+
+    def _limit(self, priority):
+        """Slots a class may occupy; only the most urgent class uses the reserved ones."""
+        if priority == PRIORITY_CLASSES[0]:
+            return self.max_concurrent
+        return self.max_concurrent - self.reserved_slots
+
+    def retry_after(self, priority):
+        """Estimate the seconds until a job of the class could be admitted."""
+        ahead = sum(self._queued(p) for p in PRIORITY_CLASSES[:PRIORITY_CLASSES.index(priority) + 1])
+        slots = max(1, self._limit(priority))
+        return max(1, int(round((ahead // slots + 1) * self.mean_job_seconds)))
+
+    def _dispatch(self):
+        """Start waiting jobs while slots are free, most urgent class first."""
+        for priority in PRIORITY_CLASSES:
+            tenants = self.waiting[priority]
+            while tenants and self.running < self._limit(priority):
+                tenant, waiters = next(iter(tenants.items()))
+                future = waiters.popleft()
+                # The tenant moves to the back of the round-robin, or leaves it when idle
+                del tenants[tenant]
+                if waiters:
+                    tenants[tenant] = waiters
+                if not future.done():
+                    self.running += 1
+                    future.set_result(None)
+
+    def _remove_waiter(self, priority, tenant, future):
+        waiters = self.waiting[priority].get(tenant)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self.waiting[priority][tenant]
+
+    async def acquire(self, priority="interactive", tenant="default"):
+        """
+        Wait for a slot.
+
+        Args:
+            priority (str): Priority class of the job
+            tenant (str): Tenant the job belongs to
+
+        Raises:
+            ValueError: Unknown priority class
+            SchedulerFull: The class's wait queue is full
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority} (expected one of {', '.join(PRIORITY_CLASSES)})")
+        queued_at = time.perf_counter()
+        if self.running < self._limit(priority) and self._queued(priority) == 0 and \
+                not any(self._queued(p) for p in PRIORITY_CLASSES[:PRIORITY_CLASSES.index(priority)]):
+            self.running += 1
+        else:
+            if self._queued(priority) >= self.max_queued[priority]:
+                self.rejected[priority] += 1
+                raise SchedulerFull(priority, self.retry_after(priority))
+            future = asyncio.get_running_loop().create_future()
+            self.waiting[priority].setdefault(tenant, deque()).append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                # The client went away: give up the place, or the slot if it was just granted
+                if future.done() and not future.cancelled():
+                    self.release()
+                else:
+                    self._remove_waiter(priority, tenant, future)
+                raise
+        self.admitted[priority] += 1
+        self.wait_seconds[priority] += time.perf_counter() - queued_at
+
+    def release(self, job_seconds=None):
+        """
+        Free a slot and start the next waiting job.
+
+        Args:
+            job_seconds (float, optional): Duration of the finished job, for Retry-After estimates
+        """
+        self.running -= 1
+        if job_seconds is not None:
+            self.mean_job_seconds = 0.8 * self.mean_job_seconds + 0.2 * job_seconds
+        self._dispatch()
+
+    def stats(self):
+        """
+        Get scheduler statistics.
+
+        Returns:
+            dict: Running jobs, and queued, admitted, rejected jobs and mean wait per class
+        """
+        return {
+            "max_concurrent": self.max_concurrent,
+            "reserved_slots": self.reserved_slots,
+            "running": self.running,
+            "mean_job_seconds": round(self.mean_job_seconds, 1),
+            "classes": {
+                priority: {
+                    "queued": self._queued(priority),
+                    "queued_tenants": len(self.waiting[priority]),
+                    "max_queued": self.max_queued[priority],
+                    "admitted": self.admitted[priority],
+                    "rejected": self.rejected[priority],
+                    "mean_wait_seconds": round(self.wait_seconds[priority] / self.admitted[priority], 3)
+                    if self.admitted[priority] else 0.0,
+                } for priority in PRIORITY_CLASSES
+            },
+        }
@@ -96,9 +96,11 @@ class KalmanBoxTracker(object):
   This class represents the internal state of individual tracked objects observed as bbox.
   """
   count = 0
-  def __init__(self,bbox):
+  def __init__(self,bbox,track_id=None):
     """
     Initialises a tracker using initial bounding box.
+    track_id comes from the owning Sort instance; the class-level counter is only
+    used for standalone trackers.
     """
     #define constant velocity model
     self.kf = KalmanFilter(dim_x=7, dim_z=4) 
@@ -113,8 +115,10 @@ class KalmanBoxTracker(object):
 
     self.kf.x[:4] = convert_bbox_to_z(bbox)
     self.time_since_update = 0
-    self.id = KalmanBoxTracker.count
-    KalmanBoxTracker.count += 1
+    if track_id is None:
+      track_id = KalmanBoxTracker.count
+      KalmanBoxTracker.count += 1
+    self.id = track_id
     self.history = []
     self.hits = 0
     self.hit_streak = 0
@@ -124,19 +128,28 @@ class KalmanBoxTracker(object):
     """
     Updates the state vector with observed bbox.
     """
+    self._before_update()
+    self.kf.update(convert_bbox_to_z(bbox))
+
+  def _before_update(self):
     self.time_since_update = 0
     self.history = []
     self.hits += 1
     self.hit_streak += 1
-    self.kf.update(convert_bbox_to_z(bbox))
 
   def predict(self):
     """
     Advances the state vector and returns the predicted bounding box estimate.
     """
+    self._before_predict()
+    self.kf.predict()
+    return self._after_predict()
+
+  def _before_predict(self):
     if((self.kf.x[6]+self.kf.x[2])<=0):
       self.kf.x[6] *= 0.0
-    self.kf.predict()
+
+  def _after_predict(self):
     self.age += 1
     if(self.time_since_update>0):
       self.hit_streak = 0
@@ -150,6 +163,85 @@ class KalmanBoxTracker(object):
     """
     return convert_x_to_bbox(self.kf.x)
 
+  def to_checkpoint(self):
+    """
+    Returns the mutable filter and bookkeeping state for checkpointing.
+    """
+    return {'x': self.kf.x.copy(), 'P': self.kf.P.copy(), 'id': self.id,
+            'time_since_update': self.time_since_update, 'history': list(self.history),
+            'hits': self.hits, 'hit_streak': self.hit_streak, 'age': self.age}
+
+  @classmethod
+  def from_checkpoint(cls, state):
+    """
+    Recreates a tracker from to_checkpoint() output without consuming a new id.
+    """
+    trk = cls(convert_x_to_bbox(state['x'])[0], track_id=state['id'])
+    trk.kf.x = state['x'].copy()
+    trk.kf.P = state['P'].copy()
+    trk.id = state['id']
+    trk.time_since_update = state['time_since_update']
+    trk.history = list(state['history'])
+    trk.hits = state['hits']
+    trk.hit_streak = state['hit_streak']
+    trk.age = state['age']
+    return trk
+
+
+def batch_predict(trackers):
+  """
+  Advances the Kalman filters of many trackers in one vectorized step.
+  Equivalent to calling predict() on each tracker.
+
+  Returns the predicted bounding boxes as an array of shape (len(trackers), 4)
+  """
+  if(len(trackers)==0):
+    return np.empty((0,4))
+  for trk in trackers:
+    trk._before_predict()
+  F = trackers[0].kf.F
+  x = np.stack([trk.kf.x for trk in trackers])
+  P = np.stack([trk.kf.P for trk in trackers])
+  Q = np.stack([trk.kf.Q for trk in trackers])
+  x = np.matmul(F, x)
+  P = np.matmul(np.matmul(F, P), F.T) + Q
+  boxes = np.zeros((len(trackers), 4))
+  for t, trk in enumerate(trackers):
+    trk.kf.x = x[t].copy()
+    trk.kf.P = P[t].copy()
+    trk.kf.x_prior = trk.kf.x.copy()
+    trk.kf.P_prior = trk.kf.P.copy()
+    boxes[t] = trk._after_predict()[0]
+  return boxes
+
+
+def batch_update(trackers, bboxes):
+  """
+  Updates the Kalman filters of many trackers with their observed bboxes in one
+  vectorized step. Equivalent to calling update() on each tracker.
+  """
+  if(len(trackers)==0):
+    return
+  for trk in trackers:
+    trk._before_update()
+  H = trackers[0].kf.H
+  z = np.stack([convert_bbox_to_z(bbox) for bbox in bboxes])
+  x = np.stack([trk.kf.x for trk in trackers])
+  P = np.stack([trk.kf.P for trk in trackers])
+  R = np.stack([trk.kf.R for trk in trackers])
+  y = z - np.matmul(H, x)
+  PHT = np.matmul(P, H.T)
+  S = np.matmul(H, PHT) + R
+  K = np.matmul(PHT, np.linalg.inv(S))
+  x = x + np.matmul(K, y)
+  I_KH = np.eye(x.shape[1]) - np.matmul(K, H)
+  P = np.matmul(np.matmul(I_KH, P), np.swapaxes(I_KH, 1, 2)) + np.matmul(np.matmul(K, R), np.swapaxes(K, 1, 2))
+  for t, trk in enumerate(trackers):
+    trk.kf.x = x[t].copy()
+    trk.kf.P = P[t].copy()
+    trk.kf.x_post = trk.kf.x.copy()
+    trk.kf.P_post = trk.kf.P.copy()
+
 
 def associate_detections_to_trackers(detections,trackers,iou_threshold = 0.3):
   """
@@ -206,6 +298,7 @@ class Sort(object):
     self.iou_threshold = iou_threshold
     self.trackers = []
     self.frame_count = 0
+    self.next_id = 0 # ids are allocated per instance so that several trackers can share a process
 
   def update(self, dets=np.empty((0, 5))):
     """
@@ -218,26 +311,35 @@ class Sort(object):
     """
     self.frame_count += 1
     # get predicted locations from existing trackers.
+    trks = self._collect_predictions(batch_predict(self.trackers))
+    matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets,trks, self.iou_threshold)
+
+    # update matched trackers with assigned detections
+    batch_update([self.trackers[m[1]] for m in matched], [dets[m[0], :] for m in matched])
+    return self._finish_update(dets, unmatched_dets)
+
+  def _collect_predictions(self, boxes):
+    """
+    Drops trackers whose prediction became invalid and returns the predictions
+    of the remaining ones in the format [[x1,y1,x2,y2,0],...]
+    """
     trks = np.zeros((len(self.trackers), 5))
-    to_del = []
-    ret = []
-    for t, trk in enumerate(trks):
-      pos = self.trackers[t].predict()[0]
-      trk[:] = [pos[0], pos[1], pos[2], pos[3], 0]
-      if np.any(np.isnan(pos)):
-        to_del.append(t)
+    trks[:, :4] = boxes
+    to_del = [t for t in range(len(trks)) if np.any(np.isnan(trks[t, :4]))]
     trks = np.ma.compress_rows(np.ma.masked_invalid(trks))
     for t in reversed(to_del):
       self.trackers.pop(t)
-    matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets,trks, self.iou_threshold)
-
-    # update matched trackers with assigned detections
-    for m in matched:
-      self.trackers[m[1]].update(dets[m[0], :])
+    return trks
 
+  def _finish_update(self, dets, unmatched_dets):
+    """
+    Creates trackers for unmatched detections, removes dead ones and returns the tracks.
+    """
+    ret = []
     # create and initialise new trackers for unmatched detections
     for i in unmatched_dets:
-        trk = KalmanBoxTracker(dets[i,:])
+        trk = KalmanBoxTracker(dets[i,:], track_id=self.next_id)
+        self.next_id += 1
         self.trackers.append(trk)
     i = len(self.trackers)
     for trk in reversed(self.trackers):
@@ -252,6 +354,21 @@ class Sort(object):
       return np.concatenate(ret)
     return np.empty((0,5))
 
+  def to_checkpoint(self):
+    """
+    Returns the tracker state (all Kalman filters, frame and id counters) for checkpointing.
+    """
+    return {'frame_count': self.frame_count, 'id_count': self.next_id,
+            'trackers': [trk.to_checkpoint() for trk in self.trackers]}
+
+  def restore_checkpoint(self, state):
+    """
+    Restores the tracker state saved by to_checkpoint().
+    """
+    self.frame_count = state['frame_count']
+    self.trackers = [KalmanBoxTracker.from_checkpoint(trk) for trk in state['trackers']]
+    self.next_id = state['id_count']
+
 def parse_args():
     """Parse input arguments."""
     parser = argparse.ArgumentParser(description='SORT demo')
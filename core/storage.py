@@ -0,0 +1,363 @@
+import os
+import time
+import shutil
+import sqlite3
+import threading
+from contextlib import closing
+
+from core.database import Database
+from core.hls import HLS_DIRECTORY, hls_directory, hls_url_prefix
+from config import (UPLOAD_DIRECTORY, PROCESSED_VIDEOS_DIRECTORY, VIDEO_CLIPS_DIRECTORY, SNAPSHOTS_DIRECTORY,
+                    PREVIEWS_DIRECTORY, CHECKPOINT_DIRECTORY, DB_CONFIG, STORAGE_INDEX_PATH, STORAGE_QUOTAS_BYTES,
+                    STORAGE_RETENTION_DAYS, STORAGE_ACTIVE_JOB_SECONDS)
+
+# Directories under lifecycle management
+MANAGED_DIRECTORIES = (UPLOAD_DIRECTORY, PROCESSED_VIDEOS_DIRECTORY, VIDEO_CLIPS_DIRECTORY, SNAPSHOTS_DIRECTORY,
+                       PREVIEWS_DIRECTORY)
+# Directories whose files may be referenced by reports
+REFERENCED_DIRECTORIES = (PROCESSED_VIDEOS_DIRECTORY, VIDEO_CLIPS_DIRECTORY, PREVIEWS_DIRECTORY)
+
+
+def path_size(path):
+    """Get the size in bytes of a file, or of all files below a directory."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # Removed while walking
+    return total
+
+
+def remove_path(path):
+    """Delete a file or directory tree; missing paths are ignored."""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class StorageManager:
+    def __init__(self, index_path=STORAGE_INDEX_PATH, quotas=None, retention_days=None,
+                 active_job_seconds=STORAGE_ACTIVE_JOB_SECONDS):
+        """
+        Initialize the lifecycle manager of the media directories.
+
+        An SQLite index records which files each job owns and which jobs are running,
+        so web app and worker processes on one machine share it. Intermediates are
+        deleted when their job completes; sweeps apply age-based retention and then
+        per-directory quotas, deleting the least recently modified units first. A unit
+        is a file, or all outputs of one job in processed_videos (deleted together so
+        a job is never half gone). Running jobs, and clips and previews referenced by
+        reports (including the HLS segments of clip playlists), are never deleted.
+
+        Args:
+            index_path (str): Path of the SQLite index
+            quotas (dict, optional): Maximum bytes per managed directory, None for no limit
+            retention_days (dict, optional): Maximum age in days per managed directory
+            active_job_seconds (float): A running job older than this is treated as abandoned
+        """
+        self.index_path = index_path
+        self.quotas = STORAGE_QUOTAS_BYTES if quotas is None else quotas
+        self.retention_days = STORAGE_RETENTION_DAYS if retention_days is None else retention_days
+        self.active_job_seconds = active_job_seconds
+        self.sweep_lock = threading.Lock()  # One sweep at a time in this process
+        self.deleted_files = {directory: 0 for directory in MANAGED_DIRECTORIES}
+        self.deleted_bytes = {directory: 0 for directory in MANAGED_DIRECTORIES}
+        self.intermediate_bytes = 0  # Freed by deleting intermediates of completed jobs
+        self.last_sweep = None  # Time, duration and outcome of the last sweep
+        self.create_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, query, params=()):
+        """Execute a statement in its own transaction and return the rows."""
+        with closing(self._connect()) as conn:
+            with conn:
+                return conn.execute(query, params).fetchall()
+
+    def create_schema(self):
+        """Create the index tables if they don't exist."""
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS files (
+                        path TEXT PRIMARY KEY,
+                        job TEXT NOT NULL,
+                        kind TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS files_job_idx ON files (job)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        job TEXT PRIMARY KEY,
+                        status TEXT NOT NULL,
+                        started_at REAL NOT NULL,
+                        finished_at REAL
+                    )
+                """)
+
+    def begin_job(self, job):
+        """
+        Mark a job as running, protecting its upload and outputs from sweeps.
+
+        Args:
+            job (str): Job name (the source video filename)
+        """
+        self._execute("INSERT OR REPLACE INTO jobs (job, status, started_at, finished_at) VALUES (?, 'running', ?, NULL)",
+                      (job, time.time()))
+
+    def refresh_job(self, job):
+        """
+        Keep a long-running job protected; called periodically by its frame loop.
+
+        Args:
+            job (str): Job name
+        """
+        self._execute("UPDATE jobs SET started_at = ? WHERE job = ? AND status = 'running'", (time.time(), job))
+
+    def fail_job(self, job):
+        """
+        Mark a running job as failed, so its files are no longer protected as in use.
+
+        Args:
+            job (str): Job name
+        """
+        self._execute("UPDATE jobs SET status = 'failed', finished_at = ? WHERE job = ? AND status = 'running'",
+                      (time.time(), job))
+
+    def register(self, job, paths, kind):
+        """
+        Record files or directories as owned by a job.
+
+        Args:
+            job (str): Job name
+            paths (list): Paths of the files or directories
+            kind (str): 'output' or 'intermediate'
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO files (path, job, kind, created_at) VALUES (?, ?, ?, ?)",
+                                 [(os.path.abspath(path), job, kind, now) for path in paths])
+
+    def complete_job(self, job, outputs, intermediates):
+        """
+        Record the outputs of a completed job and delete its intermediates.
+
+        Args:
+            job (str): Job name
+            outputs (list): Paths kept for serving
+            intermediates (list): Paths only needed while the job ran
+        """
+        self.register(job, [path for path in outputs if os.path.exists(path)], "output")
+        freed = 0
+        for path in intermediates:
+            if os.path.exists(path):
+                freed += path_size(path)
+                remove_path(path)
+                print(f"[INFO] Deleted intermediate {path}")
+        self.intermediate_bytes += freed
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.executemany("DELETE FROM files WHERE path = ?", [(os.path.abspath(path),) for path in intermediates])
+                conn.execute("UPDATE jobs SET status = 'done', finished_at = ? WHERE job = ?", (time.time(), job))
+
+    def active_jobs(self):
+        """
+        Get the names of jobs that are running and not yet considered abandoned.
+
+        Running jobs refresh their start time periodically, so only jobs whose process
+        died without failing them age out after active_job_seconds.
+        """
+        rows = self._execute("SELECT job FROM jobs WHERE status = 'running' AND started_at > ?",
+                             (time.time() - self.active_job_seconds,))
+        return {row["job"] for row in rows}
+
+    def _job_units(self):
+        """Group the indexed processed_videos paths by owning job."""
+        root = os.path.abspath(PROCESSED_VIDEOS_DIRECTORY)
+        units = {}
+        for row in self._execute("SELECT path, job FROM files"):
+            if row["path"].startswith(root + os.sep):
+                units.setdefault(row["job"], []).append(row["path"])
+        return units
+
+    def _units(self, directory, active, referenced):
+        """
+        List the deletable units of a managed directory.
+
+        Returns:
+            list: Dicts with 'name', 'paths', 'bytes', 'mtime' and 'protected'
+        """
+        units = []
+
+        def add(name, paths, protected):
+            paths = [path for path in paths if os.path.exists(path)]
+            if not paths:
+                return
+            try:
+                size = sum(path_size(path) for path in paths)
+                mtime = max(os.path.getmtime(path) for path in paths)
+            except OSError:
+                return  # Removed meanwhile
+            units.append({"name": name, "paths": paths, "bytes": size, "mtime": mtime, "protected": protected})
+
+        if directory == PROCESSED_VIDEOS_DIRECTORY:
+            owned = set()
+            for job, paths in self._job_units().items():
+                hls = os.path.abspath(hls_directory(job))
+                if hls not in paths:
+                    paths.append(hls)
+                owned.update(paths)
+                # Clip playlists of reports play the job's HLS segments
+                protected = job in active or any(clip.startswith((f"/hls/{job}/", hls_url_prefix(job))) for clip in referenced)
+                add(job, paths, protected)
+            skipped = {os.path.abspath(CHECKPOINT_DIRECTORY), os.path.abspath(HLS_DIRECTORY)}
+            for entry in os.scandir(directory):
+                path = os.path.abspath(entry.path)
+                if path not in owned and path not in skipped:
+                    # Outputs and segments of a running job are only indexed when it completes
+                    add(entry.name, [path], any(job in entry.name for job in active))
+            if os.path.isdir(HLS_DIRECTORY):
+                for entry in os.scandir(HLS_DIRECTORY):
+                    path = os.path.abspath(entry.path)
+                    if path not in owned:
+                        job = entry.name[:-len(".tmp")] if entry.name.endswith(".tmp") else entry.name
+                        protected = job in active or any(clip.startswith((f"/hls/{job}/", hls_url_prefix(job))) for clip in referenced)
+                        add(f"hls/{entry.name}", [path], protected)
+        else:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.abspath(os.path.join(root, name))
+                    if directory == UPLOAD_DIRECTORY:
+                        protected = name in active
+                    elif directory == VIDEO_CLIPS_DIRECTORY:
+                        protected = f"/video_clips/{name}" in referenced
+                    elif directory == PREVIEWS_DIRECTORY:
+                        # Previews of a running job are rendered before their report is inserted
+                        protected = (f"/previews/{name}" in referenced
+                                     or any(f"preview_{os.path.splitext(job)[0]}_" in name for job in active))
+                    else:
+                        protected = False
+                    add(os.path.relpath(path, os.path.abspath(directory)), [path], protected)
+        return units
+
+    def _delete_unit(self, directory, unit, reason):
+        for path in unit["paths"]:
+            remove_path(path)
+        self._execute(f"DELETE FROM files WHERE path IN ({', '.join('?' * len(unit['paths']))})", unit["paths"])
+        self.deleted_files[directory] += len(unit["paths"])
+        self.deleted_bytes[directory] += unit["bytes"]
+        print(f"[INFO] Storage {reason}: deleted {unit['name']} from {directory} ({unit['bytes']} bytes)")
+
+    def sweep(self):
+        """
+        Apply retention and quotas to every managed directory.
+
+        Without a database connection, clips, previews and job outputs cannot be checked
+        for references, so video_clips, previews and processed_videos are left alone.
+
+        Returns:
+            dict: Units deleted per directory
+        """
+        with self.sweep_lock:
+            sweep_start = time.perf_counter()
+            active = self.active_jobs()
+            try:
+                with Database(DB_CONFIG) as db:
+                    referenced = set(db.fetch_clip_paths()) | set(db.fetch_preview_paths())
+            except Exception as e:
+                print(f"[WARN] Storage sweep cannot read report clips, skipping clip and preview directories: {e}")
+                referenced = None
+            now = time.time()
+            deleted = {}
+            for directory in MANAGED_DIRECTORIES:
+                deleted[directory] = 0
+                if not os.path.isdir(directory):
+                    continue
+                if referenced is None and directory in REFERENCED_DIRECTORIES:
+                    continue
+                units = self._units(directory, active, referenced or set())
+                retention = self.retention_days.get(directory)
+                if retention is not None:
+                    for unit in [u for u in units if not u["protected"] and now - u["mtime"] > retention * 86400]:
+                        self._delete_unit(directory, unit, "retention")
+                        units.remove(unit)
+                        deleted[directory] += 1
+                quota = self.quotas.get(directory)
+                if quota is not None:
+                    total = sum(unit["bytes"] for unit in units)
+                    # Oldest first, until the directory fits its quota again
+                    for unit in sorted((u for u in units if not u["protected"]), key=lambda u: u["mtime"]):
+                        if total <= quota:
+                            break
+                        self._delete_unit(directory, unit, "quota")
+                        total -= unit["bytes"]
+                        deleted[directory] += 1
+                    if total > quota:
+                        print(f"[WARN] {directory} exceeds its quota with protected files only ({total} > {quota} bytes)")
+            self.last_sweep = {
+                "time": now,
+                "seconds": round(time.perf_counter() - sweep_start, 3),
+                "deleted": deleted,
+                "references_checked": referenced is not None,
+            }
+            return deleted
+
+    def stats(self):
+        """
+        Get disk usage metrics.
+
+        Returns:
+            dict: Per directory bytes, files, quota, retention and deletions; free disk
+                space, running jobs and the last sweep
+        """
+        directories = {}
+        for directory in MANAGED_DIRECTORIES:
+            files = size = 0
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    try:
+                        size += os.path.getsize(os.path.join(root, name))
+                        files += 1
+                    except OSError:
+                        pass
+            quota = self.quotas.get(directory)
+            directories[directory] = {
+                "bytes": size,
+                "files": files,
+                "quota_bytes": quota,
+                "quota_used": round(size / quota, 4) if quota else None,
+                "retention_days": self.retention_days.get(directory),
+                "deleted_files": self.deleted_files[directory],
+                "deleted_bytes": self.deleted_bytes[directory],
+            }
+        disk = shutil.disk_usage(".")
+        return {
+            "directories": directories,
+            "disk": {"total_bytes": disk.total, "used_bytes": disk.used, "free_bytes": disk.free},
+            "intermediate_bytes_deleted": self.intermediate_bytes,
+            "active_jobs": sorted(self.active_jobs()),
+            "last_sweep": self.last_sweep,
+        }
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Get the storage manager of this process, created on first use."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = StorageManager()
+        return _storage
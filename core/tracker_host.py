@@ -0,0 +1,90 @@
+import numpy as np
+from core.sort import Sort, batch_predict, batch_update, associate_detections_to_trackers
+
+
+class TrackerHost:
+    def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
+        """
+        Initialize a host for many independent SORT streams (cameras or jobs) in one process.
+
+        Every stream is a Sort instance with its own id space. On each tick the Kalman
+        filters of all streams are predicted in one batched step and all matched
+        detections are applied in one batched update.
+
+        Args:
+            max_age (int): Default frames to keep a track alive without detections
+            min_hits (int): Default detections before a track is reported
+            iou_threshold (float): Default minimum IOU for a match
+        """
+        self.defaults = {"max_age": max_age, "min_hits": min_hits, "iou_threshold": iou_threshold}
+        self.streams = {}  # Maps stream id to its Sort instance
+
+    def add_stream(self, stream_id, **sort_kwargs):
+        """
+        Register a stream.
+
+        Args:
+            stream_id (hashable): Unique id of the stream
+            **sort_kwargs: Overrides of the default SORT parameters for this stream
+
+        Returns:
+            Sort: The stream's tracker (e.g. for VehicleTracker(sort_tracker=...))
+        """
+        if stream_id in self.streams:
+            raise ValueError(f"Stream {stream_id} already exists")
+        params = dict(self.defaults)
+        params.update(sort_kwargs)
+        self.streams[stream_id] = Sort(**params)
+        return self.streams[stream_id]
+
+    def remove_stream(self, stream_id):
+        """Unregister a stream and drop its tracks."""
+        self.streams.pop(stream_id, None)
+
+    def update(self, dets_by_stream):
+        """
+        Advance the given streams by one frame.
+
+        Streams missing from dets_by_stream are not advanced this tick, so streams with
+        different frame rates can share a host. A stream that had a frame without
+        detections must be passed an empty np.empty((0, 5)) array.
+
+        Args:
+            dets_by_stream (dict): Maps stream id to detections [[x1,y1,x2,y2,score],...]
+
+        Returns:
+            dict: Maps stream id to tracks [[x1,y1,x2,y2,track_id],...] as returned by Sort.update
+        """
+        streams = [(stream_id, self.streams[stream_id], dets) for stream_id, dets in dets_by_stream.items()]
+
+        # One batched predict over the filters of all streams
+        all_trackers = [trk for _, sort, _ in streams for trk in sort.trackers]
+        boxes = batch_predict(all_trackers)
+
+        pending, matched_trackers, matched_boxes = [], [], []
+        offset = 0
+        for stream_id, sort, dets in streams:
+            dets = np.asarray(dets, dtype=float).reshape(-1, 5)
+            count = len(sort.trackers)
+            sort.frame_count += 1
+            trks = sort._collect_predictions(boxes[offset:offset + count])
+            offset += count
+            matched, unmatched_dets, _ = associate_detections_to_trackers(dets, trks, sort.iou_threshold)
+            matched_trackers.extend(sort.trackers[m[1]] for m in matched)
+            matched_boxes.extend(dets[m[0], :] for m in matched)
+            pending.append((stream_id, sort, dets, unmatched_dets))
+
+        # One batched update for the matched detections of all streams
+        batch_update(matched_trackers, matched_boxes)
+
+        return {stream_id: sort._finish_update(dets, unmatched_dets)
+                for stream_id, sort, dets, unmatched_dets in pending}
+
+    def stats(self):
+        """
+        Get the number of live tracks per stream.
+
+        Returns:
+            dict: Maps stream id to its number of Kalman filters
+        """
+        return {stream_id: len(sort.trackers) for stream_id, sort in self.streams.items()}
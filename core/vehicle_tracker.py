@@ -1,13 +1,38 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import json
+import math
 import time
 from core.sort import Sort
+from core.detector import Detector
+from core.zones import Zone, ZoneMap
+from core.ground_plane import GroundPlane, SpeedProfiler
+from core.media_cache import probe_video
+
+
+def stride_sort_params(frame_stride, max_age=1, min_hits=3):
+    """
+    Scale the frame counts of SORT to runs that process every frame_stride-th frame.
+
+    SORT counts processed frames, so at a stride the unscaled min_hits would confirm
+    tracks only after frame_stride times as much video, often inside the zones.
+
+    Args:
+        frame_stride (int): Process every frame_stride-th frame
+        max_age (int): Frames a track survives without detections, at stride 1
+        min_hits (int): Detections before a track is reported, at stride 1
+
+    Returns:
+        dict: max_age and min_hits for Sort
+    """
+    return {"max_age": max(1, math.ceil(max_age / frame_stride)),
+            "min_hits": max(1, math.ceil(min_hits / frame_stride))}
 
 
 class VehicleTracker:
-    def __init__(self, yolo_model_path, log_file_path, video_path=None, real_distance_meters=20):
+    def __init__(self, yolo_model_path, log_file_path, video_path=None, real_distance_meters=20,
+                 backend="pytorch", motion_gate=None, sort_tracker=None, detector=None, on_speed_logged=None,
+                 imgsz=None):
         """
         Initialize the VehicleTracker with YOLO model and tracking configuration.
         
@@ -16,11 +41,21 @@ class VehicleTracker:
             log_file_path (str): Path to save speed logs
             video_path (str, optional): Path to input video file
             real_distance_meters (int): Known distance between marker lines in meters
+            backend (str): Detector inference backend (pytorch, onnx, onnx-int8, openvino, openvino-int8)
+            motion_gate (MotionGate, optional): Skips detection on frames without motion
+            sort_tracker (Sort, optional): SORT instance to use, e.g. a stream of a TrackerHost
+            detector (optional): Shared detector to use instead of loading the model,
+                e.g. an InferenceClient of a batching InferenceServer
+            on_speed_logged (callable, optional): Called with every new speed log entry,
+                e.g. ReportSink.submit to materialize reports while processing
+            imgsz (int, optional): Inference image size of the loaded detector, model default if None
         """
-        self.model = YOLO(yolo_model_path)  # YOLO object detection model
-        self.sort_tracker = Sort()  # SORT tracker for object tracking
+        # YOLO object detection model
+        self.detector = detector if detector is not None else Detector(yolo_model_path, backend=backend, imgsz=imgsz)
+        self.sort_tracker = sort_tracker if sort_tracker is not None else Sort()  # SORT tracker for object tracking
         self.y_green = None  # Y-coordinate of green marker line
         self.y_red = None  # Y-coordinate of red marker line
+        self.zone_map = None  # Label mask of the measurement zones
         self.vehicle_data = {}  # Stores tracking data for each vehicle
         self.log_file_path = log_file_path  # Path to save speed logs
         self.speed_logs = []  # List of logged speed measurements
@@ -28,6 +63,13 @@ class VehicleTracker:
         self.fps = None  # Frames per second of the video
         self.video_path = video_path  # Path to input video
         self.real_distance_meters = real_distance_meters  # Known distance between markers
+        self.motion_gate = motion_gate  # Optional gate that skips detection on static frames
+        self.on_speed_logged = on_speed_logged  # Optional callback for new speed logs
+        self.speed_profiler = None  # Per-frame ground-plane speeds, set by set_ground_plane
+        self.source_size = None  # (width, height) of the source when frames are decoded downscaled
+        self.stage_seconds = {}  # Durations of the stages of the last track_objects call
+        self.current_time = None  # Time of the last tracked frame in the video timeline
+        self.frame_shape = None  # Shape the zone membership of the last frame was computed for
 
     def set_lines(self, y_green, y_red):
         """
@@ -39,34 +81,103 @@ class VehicleTracker:
         """
         self.y_green = y_green
         self.y_red = y_red
+        self.set_zones([Zone("default", self.real_distance_meters, band=(y_green, y_red))])
+
+    def set_zones(self, zones):
+        """
+        Set the measurement zones used for speed calculation.
+        
+        Args:
+            zones (list): List of Zone objects, each with its own distance and lane
+        """
+        self.zone_map = ZoneMap(zones)
+
+    def set_ground_plane(self, homography, smoothing=0.3, spool_path=None):
+        """
+        Enable per-frame speed profiles from the calibrated ground plane.
+        
+        Args:
+            homography (array-like): 3x3 image-to-ground homography from the calibration
+            smoothing (float): Weight of the newest instantaneous speed
+            spool_path (str, optional): File the profiles of finished tracks are moved to,
+                kept in memory if None
+        """
+        self.speed_profiler = SpeedProfiler(GroundPlane(homography), smoothing=smoothing, spool_path=spool_path)
+
+    def set_source_size(self, width, height):
+        """
+        Declare the source resolution when frames are decoded at a smaller size.
+
+        Detections are mapped back to source pixels, so zones, the ground plane and the
+        logs keep using the calibration's coordinates. Only for runs without drawing.
+
+        Args:
+            width (int): Source frame width
+            height (int): Source frame height
+        """
+        self.source_size = (width, height)
 
     def _initialize_fps(self):
-        """Initialize FPS by reading from video if not already set."""
+        """Initialize FPS from the cached video metadata if not already set."""
         if self.fps is None:
-            cap = cv2.VideoCapture(self.video_path)
-            self.fps = cap.get(cv2.CAP_PROP_FPS) or 25  # Default to 25 if not available
-            cap.release()
+            # Defaults to 25 if not available
+            self.fps = probe_video(self.video_path)["fps"] if self.video_path else 25
             print(f"[INFO] FPS set to: {self.fps}")
 
-    def _is_inside_zone(self, cy):
+    def _zone_membership(self, tracks, frame_shape):
         """
-        Check if a point is between the two marker lines.
+        Compute zone membership of all tracks of a frame in one vectorized pass.
         
         Args:
-            cy (int): Y-coordinate of the point to check
+            tracks (numpy.ndarray): Tracks in the format [[x1,y1,x2,y2,track_id],...]
+            frame_shape (tuple): Shape of the current frame
             
         Returns:
-            bool: True if point is between the lines
+            numpy.ndarray: Boolean array (num_tracks, num_zones)
+        """
+        boxes = tracks[:, :4].astype(int)
+        centers = np.stack([(boxes[:, 0] + boxes[:, 2]) // 2, (boxes[:, 1] + boxes[:, 3]) // 2], axis=1)
+        return self.zone_map.lookup(centers, frame_shape)
+
+    def _crossing_time(self, zone_index, last, center, current_time, entering, steps=8):
+        """
+        Interpolate when a track crossed a zone boundary between two processed frames.
+
+        The segment between the previous and the current box center is bisected against
+        the zone map, assuming constant velocity in between. Without this, entry and exit
+        times snap to processed frames, which skews speeds at frame strides.
+
+        Args:
+            zone_index (int): Index of the zone in the zone map
+            last (list): [x, y, time] of the previous observation of the track
+            center (tuple): (x, y) of the current box center
+            current_time (float): Time of the current frame
+            entering (bool): The track is inside the zone now and was outside before
+
+        Returns:
+            float: Estimated crossing time
         """
-        return min(self.y_green, self.y_red) <= cy <= max(self.y_green, self.y_red)
+        x0, y0, t0 = last
+        if t0 >= current_time:
+            return current_time
+        low, high = 0.0, 1.0  # Fractions of the segment on the old and the new side
+        for _ in range(steps):
+            middle = (low + high) / 2
+            point = [[round(x0 + (center[0] - x0) * middle), round(y0 + (center[1] - y0) * middle)]]
+            if bool(self.zone_map.lookup(point, self.frame_shape)[0, zone_index]) == entering:
+                high = middle
+            else:
+                low = middle
+        return round(t0 + (current_time - t0) * (low + high) / 2, 4)
 
-    def _calculate_speed(self, start, end):
+    def _calculate_speed(self, start, end, distance_meters=None):
         """
         Calculate speed based on time taken to cross known distance.
         
         Args:
             start (float): Start time in seconds
             end (float): End time in seconds
+            distance_meters (float, optional): Zone distance, defaults to real_distance_meters
             
         Returns:
             tuple: (speed_kmh, duration_seconds) or (None, None) if invalid
@@ -75,16 +186,20 @@ class VehicleTracker:
         if duration <= 0:
             return None, None
         # Calculate speed: distance/time converted to km/h
-        speed = (self.real_distance_meters / duration) * 3.6
+        if distance_meters is None:
+            distance_meters = self.real_distance_meters
+        speed = (distance_meters / duration) * 3.6
         return round(speed, 2), round(duration, 2)
 
-    def _log_speed(self, track_id, vehicle, speed, duration):
+    def _log_speed(self, track_id, vehicle, zone, zone_state, speed, duration):
         """
         Log speed measurement and update vehicle data.
         
         Args:
             track_id (int): ID of the tracked vehicle
             vehicle (dict): Vehicle tracking data
+            zone (Zone): Zone the vehicle crossed
+            zone_state (dict): Entry/exit times of the vehicle in the zone
             speed (float): Calculated speed in km/h
             duration (float): Time taken to cross the zone
         """
@@ -94,83 +209,169 @@ class VehicleTracker:
             "speed_kmh": speed,
             "duration_s": duration,
             "timestamp": time.time(),
-            "start_time": vehicle["start"],
-            "end_time": vehicle["end"]
+            "start_time": zone_state["start"],
+            "end_time": zone_state["end"],
+            "zone": zone.name,
+            "lane": zone.lane
         }
         self.speed_logs.append(log_entry)
-        print(f"[LOG] ID {track_id}: {speed} km/h in {duration} s")
+        print(f"[LOG] ID {track_id} ({zone.name}): {speed} km/h in {duration} s")
+        if self.on_speed_logged is not None:
+            self.on_speed_logged(log_entry)
 
-    def process_detection(self, track, current_time):
+    def process_detection(self, track, current_time, membership):
         """
         Process a single detection and update tracking data.
         
         Args:
             track (array): Tracking data [x1,y1,x2,y2,track_id]
             current_time (float): Current time in video timeline
+            membership (array): Boolean zone membership of the track, one entry per zone
             
         Returns:
             tuple: Tracking and processing results
         """
         x1, y1, x2, y2, track_id = map(int, track)
-        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2  # Center point of bounding box
+        center = ((x1 + x2) // 2, (y1 + y2) // 2)
         
         # Get or create vehicle tracking data
-        vehicle = self.vehicle_data.setdefault(track_id, {
-            "start": None, "end": None, "speed": None, "active": False
-        })
+        vehicle = self.vehicle_data.setdefault(track_id, {"speed": None, "zones": {}})
+        last = vehicle.get("last")  # [x, y, time] of the previous observation
 
-        in_zone = self._is_inside_zone(cy)
+        for zone_index, (zone, in_zone) in enumerate(zip(self.zone_map.zones, membership)):
+            zone_state = vehicle["zones"].get(zone.name)
+            if zone_state is None:
+                if not in_zone:
+                    continue
+                zone_state = vehicle["zones"][zone.name] = {"start": None, "end": None, "active": False}
 
-        # Handle zone entry/exit events
-        if in_zone and not vehicle["active"]:
-            vehicle["start"] = current_time
-            vehicle["active"] = True
-        elif not in_zone and vehicle["active"]:
-            vehicle["end"] = current_time
-            vehicle["active"] = False
+            # Handle zone entry/exit events; a track first seen inside a zone has no
+            # observed entry and is not measured in it
+            if in_zone and not zone_state["active"]:
+                zone_state["start"] = (self._crossing_time(zone_index, last, center, current_time, True)
+                                       if last is not None else None)
+                zone_state["active"] = True
+            elif not in_zone and zone_state["active"]:
+                zone_state["end"] = (self._crossing_time(zone_index, last, center, current_time, False)
+                                     if last is not None else current_time)
+                zone_state["active"] = False
 
-            # Calculate speed if we have valid timing data
-            if vehicle["start"] is not None:
-                speed, duration = self._calculate_speed(vehicle["start"], vehicle["end"])
-                if speed is not None:
-                    self._log_speed(track_id, vehicle, speed, duration)
+                # Calculate speed if we have valid timing data
+                if zone_state["start"] is not None:
+                    speed, duration = self._calculate_speed(zone_state["start"], zone_state["end"],
+                                                            zone.distance_m)
+                    if speed is not None:
+                        self._log_speed(track_id, vehicle, zone, zone_state, speed, duration)
 
-        return x1, y1, x2, y2, track_id, in_zone, vehicle
+        vehicle["last"] = [center[0], center[1], current_time]
+        return x1, y1, x2, y2, track_id, bool(np.any(membership)), vehicle
 
-    def track_objects(self, frame):
+    def track_objects(self, frame, draw=True, timestamp=None):
         """
         Process a frame to detect, track, and measure vehicle speeds.
         
         Args:
             frame (numpy.ndarray): Input video frame
+            draw (bool): Draw bounding boxes and labels on the frame. Disable
+                for analytics-only runs where no annotated video is produced.
+            timestamp (float, optional): Presentation time of the frame from the
+                decoder; derived from the frame count and FPS if None
             
         Returns:
-            numpy.ndarray: Frame with visualizations
+            numpy.ndarray: Frame with visualizations (unchanged if draw is False)
+        """
+        current_time = self.next_frame_time(timestamp)
+        self.current_time = current_time
+        detect_start = time.perf_counter()
+        detections = self.detect(frame)
+
+        # Update tracker with new detections
+        sort_start = time.perf_counter()
+        tracks = self.sort_tracker.update(detections)
+        zones_start = time.perf_counter()
+        frame = self.process_tracks(frame, tracks, current_time, draw=draw)
+        self.stage_seconds = {
+            "detect": sort_start - detect_start,
+            "sort": zones_start - sort_start,
+            "zones_draw": time.perf_counter() - zones_start,
+        }
+        return frame
+
+    def next_frame_time(self, timestamp=None):
+        """
+        Advance the frame counter.
+        
+        Args:
+            timestamp (float, optional): Exact time of the frame, e.g. its decoder pts;
+                needed when frames are skipped or the frame rate is variable
+        
+        Returns:
+            float: Time of the new frame in the video timeline
         """
-        self._initialize_fps()
         self.frame_count += 1
-        current_time = self.frame_count / self.fps  # Current time in video
+        if timestamp is not None:
+            return timestamp
+        self._initialize_fps()
+        return self.frame_count / self.fps  # Current time in video
 
-        # Run YOLO detection
-        results = self.model(frame, verbose=False)[0]
-        # Format detections for SORT tracker [x1,y1,x2,y2,confidence]
-        detections = [
-            [*map(int, box.xyxy[0]), float(box.conf[0])]
-            for box in results.boxes
-        ]
+    def detect(self, frame):
+        """
+        Run YOLO detection on a frame.
+        
+        Args:
+            frame (numpy.ndarray): Input video frame
+            
+        Returns:
+            numpy.ndarray: Detections formatted for SORT [x1,y1,x2,y2,confidence]
+        """
+        # Static frames rejected by the motion gate get no detections at all
+        if self.motion_gate is not None and not self.motion_gate.has_motion(frame):
+            return np.empty((0, 5))
+        detections = self.detector.detect(frame)
+        if self.source_size is not None:
+            # Map boxes of a downscaled frame back to source pixels
+            detections[:, [0, 2]] *= self.source_size[0] / frame.shape[1]
+            detections[:, [1, 3]] *= self.source_size[1] / frame.shape[0]
+        detections[:, :4] = np.trunc(detections[:, :4])
+        return detections
 
-        # Update tracker with new detections
-        tracks = self.sort_tracker.update(np.array(detections))
+    def process_tracks(self, frame, tracks, current_time, draw=True):
+        """
+        Update zone and speed state for the tracks of a frame and visualize them.
+        
+        Used directly when SORT is advanced externally (e.g. by a TrackerHost).
+        
+        Args:
+            frame (numpy.ndarray): Input video frame
+            tracks (numpy.ndarray): Tracks [[x1,y1,x2,y2,track_id],...] from Sort.update
+            current_time (float): Time of the frame from next_frame_time()
+            draw (bool): Draw bounding boxes and labels on the frame
+            
+        Returns:
+            numpy.ndarray: Frame with visualizations (unchanged if draw is False)
+        """
+        shape = frame.shape if self.source_size is None else (self.source_size[1], self.source_size[0])
+        self.frame_shape = shape
+        memberships = self._zone_membership(tracks, shape)
+        # Instantaneous speeds of all tracks from one ground-plane mapping
+        if self.speed_profiler is not None:
+            speeds = self.speed_profiler.update(tracks, current_time)
+        else:
+            speeds = np.full(len(tracks), np.nan)
 
         # Process each tracked object
-        for track in tracks:
-            x1, y1, x2, y2, track_id, in_zone, vehicle = self.process_detection(track, current_time)
+        for track, membership, current_speed in zip(tracks, memberships, speeds):
+            x1, y1, x2, y2, track_id, in_zone, vehicle = self.process_detection(track, current_time, membership)
+            if not draw:
+                continue
 
             # Choose color based on zone status
             color = (255, 255, 0) if in_zone else (57, 255, 20)  # Yellow if in zone, green otherwise
             label = f"ID {track_id}"
             if vehicle["speed"] is not None:
                 label += f" | {vehicle['speed']} km/h"
+            elif not np.isnan(current_speed):
+                label += f" | ~{current_speed:.0f} km/h"
 
             # Draw bounding box and label
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, 1)
@@ -178,8 +379,67 @@ class VehicleTracker:
 
         return frame
 
+    def logs_by_zone(self):
+        """
+        Group speed logs by measurement zone.
+        
+        Returns:
+            dict: Mapping of zone name to its list of speed logs
+        """
+        grouped = {zone.name: [] for zone in self.zone_map.zones} if self.zone_map else {}
+        for log in self.speed_logs:
+            grouped.setdefault(log["zone"], []).append(log)
+        return grouped
+
+    def to_checkpoint(self):
+        """
+        Get the tracking state needed to resume processing from the current frame.
+        
+        Returns:
+            dict: SORT state, per-vehicle zone state, speed logs and frame counter
+        """
+        return {
+            "sort": self.sort_tracker.to_checkpoint(),
+            "vehicle_data": self.vehicle_data,
+            "speed_logs": self.speed_logs,
+            "frame_count": self.frame_count,
+            "fps": self.fps,
+            "motion_gate": self.motion_gate.to_checkpoint() if self.motion_gate is not None else None,
+            "speed_profiler": self.speed_profiler.to_checkpoint() if self.speed_profiler is not None else None
+        }
+
+    def restore_checkpoint(self, state):
+        """
+        Restore the tracking state saved by to_checkpoint().
+        
+        Args:
+            state (dict): Checkpointed tracking state
+        """
+        self.sort_tracker.restore_checkpoint(state["sort"])
+        self.vehicle_data = state["vehicle_data"]
+        self.speed_logs = state["speed_logs"]
+        self.frame_count = state["frame_count"]
+        self.fps = state["fps"]
+        if self.motion_gate is not None and state["motion_gate"] is not None:
+            self.motion_gate.restore_checkpoint(state["motion_gate"])
+        if self.speed_profiler is not None and state.get("speed_profiler") is not None:
+            self.speed_profiler.restore_checkpoint(state["speed_profiler"])
+
     def save_logs(self):
         """Save collected speed logs to JSON file."""
         with open(self.log_file_path, 'w') as f:
             json.dump(self.speed_logs, f, indent=4)
-        print(f"[INFO] Speed logs saved to: {self.log_file_path}")
\ No newline at end of file
+        print(f"[INFO] Speed logs saved to: {self.log_file_path}")
+
+    def save_speed_profiles(self, profile_file_path):
+        """
+        Save the per-frame speed profiles of all tracks to a JSON file.
+        
+        Args:
+            profile_file_path (str): Path of the profiles JSON, maps track id to
+                [time_s, speed_kmh, ground_x_m, ground_y_m] samples
+        """
+        profiles = self.speed_profiler.all_profiles() if self.speed_profiler is not None else {}
+        with open(profile_file_path, 'w') as f:
+            json.dump({str(track_id): samples for track_id, samples in profiles.items()}, f)
+        print(f"[INFO] Speed profiles saved to: {profile_file_path}")
\ No newline at end of file
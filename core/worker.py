@@ -0,0 +1,122 @@
+import os
+import time
+import socket
+import threading
+import multiprocessing
+
+from core.job_queue import create_job_queue
+from core.pipeline import ensure_directories, migrate_database, process_video_job
+from config import JOB_QUEUE_BACKEND, JOB_LEASE_SECONDS, JOB_HEARTBEAT_SECONDS
+
+
+class Heartbeat(threading.Thread):
+    def __init__(self, queue_backend, job_id, worker_id, lease_seconds, interval):
+        """
+        Background thread extending the lease of a running job.
+
+        Args:
+            queue_backend (str): Job queue backend, the thread uses its own connection
+            job_id (str): Id of the running job
+            worker_id (str): Id of the worker owning the job
+            lease_seconds (float): Lease duration set on every heartbeat
+            interval (float): Seconds between heartbeats
+        """
+        super().__init__(daemon=True)
+        self.queue_backend = queue_backend
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.lease_lost = threading.Event()  # Set when another worker took over the job
+
+    def run(self):
+        with create_job_queue(self.queue_backend) as queue:
+            while not self.stopped.wait(self.interval):
+                try:
+                    if not queue.heartbeat(self.job_id, self.worker_id, self.lease_seconds):
+                        print(f"[WARN] Worker {self.worker_id} lost the lease of job {self.job_id}")
+                        self.lease_lost.set()
+                        return
+                except Exception as e:
+                    print(f"[WARN] Heartbeat for job {self.job_id} failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_worker(queue_backend=JOB_QUEUE_BACKEND, worker_id=None, lease_seconds=JOB_LEASE_SECONDS,
+               heartbeat_seconds=JOB_HEARTBEAT_SECONDS, poll_interval=5.0, max_jobs=None):
+    """
+    Pull process_video jobs from the queue and write their results back.
+
+    Args:
+        queue_backend (str): Job queue backend ('postgres' or 'sqlite')
+        worker_id (str, optional): Unique worker id, defaults to host:pid
+        lease_seconds (float): Lease duration of claimed jobs
+        heartbeat_seconds (float): Seconds between lease extensions
+        poll_interval (float): Seconds to wait when the queue is empty
+        max_jobs (int, optional): Exit after this many jobs, run forever if None
+
+    Returns:
+        int: Number of jobs processed
+    """
+    ensure_directories()
+    migrate_database()
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    print(f"[INFO] Worker {worker_id} started")
+    with create_job_queue(queue_backend) as queue:
+        queue.create_schema()
+        while max_jobs is None or processed < max_jobs:
+            reaped = queue.reap_expired()
+            if reaped:
+                print(f"[INFO] Marked {reaped} expired jobs as failed")
+
+            job = queue.claim(worker_id, lease_seconds)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+
+            print(f"[INFO] Worker {worker_id} claimed job {job['id']} (attempt {job['attempts']}): {job['video_path']}")
+            heartbeat = Heartbeat(queue_backend, job["id"], worker_id, lease_seconds, heartbeat_seconds)
+            heartbeat.start()
+            try:
+                # The frame loop stops as soon as the heartbeat loses the lease
+                result = process_video_job(job["video_path"], job["calibration_path"],
+                                           cancel_event=heartbeat.lease_lost, **(job["options"] or {}))
+            except Exception as e:
+                heartbeat.stop()
+                if heartbeat.lease_lost.is_set():
+                    print(f"[WARN] Job {job['id']} abandoned, another worker owns it now: {e}")
+                else:
+                    status = queue.fail(job["id"], worker_id, str(e))
+                    print(f"[ERROR] Job {job['id']} failed: {e} (now {status})")
+            else:
+                heartbeat.stop()
+                if queue.complete(job["id"], worker_id, result):
+                    print(f"[INFO] Job {job['id']} done")
+                else:
+                    print(f"[WARN] Job {job['id']} finished after its lease was lost, result discarded")
+            processed += 1
+    return processed
+
+
+def run_workers(processes=1, **kwargs):
+    """
+    Run several worker processes on this node.
+
+    Args:
+        processes (int): Number of worker processes
+        **kwargs: Arguments passed to run_worker
+    """
+    if processes == 1:
+        run_worker(**kwargs)
+        return
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_worker, kwargs=kwargs) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
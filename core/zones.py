@@ -0,0 +1,156 @@
+import math
+import cv2
+import numpy as np
+
+# Zone membership is stored as one bit per zone in a uint32 label mask
+MAX_ZONES = 32
+
+
+class Zone:
+    def __init__(self, name, distance_m, polygon=None, band=None, lane=None):
+        """
+        Initialize a measurement zone.
+
+        A zone is either an arbitrary image polygon or a horizontal band between two
+        y-coordinates spanning the full frame width (the classic pair of marker lines).
+
+        Args:
+            name (str): Unique zone name
+            distance_m (float): Real-world distance travelled while crossing the zone in meters
+            polygon (list, optional): Image polygon [[x, y], ...]
+            band (tuple, optional): (y_green, y_red) rows of the lines bounding a full-width band
+            lane (str, optional): Lane label the zone belongs to
+        """
+        if (polygon is None) == (band is None):
+            raise ValueError(f"Zone {name} needs exactly one of polygon or band")
+        if polygon is not None and len(polygon) < 3:
+            raise ValueError(f"Zone {name} polygon needs at least 3 points")
+        try:
+            distance_m = float(distance_m)
+        except (TypeError, ValueError):
+            raise ValueError(f"Zone {name} distance must be a number, got {distance_m!r}")
+        if not math.isfinite(distance_m) or distance_m <= 0:
+            raise ValueError(f"Zone {name} distance must be positive, got {distance_m}")
+        self.name = name
+        self.distance_m = distance_m
+        self.polygon = [[int(round(x)), int(round(y))] for x, y in polygon] if polygon is not None else None
+        self.band = (int(band[0]), int(band[1])) if band is not None else None
+        self.lane = lane
+
+    def to_dict(self):
+        """Serialize the zone for the calibration JSON."""
+        data = {"name": self.name, "lane": self.lane, "distance_m": self.distance_m}
+        if self.polygon is not None:
+            data["polygon"] = self.polygon
+        else:
+            data["band"] = list(self.band)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a zone from its calibration JSON representation."""
+        return cls(
+            name=data["name"],
+            distance_m=data["distance_m"],
+            polygon=data.get("polygon"),
+            band=data.get("band"),
+            lane=data.get("lane")
+        )
+
+
+class ZoneMap:
+    def __init__(self, zones):
+        """
+        Initialize a label mask for fast zone membership tests.
+
+        Args:
+            zones (list): List of Zone objects (at most MAX_ZONES)
+        """
+        if len(zones) > MAX_ZONES:
+            raise ValueError(f"At most {MAX_ZONES} zones are supported, got {len(zones)}")
+        names = [zone.name for zone in zones]
+        if len(set(names)) != len(names):
+            raise ValueError("Zone names must be unique")
+        self.zones = list(zones)
+        self.mask = None  # uint32 label mask, bit i set where zone i covers the pixel
+        self.shape = None  # Frame shape the mask was rasterized for
+        self.bits = np.arange(len(self.zones), dtype=np.uint32)
+
+    def _build(self, shape):
+        """
+        Rasterize all zones into the label mask.
+
+        Args:
+            shape (tuple): Frame shape (height, width)
+        """
+        h, w = shape[:2]
+        mask = np.zeros((h, w), dtype=np.uint32)
+        layer = np.zeros((h, w), dtype=np.uint8)
+        for i, zone in enumerate(self.zones):
+            layer[:] = 0
+            if zone.polygon is not None:
+                cv2.fillPoly(layer, [np.array(zone.polygon, dtype=np.int32)], 1)
+            else:
+                top, bottom = max(min(zone.band), 0), min(max(zone.band), h - 1)
+                if top <= bottom:
+                    layer[top:bottom + 1, :] = 1
+            mask |= layer.astype(np.uint32) << np.uint32(i)
+        self.mask = mask
+        self.shape = (h, w)
+
+    def lookup(self, points, shape):
+        """
+        Compute zone membership of many points in one vectorized pass.
+
+        Args:
+            points (numpy.ndarray): Array of [x, y] image points
+            shape (tuple): Frame shape, the mask is rebuilt when it changes
+
+        Returns:
+            numpy.ndarray: Boolean array (num_points, num_zones)
+        """
+        if self.mask is None or self.shape != tuple(shape[:2]):
+            self._build(shape)
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        h, w = self.shape
+        # Centers of boxes partially outside the frame are clamped to the left/right border
+        xs, ys = np.clip(points[:, 0], 0, w - 1), points[:, 1]
+        inside = (ys >= 0) & (ys < h)
+        labels = np.zeros(len(points), dtype=np.uint32)
+        labels[inside] = self.mask[ys[inside], xs[inside]]
+        return ((labels[:, None] >> self.bits[None, :]) & 1).astype(bool)
+
+    def draw(self, frame):
+        """
+        Draw zone outlines and names on a frame.
+
+        Args:
+            frame (numpy.ndarray): Frame to draw on
+        """
+        w = frame.shape[1]
+        for zone in self.zones:
+            if zone.polygon is not None:
+                points = np.array(zone.polygon, dtype=np.int32)
+                cv2.polylines(frame, [points], True, (0, 255, 255), 2)
+                x, y = points.min(axis=0)
+                cv2.putText(frame, f"{zone.name} {zone.distance_m:g}m", (int(x), int(y) - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            else:
+                # Bands are drawn as the green (entry) and red (exit) marker lines
+                cv2.line(frame, (0, zone.band[0]), (w, zone.band[0]), (0, 255, 0), 2)
+                cv2.line(frame, (0, zone.band[1]), (w, zone.band[1]), (0, 0, 255), 2)
+
+    def vertical_extent(self):
+        """
+        Get the vertical extent covered by all zones.
+
+        Returns:
+            tuple: (y_min, y_max) in image pixels
+        """
+        ys = []
+        for zone in self.zones:
+            if zone.polygon is not None:
+                ys.extend(y for _, y in zone.polygon)
+            else:
+                ys.extend(zone.band)
+        return min(ys), max(ys)
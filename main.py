@@ -1,60 +1,127 @@
 from fastapi import FastAPI, File, UploadFile, Request, Query, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.responses import (HTMLResponse, JSONResponse, FileResponse, StreamingResponse, Response,
+                               PlainTextResponse)
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import cv2
 import numpy as np
 import json
 import shutil
 import os
-import subprocess
+import uuid
+import time
+import asyncio
+import threading
+from typing import Optional
+from datetime import datetime, timedelta
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from core.camera_calibration import CameraCalibrator
-from core.vehicle_tracker import VehicleTracker
 from core.database import Database
-from config import SPEED_THRESHOLD_KMH, REAL_DISTANCE_METERS
+from core.pipeline import JobError, ensure_directories, migrate_database, load_camera, process_video_job
+from core.job_queue import create_job_queue
+from core.detector import BACKENDS, Detector
+from core.inference_server import InferenceServer
+from core.report_export import check_export_format, stream_export
+from core.media_cache import probe_video, extract_snapshot
+from core.ffmpeg_executor import get_executor
+from core.scheduler import JobScheduler, SchedulerFull
+from core.hls import PLAYLIST_NAME, hls_directory, clip_playlist
+from core.storage import get_storage
+from core.autotune import load_profile, profile_job_options
+from core.profiler import request_capture
+from core.rollups import GRANULARITIES, query_statistics
+from config import (INFERENCE_BATCHING, INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS, MODEL_PATH,
+                    DETECTOR_BACKEND, UPLOAD_DIRECTORY, CALIBRATION_DIRECTORY, PROCESSED_VIDEOS_DIRECTORY,
+                    VIDEO_CLIPS_DIRECTORY, SNAPSHOTS_DIRECTORY, PREVIEWS_DIRECTORY, DB_CONFIG, SCHEDULER_MAX_CONCURRENT_JOBS,
+                    SCHEDULER_RESERVED_LIVE_SLOTS, SCHEDULER_MAX_QUEUED, STORAGE_SWEEP_SECONDS,
+                    VIDEO_DECODER, PROFILE_MAX_SECONDS, PREVIEW_SPRITE_COLUMNS, PREVIEW_SPRITE_FRAMES)
 
 # Initialize FastAPI application
 app = FastAPI()
 
+# Create directories if they don't exist
+ensure_directories()
+
 # Mount directories for serving static files, snapshots, processed videos, and video clips
 app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/snapshots", StaticFiles(directory="snapshots"), name="snapshots")
-app.mount("/processed_videos", StaticFiles(directory="processed_videos"), name="processed_videos")
-app.mount("/video_clips", StaticFiles(directory="video_clips"), name="video_clips")
+app.mount("/snapshots", StaticFiles(directory=SNAPSHOTS_DIRECTORY), name="snapshots")
+app.mount("/processed_videos", StaticFiles(directory=PROCESSED_VIDEOS_DIRECTORY), name="processed_videos")
+app.mount("/video_clips", StaticFiles(directory=VIDEO_CLIPS_DIRECTORY), name="video_clips")
 # Initialize Jinja2 templates for rendering HTML
 templates = Jinja2Templates(directory="templates")
 
-# Define directories for file storage
-UPLOAD_DIRECTORY = "uploaded_videos"
-CALIBRATION_DIRECTORY = "calibration_data"
-PROCESSED_VIDEOS_DIRECTORY = "processed_videos"
-VIDEO_CLIPS_DIRECTORY = "video_clips"
-
-# Create directories if they don't exist
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
-os.makedirs(CALIBRATION_DIRECTORY, exist_ok=True)
-os.makedirs(PROCESSED_VIDEOS_DIRECTORY, exist_ok=True)
-os.makedirs(VIDEO_CLIPS_DIRECTORY, exist_ok=True)
-os.makedirs("snapshots", exist_ok=True)
-
-# Path to YOLO model for vehicle tracking
-MODEL_PATH = "core/model/best.pt"
-
-# Database configuration
-DB_CONFIG = {
-    "dbname": "traffic_reports",
-    "user": "traffic_user",
-    "password": "01234",
-    "host": "localhost",
-    "port": "5432"
-}
+# Admission control: bounded concurrent jobs, priority classes and per-tenant fairness
+scheduler = JobScheduler(max_concurrent=SCHEDULER_MAX_CONCURRENT_JOBS, max_queued=SCHEDULER_MAX_QUEUED,
+                         reserved_slots=SCHEDULER_RESERVED_LIVE_SLOTS)
+
+# Shared batching inference servers, one per detector backend
+inference_servers = {}
+inference_servers_lock = threading.Lock()
+
+def get_inference_server(backend, imgsz=None):
+    # Load the model once per backend and input size and start its batching thread on first use;
+    # a batch runs at one size, so cameras tuned to different sizes use separate servers
+    with inference_servers_lock:
+        key = (backend, imgsz)
+        if key not in inference_servers:
+            server = InferenceServer(Detector(MODEL_PATH, backend=backend, imgsz=imgsz),
+                                     max_batch_size=load_profile().get("batch_size", INFERENCE_MAX_BATCH_SIZE),
+                                     max_wait_ms=INFERENCE_MAX_WAIT_MS)
+            server.start()
+            inference_servers[key] = server
+        return inference_servers[key]
+
+@app.on_event("shutdown")
+def stop_inference_servers():
+    # Stop batching threads when the application shuts down
+    for server in inference_servers.values():
+        server.stop()
+
+# Background task applying storage retention and quotas
+storage_sweeper = None
+
+async def sweep_storage_periodically():
+    while True:
+        try:
+            await run_in_threadpool(get_storage().sweep)
+        except Exception as e:
+            print(f"[ERROR] Storage sweep failed: {e}")
+        await asyncio.sleep(STORAGE_SWEEP_SECONDS)
+
+@app.on_event("startup")
+async def migrate_reports_table():
+    # Schema changes are applied once here instead of by every job
+    await run_in_threadpool(migrate_database)
+
+@app.on_event("startup")
+async def start_storage_sweeper():
+    global storage_sweeper
+    storage_sweeper = asyncio.create_task(sweep_storage_periodically())
+
+@app.on_event("shutdown")
+async def stop_storage_sweeper():
+    if storage_sweeper is not None:
+        storage_sweeper.cancel()
 
 # Pydantic model for video processing request
 class ProcessVideoRequest(BaseModel):
     video_filename: str
     calibration_file: str
+    # Skip drawing, VideoWriter and transcoding; produce only logs, reports and clips
+    analytics_only: bool = False
+    # Detector inference backend for this job
+    backend: str = DETECTOR_BACKEND
+    # Skip detection on frames without motion ('diff' or 'mog2'), optionally only inside the band
+    motion_gate: Optional[str] = None
+    motion_gate_band_only: bool = True
+    # Frame decoder ('opencv' or 'ffmpeg'), decode-time width (ffmpeg, analytics only) and frame stride
+    decoder: str = VIDEO_DECODER
+    decode_width: Optional[int] = None
+    frame_stride: int = 1
+    # Scheduling class ('live', 'interactive' or 'backlog') and tenant for fair sharing
+    priority: str = "interactive"
+    tenant: str = "default"
 
 # Route to serve the main page
 @app.get("/", response_class=HTMLResponse)
@@ -85,16 +152,17 @@ async def calibration_page(request: Request, filename: str = Query(...)):
     try:
         # Construct paths for video and snapshot
         video_path = os.path.join(UPLOAD_DIRECTORY, filename)
-        snapshot_path = os.path.join("snapshots", f"{filename}.jpg")
+        snapshot_path = os.path.join(SNAPSHOTS_DIRECTORY, f"{filename}.jpg")
 
         print(f"Calibration request for video: {video_path}")
         # Check if video file exists
         if not os.path.exists(video_path):
             raise HTTPException(status_code=400, detail=f"Video file not found: {video_path}")
 
-        # Initialize calibrator and load image
-        calibrator = CameraCalibrator(video_path, snapshot_path)
-        calibrator.load_image()
+        # Create the snapshot once; later visits reuse the cached file
+        if not os.path.exists(snapshot_path):
+            calibrator = CameraCalibrator(video_path, snapshot_path)
+            calibrator.load_image()
 
         # Verify snapshot was created successfully
         if not os.path.exists(snapshot_path):
@@ -145,13 +213,21 @@ async def save_calibration(data: dict):
             raise HTTPException(status_code=400, detail=f"Video file not found: {video_path}")
 
         # Initialize calibrator with video and snapshot paths
-        snapshot_path = os.path.join("snapshots", f"{filename}.jpg")
+        snapshot_path = os.path.join(SNAPSHOTS_DIRECTORY, f"{filename}.jpg")
         calibrator = CameraCalibrator(video_path, snapshot_path)
         calibrator.image_points = image_points
         calibrator.object_points = object_points
         # Perform camera calibration
         calibrator.calibrate()
 
+        # Build optional measurement zones/lanes from their specifications
+        zone_specs = data.get("zones") or []
+        if zone_specs:
+            try:
+                calibrator.build_zones(zone_specs)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
         # Save calibration data to JSON file
         calibration_file = os.path.join(CALIBRATION_DIRECTORY, f"{filename}.json")
         calibrator.save_calibration(calibration_file)
@@ -165,6 +241,69 @@ async def save_calibration(data: dict):
         # Raise HTTP exception for general errors
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Route to fetch a (cached) snapshot of an uploaded video at an arbitrary timestamp
+@app.get("/snapshot")
+async def snapshot(video_filename: str = Query(...), t: float = Query(0.0, ge=0.0),
+                   width: Optional[int] = Query(None, gt=0, le=4096)):
+    video_path = os.path.join(UPLOAD_DIRECTORY, os.path.basename(video_filename))
+    if not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail=f"Video file {video_filename} not found")
+    metadata = await run_in_threadpool(probe_video, video_path)
+    if metadata["duration"] is not None and t >= metadata["duration"]:
+        raise HTTPException(status_code=400, detail=f"Timestamp {t}s is beyond the video duration {metadata['duration']:.3f}s")
+    try:
+        snapshot_path = await run_in_threadpool(extract_snapshot, video_path, t, width)
+    except Exception as e:
+        print(f"Error extracting snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error extracting snapshot: {str(e)}")
+    # The cached file is tied to the video version, so clients may cache it too
+    return FileResponse(snapshot_path, media_type="image/jpeg", headers={"Cache-Control": "public, max-age=86400"})
+
+# Route to serve the HLS playlist of a processed video
+@app.get("/hls/{video_filename}/index.m3u8")
+async def hls_playlist(video_filename: str):
+    playlist_path = os.path.join(hls_directory(video_filename), PLAYLIST_NAME)
+    if not os.path.exists(playlist_path):
+        raise HTTPException(status_code=404, detail=f"No HLS output for {video_filename}")
+    # Short caching: the playlist is replaced when the video is processed again
+    return FileResponse(playlist_path, media_type="application/vnd.apple.mpegurl",
+                        headers={"Cache-Control": "public, max-age=60"})
+
+# Route to serve a playlist of the HLS segments covering a time range (report clips)
+@app.get("/hls/{video_filename}/clip.m3u8")
+async def hls_clip_playlist(video_filename: str, start: float = Query(..., ge=0.0), end: float = Query(...)):
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if not os.path.exists(os.path.join(hls_directory(video_filename), PLAYLIST_NAME)):
+        raise HTTPException(status_code=404, detail=f"No HLS output for {video_filename}")
+    try:
+        playlist = await run_in_threadpool(clip_playlist, video_filename, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Response(content=playlist, media_type="application/vnd.apple.mpegurl",
+                    headers={"Cache-Control": "public, max-age=60"})
+
+# Route to serve HLS init and media segments
+@app.get("/hls/{video_filename}/{segment}")
+async def hls_segment(video_filename: str, segment: str):
+    segment_path = os.path.join(hls_directory(video_filename), os.path.basename(segment))
+    if not segment.endswith((".m4s", ".mp4")) or not os.path.exists(segment_path):
+        raise HTTPException(status_code=404, detail=f"Segment {segment} not found")
+    # Segment names carry the packaging run id and are never reused, so players and proxies may keep them
+    media_type = "video/iso.segment" if segment.endswith(".m4s") else "video/mp4"
+    return FileResponse(segment_path, media_type=media_type,
+                        headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+# Route to serve report posters and preview sprites
+@app.get("/previews/{filename}")
+async def preview_image(filename: str):
+    preview_path = os.path.join(PREVIEWS_DIRECTORY, os.path.basename(filename))
+    if not filename.endswith(".jpg") or not os.path.exists(preview_path):
+        raise HTTPException(status_code=404, detail=f"Preview {filename} not found")
+    # Previews are written once per violation and never change, so clients keep them for a year
+    return FileResponse(preview_path, media_type="image/jpeg",
+                        headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
 # Route to download processed video
 @app.get("/download_video")
 async def download_video(video_filename: str = Query(...)):
@@ -225,176 +364,157 @@ async def speed_estimation_page(request: Request, calibration_file: str = Query(
 async def process_video(request: ProcessVideoRequest):
     try:
         # Extract video and calibration file names from request
-        video_filename = request.video_filename
-        calibration_file = request.calibration_file
-        video_path = os.path.join(UPLOAD_DIRECTORY, video_filename)
-        calibration_path = os.path.join(CALIBRATION_DIRECTORY, calibration_file)
-        output_video_path = os.path.join(PROCESSED_VIDEOS_DIRECTORY, f"processed_{video_filename}")
-        converted_video_path = os.path.join(PROCESSED_VIDEOS_DIRECTORY, f"converted_{video_filename}")
-        log_file_path = os.path.join(PROCESSED_VIDEOS_DIRECTORY, f"speed_log_{video_filename}.json")
-
-        # Validate file existence
-        if not os.path.exists(video_path):
-            raise HTTPException(status_code=400, detail=f"Video file {video_path} not found")
-        if not os.path.exists(calibration_path):
-            raise HTTPException(status_code=400, detail=f"Calibration file {calibration_path} not found")
-
-        # Initialize and configure camera calibrator
-        calibrator = CameraCalibrator(video_path)
-        calibrator.load_calibration(calibration_path)
-        calibrator.load_image()
-        # Draw distance markers for speed calculation
-        calibrator.draw_distance_markers()
-
-        # Get y-coordinates of green and red marker lines
-        green_line_y = calibrator.marker_lines.get('green')
-        red_line_y = calibrator.marker_lines.get('red')
-
-        if green_line_y is None or red_line_y is None:
-            raise HTTPException(status_code=500, detail="Failed to determine marker lines")
-
-        # Initialize vehicle tracker with YOLO model and configuration
-        tracker = VehicleTracker(
-            yolo_model_path=MODEL_PATH,
-            log_file_path=log_file_path,
-            video_path=video_path,
-            real_distance_meters=REAL_DISTANCE_METERS
-        )
-        tracker.set_lines(green_line_y, red_line_y)
-
-        # Open input video
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise HTTPException(status_code=500, detail="Failed to open input video")
-
-        # Get video properties
-        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        print(f"Video properties: width={frame_width}, height={frame_height}, fps={fps}")
-
-        # Initialize video writer for processed output
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_video_path, fourcc, fps, (frame_width, frame_height))
-        if not out.isOpened():
-            cap.release()
-            raise HTTPException(status_code=500, detail="Failed to open VideoWriter")
-
-        # Process video frames
-        frame_count = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            # Track objects in the frame
-            frame = tracker.track_objects(frame)
-            h, w = frame.shape[:2]
-            # Draw green and red marker lines
-            cv2.line(frame, (0, green_line_y), (w, green_line_y), (0, 255, 0), 2)
-            cv2.line(frame, (0, red_line_y), (w, red_line_y), (0, 0, 255), 2)
-            out.write(frame)
-            frame_count += 1
-            if frame_count % 100 == 0:
-                print(f"Processed {frame_count} frames")
-
-        print(f"Total frames processed: {frame_count}")
-        cap.release()
-        out.release()
-
-        # Verify output video was created
-        if not os.path.exists(output_video_path):
-            raise HTTPException(status_code=500, detail="Output video file was not created")
-        file_size = os.path.getsize(output_video_path)
-        print(f"Output video created: {output_video_path}, size={file_size} bytes")
-
-        # Convert video to browser-compatible format using FFmpeg
+        video_path = os.path.join(UPLOAD_DIRECTORY, request.video_filename)
+        calibration_path = os.path.join(CALIBRATION_DIRECTORY, request.calibration_file)
+        # Settings of the autotune profile apply unless the request sets them
+        job_fields = {"video_filename", "calibration_file", "priority", "tenant"}
+        options = request.dict(exclude=job_fields)
+        options.update(profile_job_options())
+        options.update(request.dict(exclude=job_fields, exclude_unset=True))
+
+        # Wait for a processing slot; overloaded priority classes are shed with 429
         try:
-            result = subprocess.run([
-                "ffmpeg", "-i", output_video_path, "-c:v", "libx264", "-c:a", "aac",
-                "-strict", "-2", converted_video_path
-            ], check=True, capture_output=True, text=True)
-            print(f"Converted video created: {converted_video_path}")
-        except subprocess.CalledProcessError as e:
-            print(f"FFmpeg error: {e.stderr}")
-            raise HTTPException(status_code=500, detail=f"FFmpeg conversion failed: {e.stderr}")
-
-        # Save tracking logs
-        tracker.save_logs()
-
-        # Load speed logs
-        with open(log_file_path, 'r') as f:
-            logs = json.load(f)
-
-        print(f"Loaded logs: {json.dumps(logs, indent=2)}")
-
-        if not logs:
-            print("Warning: No speed logs found in the log file")
-
-        # Insert speed reports into database for vehicles exceeding threshold
-        with Database(DB_CONFIG) as db:
-            for log in logs:
-                print(f"Processing log for track_id {log['track_id']}: speed={log['speed_kmh']} km/h")
-                # Skip vehicles below speed threshold
-                if log['speed_kmh'] <= SPEED_THRESHOLD_KMH:
-                    print(f"Skipping report for track_id {log['track_id']}: speed {log['speed_kmh']} km/h <= {SPEED_THRESHOLD_KMH} km/h")
-                    continue
-
-                # Calculate clip time range with padding
-                track_id = log['track_id']
-                start_time = log['start_time'] - 0.5
-                end_time = log['end_time'] + 0.5
-                duration = end_time - start_time
-                if start_time < 0:
-                    start_time = 0
-                    duration = end_time + 0.5
-
-                print(f"Creating clip for track_id {track_id}: start_time={start_time}, end_time={end_time}, duration={duration}")
-
-                # Generate video clip for the report
-                clip_filename = f"clip_track_{track_id}_{int(log['timestamp'])}.mp4"
-                clip_path = os.path.join(VIDEO_CLIPS_DIRECTORY, clip_filename)
-                clip_url = f"/video_clips/{clip_filename}"
-                print(f"Saving clip with path: {clip_url}")
-
-                try:
-                    # Create video clip using FFmpeg
-                    result = subprocess.run([
-                        "ffmpeg", "-i", converted_video_path, "-ss", str(start_time),
-                        "-t", str(duration), "-c:v", "libx264", "-c:a", "aac",
-                        "-strict", "-2", clip_path
-                    ], check=True, capture_output=True, text=True)
-                    print(f"Created video clip: {clip_path}, size={os.path.getsize(clip_path)} bytes")
-                except subprocess.CalledProcessError as e:
-                    print(f"FFmpeg clip error: {e.stderr}")
-                    continue
-
-                # Verify clip was created successfully
-                if not os.path.exists(clip_path) or os.path.getsize(clip_path) == 0:
-                    print(f"Clip {clip_path} is empty or not created")
-                    continue
-
-                # Insert report into database
-                db.insert_report(
-                    track_id=track_id,
-                    speed_kmh=log['speed_kmh'],
-                    duration_s=log['duration_s'],
-                    timestamp=log['timestamp'],
-                    clip_path=clip_url,
-                    video_filename=video_filename
+            await scheduler.acquire(request.priority, request.tenant)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except SchedulerFull as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        job_start = time.perf_counter()
+        try:
+            # Share one batched model per backend across concurrently running jobs
+            detector = None
+            if INFERENCE_BATCHING and options["backend"] in BACKENDS and os.path.exists(video_path) \
+                    and os.path.exists(calibration_path):
+                # The server must run at the detector size tuned for this camera
+                _, _, imgsz = await run_in_threadpool(load_camera, video_path, calibration_path)
+                imgsz = imgsz or options.get("default_imgsz")
+                # Loading the model on first use blocks, so it runs off the event loop
+                server = await run_in_threadpool(get_inference_server, options["backend"], imgsz)
+                detector = server.client(str(uuid.uuid4()))
+
+            # Run the calibration -> tracking -> reports pipeline in a worker thread,
+            # so that the server keeps serving requests and other jobs meanwhile
+            try:
+                result = await run_in_threadpool(
+                    process_video_job,
+                    video_path,
+                    calibration_path,
+                    detector=detector,
+                    **options
                 )
-                print(f"Inserted report for track_id {track_id} with clip_path: {clip_url}")
+            finally:
+                if detector is not None:
+                    detector.close()
+        finally:
+            scheduler.release(time.perf_counter() - job_start)
 
         # Return paths to processed video and log file
-        return JSONResponse(content={
-            "status": "success",
-            "video_path": f"/processed_videos/converted_{video_filename}",
-            "log_path": f"/processed_videos/speed_log_{video_filename}.json"
-        })
+        return JSONResponse(content=result)
+    except HTTPException:
+        raise
+    except JobError as e:
+        print(f"Error processing video: {str(e)}")
+        # Raise HTTP exception with the status chosen by the pipeline
+        raise HTTPException(status_code=e.status_code, detail=f"Error processing video: {str(e)}")
     except Exception as e:
         print(f"Error processing video: {str(e)}")
         # Raise HTTP exception for processing errors
         raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
 
+# Route to retrieve batching statistics of the shared inference servers
+@app.get("/inference/stats")
+async def inference_stats():
+    return JSONResponse(content={f"{backend}@{imgsz or 'default'}": server.stats()
+                                 for (backend, imgsz), server in inference_servers.items()})
+
+# Route to retrieve concurrency and per-command timings of the ffmpeg executor
+@app.get("/ffmpeg/stats")
+async def ffmpeg_stats():
+    return JSONResponse(content=get_executor().stats())
+
+# Route to retrieve admission control statistics
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    return JSONResponse(content=scheduler.stats())
+
+# Route to retrieve disk usage and storage lifecycle metrics
+@app.get("/storage/stats")
+async def storage_stats():
+    return JSONResponse(content=await run_in_threadpool(get_storage().stats))
+
+async def wait_for_capture(video_filename, kind, timeout, seconds=None, frames=None):
+    # Ask the running job for a capture and wait until it has written the result
+    if video_filename not in await run_in_threadpool(get_storage().active_jobs):
+        raise HTTPException(status_code=404, detail=f"No running job for {video_filename}")
+    result_path = request_capture(video_filename, kind, seconds=seconds, frames=frames)
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(result_path):
+        if time.monotonic() > deadline:
+            raise HTTPException(status_code=504, detail=f"The job did not deliver the {kind} capture in time")
+        await asyncio.sleep(0.5)
+    with open(result_path, 'r') as f:
+        content = f.read()
+    os.remove(result_path)
+    return content
+
+# Route to profile a running job for some seconds: folded stacks for flamegraphs, or cProfile stats
+@app.post("/admin/profile/{video_filename}")
+async def profile_job(video_filename: str, seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+                      mode: str = Query("sample")):
+    if mode not in ("sample", "cprofile"):
+        raise HTTPException(status_code=400, detail="mode must be 'sample' or 'cprofile'")
+    content = await wait_for_capture(video_filename, mode, timeout=seconds + 60, seconds=seconds)
+    return PlainTextResponse(content)
+
+# Route to dump per-frame stage timings of a window of frames of a running job
+@app.post("/admin/stage_timings/{video_filename}")
+async def stage_timings(video_filename: str, frames: int = Query(100, gt=0, le=10000),
+                        timeout: float = Query(120.0, gt=0, le=3600)):
+    content = await wait_for_capture(video_filename, "stages", timeout=timeout, frames=frames)
+    return JSONResponse(content=json.loads(content))
+
+# Route to run a storage sweep now instead of waiting for the periodic one
+@app.post("/storage/sweep")
+async def storage_sweep():
+    try:
+        deleted = await run_in_threadpool(get_storage().sweep)
+    except Exception as e:
+        print(f"Error sweeping storage: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error sweeping storage: {str(e)}")
+    return JSONResponse(content={"status": "success", "deleted": deleted})
+
+# Route to add a video processing job to the distributed job queue
+@app.post("/enqueue_video")
+async def enqueue_video(request: ProcessVideoRequest, priority: int = Query(0)):
+    video_path = os.path.join(UPLOAD_DIRECTORY, request.video_filename)
+    calibration_path = os.path.join(CALIBRATION_DIRECTORY, request.calibration_file)
+    if not os.path.exists(video_path):
+        raise HTTPException(status_code=400, detail=f"Video file {video_path} not found")
+    if not os.path.exists(calibration_path):
+        raise HTTPException(status_code=400, detail=f"Calibration file {calibration_path} not found")
+    try:
+        options = request.dict(exclude={"video_filename", "calibration_file", "priority", "tenant"})
+        with create_job_queue() as queue:
+            queue.create_schema()
+            job_id = queue.enqueue(video_path, calibration_path, options=options, priority=priority)
+        return JSONResponse(content={"status": "queued", "job_id": job_id})
+    except Exception as e:
+        print(f"Error enqueueing job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error enqueueing job: {str(e)}")
+
+# Route to retrieve the status and result of a queued job
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    try:
+        with create_job_queue() as queue:
+            job = queue.get_job(job_id)
+    except Exception as e:
+        print(f"Error fetching job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fetching job: {str(e)}")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=job)
+
 # Route to serve the reports page
 @app.get("/reports", response_class=HTMLResponse)
 async def reports_page(request: Request):
@@ -406,13 +526,63 @@ async def reports_page(request: Request):
         # Render reports.html with the list of reports
         return templates.TemplateResponse(request, "reports.html", {
             "request": request,
-            "reports": reports
+            "reports": reports,
+            "sprite_columns": PREVIEW_SPRITE_COLUMNS,
+            "sprite_frames": PREVIEW_SPRITE_FRAMES
         })
     except Exception as e:
         print(f"Error fetching reports: {str(e)}")
         # Raise HTTP exception on error
         raise HTTPException(status_code=500, detail=f"Error fetching reports: {str(e)}")
 
+# Route to stream a bulk export of reports (CSV, NDJSON or Parquet) in chunks
+@app.get("/reports/export")
+async def export_reports(format: str = Query("csv"), start: Optional[datetime] = Query(None),
+                         end: Optional[datetime] = Query(None), min_speed: Optional[float] = Query(None),
+                         max_speed: Optional[float] = Query(None)):
+    try:
+        media_type, extension = check_export_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The synchronous generator is iterated in the threadpool, one chunk at a time
+    chunks = stream_export(format, start=start, end=end, min_speed=min_speed, max_speed=max_speed)
+    return StreamingResponse(chunks, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="reports.{extension}"'
+    })
+
+# Route to answer hourly or daily traffic statistics of a camera (or of all cameras) from the rollups
+@app.get("/statistics")
+async def traffic_statistics(granularity: str = Query("hour"), camera: Optional[str] = Query(None),
+                             start: Optional[datetime] = Query(None), end: Optional[datetime] = Query(None)):
+    """
+    Vehicle counts, violations and speed quantiles per hour or day.
+
+    Measurements are bucketed by the time their video was processed, not by the time
+    it was recorded: a recording processed or backfilled later is counted in the
+    buckets of its processing time.
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    # Default to the last day of hours or the last 30 days
+    end = end or datetime.now()
+    start = start or end - (timedelta(days=1) if granularity == "hour" else timedelta(days=30))
+    try:
+        statistics = await run_in_threadpool(query_statistics, granularity, start, end, camera)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content=statistics)
+
+# Route to list the cameras that have traffic statistics
+@app.get("/statistics/cameras")
+async def statistics_cameras():
+    def fetch():
+        with Database(DB_CONFIG) as db:
+            db.create_rollup_tables()
+            return db.fetch_rollup_cameras()
+    cameras = await run_in_threadpool(fetch)
+    return JSONResponse(content=[dict(camera, vehicles=int(camera["vehicles"] or 0),
+                                      last_folded_at=camera["last_folded_at"].isoformat()) for camera in cameras])
+
 # Route to serve a specific report's detail page
 @app.get("/report/{report_id}", response_class=HTMLResponse)
 async def report_detail(request: Request, report_id: str):
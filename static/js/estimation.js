@@ -47,6 +47,25 @@ document.addEventListener("DOMContentLoaded", function() {
         playPauseButton.textContent = 'Play';
     });
 
+    // Show the player and enable its controls once the video is loaded
+    function showVideo() {
+        videoPlayer.style.display = 'block';
+        videoPlayer.play().catch(error => {
+            console.error('Video playback error:', error);
+            alert('Failed to play video. Check format or browser console.');
+        });
+        videoPlayer.addEventListener('error', () => {
+            console.error('Video element error:', videoPlayer.error);
+        });
+        videoPlayer.addEventListener('loadeddata', () => {
+            console.log('Video loaded successfully');
+            playPauseButton.disabled = false;
+            slowDownButton.disabled = false;
+            speedUpButton.disabled = false;
+            playPauseButton.textContent = 'Pause';
+        });
+    }
+
     // Handle video processing request
     processButton.addEventListener('click', () => {
         // Validate required files
@@ -79,39 +98,36 @@ document.addEventListener("DOMContentLoaded", function() {
         .then(data => {
             console.log('Process video response:', data);
             if (data.status === 'success') {
-                // Verify video file accessibility
-                fetch(data.video_path, { method: 'HEAD' })
-                    .then(videoResponse => {
-                        if (videoResponse.ok) {
-                            // Set video source and load video
-                            videoSource.src = data.video_path;
-                            console.log('Setting video source to:', data.video_path);
-                            videoPlayer.load();
-                            videoPlayer.style.display = 'block';
-                            videoPlayer.play().catch(error => {
-                                console.error('Video playback error:', error);
-                                alert('Failed to play video. Check format or browser console.');
-                            });
-                            videoPlayer.addEventListener('error', () => {
-                                console.error('Video element error:', videoPlayer.error);
-                            });
-                            // Enable control buttons once video is loaded
-                            videoPlayer.addEventListener('loadeddata', () => {
-                                console.log('Video loaded successfully');
-                                playPauseButton.disabled = false;
-                                slowDownButton.disabled = false;
-                                speedUpButton.disabled = false;
-                                playPauseButton.textContent = 'Pause';
-                            });
-                        } else {
-                            console.error('Video file not accessible:', data.video_path);
-                            alert('Video not found on server');
-                        }
-                    })
-                    .catch(error => {
-                        console.error('Error checking video file:', error);
-                        alert('Error verifying video');
-                    });
+                // Prefer the segmented HLS output: playback starts after the first segment
+                if (data.hls_path && window.Hls && Hls.isSupported()) {
+                    const hls = new Hls();
+                    hls.loadSource(data.hls_path);
+                    hls.attachMedia(videoPlayer);
+                    console.log('Playing HLS stream:', data.hls_path);
+                    showVideo();
+                } else if (data.hls_path && videoPlayer.canPlayType('application/vnd.apple.mpegurl')) {
+                    videoPlayer.src = data.hls_path;
+                    showVideo();
+                } else {
+                    // Verify video file accessibility
+                    fetch(data.video_path, { method: 'HEAD' })
+                        .then(videoResponse => {
+                            if (videoResponse.ok) {
+                                // Set video source and load video
+                                videoSource.src = data.video_path;
+                                console.log('Setting video source to:', data.video_path);
+                                videoPlayer.load();
+                                showVideo();
+                            } else {
+                                console.error('Video file not accessible:', data.video_path);
+                                alert('Video not found on server');
+                            }
+                        })
+                        .catch(error => {
+                            console.error('Error checking video file:', error);
+                            alert('Error verifying video');
+                        });
+                }
 
                 // Fetch and display speed log data
                 fetch(`/get_speed_log?log_file=speed_log_${VIDEO_FILENAME}.json`)
@@ -125,6 +141,7 @@ document.addEventListener("DOMContentLoaded", function() {
                                 <td>${log.track_id}</td>
                                 <td>${log.speed_kmh}</td>
                                 <td>${log.duration_s}</td>
+                                <td>${log.zone || ''}${log.lane ? ` (${log.lane})` : ''}</td>
                             `;
                             speedTableBody.appendChild(tr);
                         });